@@ -0,0 +1,206 @@
+# answer_service.py
+"""
+Долгоживущий HTTP-сервис (ASGI) для ответов на вопросы по книге.
+
+Карта знаний, страницы книги и клиент GigaChat загружаются один раз при старте
+(pipeline.Pipeline) и остаются в памяти. Конфигурация - из файла $PIPELINE_CONFIG
+или переменных окружения PIPELINE_* (см. pipeline.resolve_config); одновременно
+выполняется не более max_concurrency запусков конвейера. Одинаковые вопросы,
+пришедшие одновременно, объединяются: конвейер выполняется один раз, все
+ожидающие получают общий результат.
+
+Эндпоинты:
+    POST /answer    {"question": "...", "routing_mode": "lean"} -> навигация + ответ
+    POST /navigate  {"question": "...", "routing_mode": "lean"} -> только выбор части/главы/подглавы
+    GET  /health
+
+routing_mode необязателен (full - рассуждения на каждом шаге, lean - только
+выбор, brief - выбор с обоснованием и уверенностью); по умолчанию - из конфигурации.
+
+Запуск:
+    GIGACHAT_ACCESS_TOKEN=... PIPELINE_PART_MODEL=GigaChat-Lite uvicorn answer_service:app
+
+С несколькими воркерами (uvicorn --workers N) задайте PIPELINE_SHARED_STORE=data_index/book_store.bin:
+страницы и карта знаний читаются из общего mmap-файла (shared_store), а не
+загружаются из JSON в каждый воркер.
+
+При большом потоке вопросов PIPELINE_BATCH_ROUTING=1 включает микро-батчинг
+навигации (batch_router): одновременные вопросы в режимах lean и brief выбирают
+узлы общими запросами по PIPELINE_BATCH_MAX штук, окно ожидания -
+PIPELINE_BATCH_WINDOW секунд. Запросы в режиме full идут обычным путём.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import memory_profile
+from gigachat_module import ROUTING_MODES
+from json_io import dumps, loads
+from navigation_cache import normalize_question
+from pipeline import Pipeline, PipelineConfig, resolve_config
+
+
+def to_jsonable(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Pydantic-модели шагов навигации -> dict для ответа сервиса.
+    """
+    return {key: value.model_dump() if hasattr(value, "model_dump") else value for key, value in result.items()}
+
+
+class AnswerService:
+    """
+    Тёплое состояние сервиса и объединение одинаковых запросов «в полёте».
+    """
+    def __init__(self, pipeline: Pipeline):
+        self.pipeline = pipeline
+        self._in_flight: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._slots = asyncio.Semaphore(pipeline.config.max_concurrency)
+        self.executions = 0
+
+    @classmethod
+    def from_config(cls, config: PipelineConfig, client=None) -> "AnswerService":
+        """
+        Состояние загружается сразу, чтобы первый запрос не платил за чтение файлов.
+        """
+        pipeline = Pipeline(config, client)
+        for name in ("catalogues", "book", "cache", "passage_index", "client"):
+            getattr(pipeline, name)
+        return cls(pipeline)
+
+    async def _in_thread(self, run: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        async with self._slots:
+            return await asyncio.to_thread(run)
+
+    async def _execute(self, run: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        self.executions += 1
+        return to_jsonable(await run())
+
+    async def _coalesce(
+        self, kind: str, question: str, run: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """
+        Запускает конвейер или присоединяется к уже выполняющемуся для того же вопроса.
+        Выполнение идёт в отдельной задаче, поэтому отмена одного клиента не отменяет его для остальных.
+        kind включает режим навигации: запросы в разных режимах не объединяются.
+        """
+        key = (kind, normalize_question(question))
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._execute(run))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _answer(self, question: str, routing_mode: str) -> Dict[str, Any]:
+        router = self.pipeline.batch_router(routing_mode)
+        if router is None:
+            return await self._in_thread(lambda: self.pipeline.answer(question, routing_mode))
+        # Слот занимается только на извлечение страниц и финальный ответ: навигация
+        # ждёт окна батчинга и не должна ограничивать размер пакета
+        navigation = await router.navigate(question)
+        return await self._in_thread(lambda: self.pipeline.answer_from_navigation(question, navigation))
+
+    async def _navigate(self, question: str, routing_mode: str) -> Dict[str, Any]:
+        router = self.pipeline.batch_router(routing_mode)
+        if router is None:
+            return await self._in_thread(lambda: self.pipeline.navigate(question, routing_mode))
+        return await router.navigate(question)
+
+    async def answer(self, question: str, routing_mode: Optional[str] = None) -> Dict[str, Any]:
+        routing_mode = routing_mode or self.pipeline.config.routing_mode
+        return await self._coalesce(
+            f"answer:{routing_mode}", question, lambda: self._answer(question, routing_mode)
+        )
+
+    async def navigate(self, question: str, routing_mode: Optional[str] = None) -> Dict[str, Any]:
+        routing_mode = routing_mode or self.pipeline.config.routing_mode
+        return await self._coalesce(
+            f"navigate:{routing_mode}", question, lambda: self._navigate(question, routing_mode)
+        )
+
+
+async def _read_body(receive) -> bytes:
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+async def _send_json(send, status: int, payload: Any) -> None:
+    body = dumps(payload, compact=True)
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json; charset=utf-8"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def create_app(service_factory: Callable[[], AnswerService]):
+    """
+    Создаёт ASGI-приложение. service_factory вызывается один раз (при lifespan startup
+    или при первом запросе), поэтому в тестах можно передать сервис с FakeLLMClient.
+    """
+    state: Dict[str, AnswerService] = {}
+
+    def get_service() -> AnswerService:
+        if "service" not in state:
+            state["service"] = service_factory()
+        return state["service"]
+
+    routes: Dict[str, Callable[[AnswerService, str, Optional[str]], Awaitable[Dict[str, Any]]]] = {
+        "/answer": AnswerService.answer,
+        "/navigate": AnswerService.navigate,
+    }
+
+    async def app(scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    try:
+                        get_service()
+                    except Exception as e:
+                        logging.exception("Ошибка загрузки сервиса")
+                        await send({"type": "lifespan.startup.failed", "message": str(e)})
+                        return
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            return
+
+        path, method = scope["path"], scope["method"]
+        if path == "/health" and method == "GET":
+            return await _send_json(send, 200, {"status": "ok"})
+        if path not in routes:
+            return await _send_json(send, 404, {"error": "not found"})
+        if method != "POST":
+            return await _send_json(send, 405, {"error": "method not allowed"})
+
+        try:
+            body = loads(await _read_body(receive))
+            question, routing_mode = body["question"], body.get("routing_mode")
+            if not isinstance(question, str) or not question.strip():
+                raise ValueError
+        except Exception:
+            return await _send_json(send, 400, {"error": "ожидается JSON вида {\"question\": \"...\"}"})
+        if routing_mode is not None and routing_mode not in ROUTING_MODES:
+            return await _send_json(send, 400, {"error": f"routing_mode: одно из {', '.join(ROUTING_MODES)}"})
+
+        try:
+            result = await routes[path](get_service(), question, routing_mode)
+        except Exception:
+            # Подробности - только в журнале: текст исключения может содержать детали запросов к LLM
+            logging.exception("Ошибка конвейера")
+            return await _send_json(send, 502, {"error": "ошибка обработки вопроса"})
+        return await _send_json(send, 200, result)
+
+    return app
+
+
+memory_profile.enable_from_env()
+app = create_app(lambda: AnswerService.from_config(resolve_config()))
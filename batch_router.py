@@ -0,0 +1,231 @@
+# batch_router.py
+"""
+Микро-батчинг навигации: вопросы, пришедшие за короткое окно, уходят в LLM
+одним запросом на уровень.
+
+Каталог уровня (части, главы части, подглавы главы) - основная часть входных
+токенов запроса, и для всех вопросов он одинаков. BatchRouter копит вопросы
+в очереди по ключу (уровень, родительский узел) до max_batch штук или до
+истечения window секунд с первого вопроса и отправляет каталог один раз вместе
+с нумерованным списком вопросов (gigachat_module.BATCH_ROUTING_MODES). Ответ -
+выбор для каждого вопроса по question_id. Вопросы, выбравшие одну часть,
+попадают в одну очередь глав, выбравшие одну главу - в одну очередь подглав.
+
+Выбор проверяется по карте знаний: для вопроса без выбора в ответе, с номером
+несуществующего узла или при ошибке пакетного запроса шаг повторяется обычным
+одиночным запросом. Очередь из одного вопроса тоже отправляется обычным запросом.
+
+Работают режимы lean и brief: в full каждый ответ - несколько абзацев
+рассуждений, и выигрыш на каталоге съедается длиной выхода.
+
+С cache (navigation_cache.NavigationCache) известные уровни берутся из кеша,
+а выборы, полученные роутером, записываются в него. В сервисе (answer_service)
+роутер включается флагом конфигурации batch_routing (Pipeline.batch_router).
+"""
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from book_models import KnowMap
+from gigachat_module import (
+    get_batch_reasoning,
+    get_book_part_reasoning,
+    get_chapter_reasoning,
+    get_subchapter_reasoning,
+    BATCH_ROUTING_MODES,
+    ROUTING_MODES
+)
+from navigation_cache import NavigationCache
+from pipeline import DEFAULT_MODELS, Catalogues, StepModels
+from render_profiles import FULL_PROFILE, RenderProfile
+from response_schema import DEFAULT_SCHEMA_MODE
+
+DEFAULT_MAX_BATCH = 8
+DEFAULT_WINDOW = 0.05
+DEFAULT_BATCH_ROUTING_MODE = "lean"
+
+# Уровень -> функция одиночного запроса и поле с выбранным номером
+SINGLE_STEPS = {
+    "part": (get_book_part_reasoning, "selected_part"),
+    "chapter": (get_chapter_reasoning, "selected_chapter"),
+    "subchapter": (get_subchapter_reasoning, "selected_subchapter"),
+}
+
+
+class BatchRouter:
+    """
+    max_batch - сколько вопросов собирается в один запрос (K);
+    window - сколько секунд очередь ждёт следующих вопросов после первого.
+    Статистика в stats: requests - запросы к LLM, batched - вопросы, выбор для
+    которых получен пакетным запросом, fallbacks - одиночные повторы.
+    """
+    def __init__(
+        self,
+        client,
+        know_map: KnowMap,
+        catalogues: Optional[Catalogues] = None,
+        profile: RenderProfile = FULL_PROFILE,
+        models: StepModels = DEFAULT_MODELS,
+        routing_mode: str = DEFAULT_BATCH_ROUTING_MODE,
+        schema_mode: str = DEFAULT_SCHEMA_MODE,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        window: float = DEFAULT_WINDOW,
+        cache: Optional[NavigationCache] = None
+    ):
+        if routing_mode not in BATCH_ROUTING_MODES:
+            raise ValueError(
+                f"Пакетная навигация не поддерживает режим {routing_mode}. Доступны: {', '.join(BATCH_ROUTING_MODES)}"
+            )
+        self.client = client
+        self.know_map = know_map
+        self.catalogues = catalogues or Catalogues(know_map, profile)
+        self.models = models
+        self.steps = ROUTING_MODES[routing_mode]
+        self.batch_steps = BATCH_ROUTING_MODES[routing_mode]
+        self.schema_mode = schema_mode
+        self.max_batch = max_batch
+        self.window = window
+        self.cache = cache
+        self.stats = {"requests": 0, "batches": 0, "batched": 0, "fallbacks": 0}
+        # Запросы выполняются в потоках asyncio.to_thread
+        self._stats_lock = threading.Lock()
+        self._pending: Dict[Tuple, List[Tuple[str, asyncio.Future]]] = {}
+        self._timers: Dict[Tuple, asyncio.TimerHandle] = {}
+        # Ссылки на задачи отправки: иначе цикл событий держит их слабо и они могут быть собраны сборщиком мусора
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _count(self, **increments: int) -> None:
+        with self._stats_lock:
+            for name, value in increments.items():
+                self.stats[name] += value
+
+    # ---------------------------------------------------------------
+    # Синхронные запросы (выполняются в потоке)
+    # ---------------------------------------------------------------
+    def _catalogue(self, level: str, parent: Tuple) -> str:
+        if level == "part":
+            return self.catalogues.parts()
+        if level == "chapter":
+            return self.catalogues.chapters(*parent)
+        return self.catalogues.subchapters(*parent)
+
+    def _is_valid(self, level: str, parent: Tuple, selected: Any) -> bool:
+        if level == "part":
+            return self.know_map.find_part(selected) is not None
+        if level == "chapter":
+            return self.know_map.find_chapter(parent[0], selected) is not None
+        sub = self.know_map.find_subchapter(selected)
+        return sub is not None and (sub.part_number, sub.chapter_number) == parent
+
+    def _single(self, level: str, catalogue: str, question: str):
+        request, _ = SINGLE_STEPS[level]
+        prompt, response_model = self.steps[level]
+        self._count(requests=1)
+        return request(
+            self.client, prompt, catalogue, question, getattr(self.models, level), self.schema_mode, response_model
+        )
+
+    def _batch(self, level: str, parent: Tuple, catalogue: str, questions: List[str]) -> List[Optional[Any]]:
+        """
+        Выборы для вопросов в порядке questions; None - выбора нет или он не прошёл проверку.
+        """
+        _, attr = SINGLE_STEPS[level]
+        _, response_model = self.steps[level]
+        prompt, batch_model = self.batch_steps[level]
+        self._count(requests=1, batches=1)
+        result = get_batch_reasoning(
+            self.client, level, prompt, catalogue, questions, batch_model, getattr(self.models, level),
+            self.schema_mode
+        )
+        selections: List[Optional[Any]] = [None] * len(questions)
+        for item in result.selections:
+            index = item.question_id - 1
+            if index < len(questions) and selections[index] is None and self._is_valid(level, parent, getattr(item, attr)):
+                selections[index] = response_model.model_validate(item.model_dump(exclude={"question_id"}))
+        return selections
+
+    def _route(self, level: str, parent: Tuple, questions: List[str]) -> List[Any]:
+        catalogue = self._catalogue(level, parent)
+        if len(questions) == 1:
+            selections = [self._single(level, catalogue, questions[0])]
+        else:
+            try:
+                selections = self._batch(level, parent, catalogue, questions)
+            except Exception:
+                selections = [None] * len(questions)
+            self._count(batched=sum(selection is not None for selection in selections))
+            for index, selection in enumerate(selections):
+                if selection is None:
+                    self._count(fallbacks=1)
+                    selections[index] = self._single(level, catalogue, questions[index])
+        if self.cache is not None:
+            for question, selection in zip(questions, selections):
+                self.cache.put(question, level, selection)
+        return selections
+
+    # ---------------------------------------------------------------
+    # Очереди
+    # ---------------------------------------------------------------
+    def _flush(self, key: Tuple) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        pending = self._pending.pop(key, [])
+        if pending:
+            task = asyncio.ensure_future(self._dispatch(key, pending))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, key: Tuple, pending: List[Tuple[str, asyncio.Future]]) -> None:
+        level, parent = key
+        questions = [question for question, _ in pending]
+        try:
+            selections = await asyncio.to_thread(self._route, level, parent, questions)
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), selection in zip(pending, selections):
+            if not future.done():
+                future.set_result(selection)
+
+    async def select(self, level: str, parent: Tuple, question: str):
+        """
+        Выбор узла уровня level среди потомков parent ((), (part,) или (part, chapter)).
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        key = (level, parent)
+        pending = self._pending.setdefault(key, [])
+        pending.append((question, future))
+        if len(pending) >= self.max_batch:
+            self._flush(key)
+        elif len(pending) == 1:
+            self._timers[key] = loop.call_later(self.window, self._flush, key)
+        return await future
+
+    async def navigate(self, question: str) -> Dict[str, Any]:
+        """
+        Результат в том же формате, что и pipeline.navigate.
+        """
+        results = {}
+        if self.cache is not None:
+            models = {level: model for level, (_, model) in self.steps.items()}
+            results = await asyncio.to_thread(self.cache.get, question, models)
+        part = results.get("part") or await self.select("part", (), question)
+        chapter = results.get("chapter") or await self.select("chapter", (part.selected_part,), question)
+        subchapter = results.get("subchapter") or await self.select(
+            "subchapter", (part.selected_part, chapter.selected_chapter), question
+        )
+        return {"part": part, "chapter": chapter, "subchapter": subchapter}
+
+    async def navigate_all(self, questions: List[str]) -> List[Any]:
+        return await asyncio.gather(*(self.navigate(question) for question in questions), return_exceptions=True)
+
+    def navigate_many(self, questions: List[str]) -> List[Any]:
+        """
+        Синхронная обёртка: навигация всех вопросов сразу. Для вопроса, навигация
+        которого завершилась ошибкой, в списке стоит исключение.
+        """
+        return asyncio.run(self.navigate_all(questions))
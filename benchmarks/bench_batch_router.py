@@ -0,0 +1,75 @@
+# bench_batch_router.py
+"""
+Пакетная навигация (batch_router.BatchRouter) против последовательной
+(pipeline.navigate) на наборе вопросов: запросы и входные токены на вопрос и
+точность выбора подглавы. Все вопросы набора приходят одновременно, то есть
+в одно окно; --max-batch задаёт K.
+
+По умолчанию используется FakeLLMClient; с --backend real/record/replay
+(см. routing_eval) - ответы GigaChat.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_batch_router [--max-batch 8] [--routing-mode lean]
+"""
+import argparse
+
+from batch_router import DEFAULT_MAX_BATCH, BatchRouter
+from client_observer import ObservedClient
+from gigachat_module import BATCH_ROUTING_MODES
+from json_io import load_know_map
+from pipeline import Catalogues, navigate
+from routing_eval import KNOW_MAP_FILE, QUESTIONS_FILE, UsageMeter, create_backend, gold_levels, load_questions
+
+
+def accuracy(know_map, questions, results) -> float:
+    hits = sum(
+        not isinstance(result, Exception)
+        and str(result["subchapter"].selected_subchapter) == gold_levels(know_map, item["subchapter_number"])["subchapter"]
+        for item, result in zip(questions, results)
+    )
+    return hits / len(questions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", choices=["fake", "real", "record", "replay"], default="fake")
+    parser.add_argument("--cassette", help="файл записи ответов для record/replay")
+    parser.add_argument("--questions", default=QUESTIONS_FILE)
+    parser.add_argument("--routing-mode", choices=list(BATCH_ROUTING_MODES), default="lean")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH)
+    args = parser.parse_args()
+
+    client = create_backend(args.backend, args.cassette)
+    know_map = load_know_map(KNOW_MAP_FILE)
+    catalogues = Catalogues(know_map)
+    questions = load_questions(args.questions)
+    texts = [item["question"] for item in questions]
+
+    sequential = UsageMeter()
+    observed = ObservedClient(client, sequential.observer)
+    results = []
+    for question in texts:
+        try:
+            results.append(navigate(observed, know_map, question, catalogues=catalogues, routing_mode=args.routing_mode))
+        except Exception as e:
+            results.append(e)
+    rows = [("последовательно", sequential, accuracy(know_map, questions, results))]
+
+    batched = UsageMeter()
+    router = BatchRouter(
+        ObservedClient(client, batched.observer), know_map, catalogues,
+        routing_mode=args.routing_mode, max_batch=args.max_batch
+    )
+    rows.append((f"пакетами по {args.max_batch}", batched, accuracy(know_map, questions, router.navigate_many(texts))))
+
+    count = len(questions)
+    print(f"Вопросов: {count}, режим: {args.routing_mode}, бэкенд: {args.backend}")
+    print(f"{'':18} {'запросов':>9} {'вход':>8} {'выход':>7} {'acc sub':>8}")
+    for name, meter, acc in rows:
+        print(f"{name:18} {meter.calls / count:9.2f} {meter.prompt_tokens / count:8.0f}"
+              f" {meter.completion_tokens / count:7.0f} {acc:8.0%}")
+    print(f"Пакетных запросов: {router.stats['batches']}, одиночных повторов: {router.stats['fallbacks']}")
+
+
+if __name__ == "__main__":
+    main()
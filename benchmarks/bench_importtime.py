@@ -0,0 +1,94 @@
+# bench_importtime.py
+"""
+Время импорта модулей проекта (python -X importtime) и время запуска коротких
+команд CLI. Каждый замер - отдельный процесс, берётся лучший из REPEAT запусков.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_importtime [--output importtime.json]
+"""
+import argparse
+import re
+import subprocess
+import sys
+import time
+
+from json_io import dump_json
+
+MODULES = [
+    "cli",
+    "json_io",
+    "book_models",
+    "content_book_parser",
+    "gigachat_module",
+    "pipeline",
+    "routing_eval",
+    "passage_index",
+    "keyword_matrix",
+    "answer_service",
+]
+COMMANDS = [
+    ["cli.py", "--help"],
+    ["cli.py", "inspect"],
+    ["cli.py", "bench"],
+]
+REPEAT = 5
+
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def import_profile(module: str):
+    """
+    Суммарное время импорта модуля (мкс) и самые дорогие из его зависимостей верхнего уровня.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True
+    )
+    # -X importtime печатает зависимости перед модулем, который их импортировал: прямые
+    # зависимости модуля - строки с отступом 3 после предыдущей строки верхнего уровня
+    children = []
+    for match in _IMPORTTIME_LINE.finditer(result.stderr):
+        cumulative, indent, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        if indent == 1:
+            if name == module:
+                return cumulative, sorted(children, reverse=True)[:3]
+            children = []
+        elif indent == 3:
+            children.append((cumulative, name))
+    return 0, []
+
+
+def best_wall_ms(command) -> float:
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *command], capture_output=True, check=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", help="сохранить замеры в JSON для сравнения между версиями")
+    args = parser.parse_args()
+
+    report = {"imports_ms": {}, "commands_ms": {}}
+    baseline = best_wall_ms(["-c", "pass"])
+    print(f"Пустой интерпретатор: {baseline:.0f} мс")
+    print(f"{'модуль':22} {'импорт, мс':>10}  самые дорогие зависимости")
+    for module in MODULES:
+        times = [import_profile(module) for _ in range(REPEAT)]
+        total, heavy = min(times)
+        report["imports_ms"][module] = total / 1000
+        details = ", ".join(f"{name} {cumulative / 1000:.0f}" for cumulative, name in heavy)
+        print(f"{module:22} {total / 1000:10.1f}  {details}")
+    for command in COMMANDS:
+        label = " ".join(command)
+        report["commands_ms"][label] = best_wall_ms(command)
+        print(f"{label:22} {report['commands_ms'][label]:10.0f} мс (процесс целиком)")
+    if args.output:
+        dump_json(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# bench_json_io.py
+"""
+Сравнение стандартного json и быстрого бэкенда из json_io (orjson/msgspec)
+на загрузке и записи kniga_full_content.json и know_map_full.json.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_json_io
+"""
+import json
+import timeit
+
+import json_io
+
+FILES = [
+    "data_update/kniga_full_content.json",
+    "data_know_map/know_map_full.json",
+]
+NUMBER = 20
+
+
+def best(func) -> float:
+    return min(timeit.repeat(func, number=NUMBER, repeat=5)) / NUMBER
+
+
+def main():
+    print(f"Бэкенд json_io: {json_io.BACKEND}")
+    for path in FILES:
+        with open(path, "rb") as f:
+            raw = f.read()
+        data = json.loads(raw)
+
+        rows = [
+            ("загрузка", best(lambda: json.loads(raw)), best(lambda: json_io.loads(raw))),
+            (
+                "запись indent=2",
+                best(lambda: json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")),
+                best(lambda: json_io.dumps(data))
+            ),
+            (
+                "запись compact",
+                best(lambda: json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")),
+                best(lambda: json_io.dumps(data, compact=True))
+            ),
+        ]
+        print(f"\n{path} ({len(raw) / 1024:.0f} KB, compact: {len(json_io.dumps(data, compact=True)) / 1024:.0f} KB)")
+        for name, stdlib_time, fast_time in rows:
+            print(
+                f"  {name:16} json: {stdlib_time * 1000:7.2f} мс   "
+                f"{json_io.BACKEND}: {fast_time * 1000:7.2f} мс   x{stdlib_time / fast_time:.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
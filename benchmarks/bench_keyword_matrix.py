@@ -0,0 +1,41 @@
+# bench_keyword_matrix.py
+"""
+Матрица ключевых слов (keyword_matrix): время построения и оценки вопроса против
+всех документов для одной книги и для «библиотеки» из её копий под разными book_id.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_keyword_matrix
+"""
+import time
+import timeit
+
+from json_io import load_book, load_know_map
+from keyword_matrix import BACKEND, KeywordMatrix, library_documents
+
+KNOW_MAP_FILE = "data_know_map/know_map_full.json"
+PAGES_FILE = "data_update/kniga_only_pages.json"
+LIBRARY_SIZES = (1, 100, 1000)
+QUESTION = "Как правильно принести извинения коллегам?"
+
+
+def main():
+    know_map = load_know_map(KNOW_MAP_FILE)
+    book = load_book(PAGES_FILE)
+    print(f"Бэкенд: {BACKEND}")
+    for books in LIBRARY_SIZES:
+        documents = [
+            document
+            for book_id in range(books)
+            for document in library_documents(know_map, book, f"book{book_id}" if books > 1 else "")
+        ]
+        start = time.perf_counter()
+        matrix = KeywordMatrix(documents)
+        build = time.perf_counter() - start
+        number = max(10, 2000 // books)
+        score = min(timeit.repeat(lambda: matrix.score(QUESTION), number=number, repeat=3)) / number
+        print(f"книг {books:5}: документов {matrix.shape[0]:7}, ненулевых {len(matrix.data):8}, "
+              f"построение {build:.2f} с, оценка вопроса {score * 1000:.3f} мс")
+
+
+if __name__ == "__main__":
+    main()
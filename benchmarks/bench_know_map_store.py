@@ -0,0 +1,75 @@
+# bench_know_map_store.py
+"""
+Загрузка карты знаний по уровням (know_map_store) против know_map_full.json целиком:
+прочитанные байты и время построения каталога на каждом шаге навигации с холодного
+старта, а также объём данных, удерживаемых в памяти.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_know_map_store
+"""
+import os
+import time
+import tracemalloc
+
+from json_io import load_know_map
+from know_map_store import KnowMapStore, build_shards
+from pipeline import Catalogues
+
+KNOW_MAP_FILE = "data_know_map/know_map_full.json"
+PART, CHAPTER = 3, 7
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def run_full():
+    know_map, load_ms = timed(lambda: load_know_map(KNOW_MAP_FILE))
+    catalogues = Catalogues(know_map)
+    _, parts_ms = timed(catalogues.parts)
+    _, chapters_ms = timed(lambda: catalogues.chapters(PART))
+    _, subchapters_ms = timed(lambda: catalogues.subchapters(PART, CHAPTER))
+    size = os.path.getsize(KNOW_MAP_FILE)
+    return [(size, load_ms + parts_ms), (0, chapters_ms), (0, subchapters_ms)], know_map
+
+
+def run_store(shards_dir=None):
+    steps = []
+    store, init_ms = timed(lambda: KnowMapStore(shards_dir=shards_dir))
+    catalogues = Catalogues(store)
+    for step in (catalogues.parts, lambda: catalogues.chapters(PART), lambda: catalogues.subchapters(PART, CHAPTER)):
+        before = store.bytes_read
+        _, ms = timed(step)
+        steps.append((store.bytes_read - before, ms))
+    steps[0] = (steps[0][0] + store.bytes_read - sum(b for b, _ in steps), steps[0][1] + init_ms)
+    return steps, store
+
+
+def retained_kib(run) -> float:
+    tracemalloc.start()
+    _, keep = run()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del keep
+    return current / 1024
+
+
+def main():
+    build_shards(KNOW_MAP_FILE)
+    variants = {
+        "know_map_full.json": run_full,
+        "store (шарды частей)": run_store,
+        "store (файлы уровней)": lambda: run_store("/nonexistent"),
+    }
+    for name, run in variants.items():
+        steps, _ = run()
+        print(f"{name}:")
+        for label, (size, ms) in zip(("шаг 1 (части)", "шаг 2 (главы)", "шаг 3 (подглавы)"), steps):
+            print(f"    {label:18} прочитано {size / 1024:7.1f} КиБ, {ms:6.2f} мс")
+        print(f"    в памяти после шага 3: {retained_kib(run):.0f} КиБ")
+
+
+if __name__ == "__main__":
+    main()
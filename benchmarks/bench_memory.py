@@ -0,0 +1,94 @@
+# bench_memory.py
+"""
+Память на одну книгу по этапам (memory_profile): загрузка карты знаний и книги,
+построение индекса фрагментов и каталогов, шаги навигации и финальный шаг для
+вопросов из data_eval (ответы - FakeLLMClient, без сети).
+
+"На книгу" - traced-память, которая остаётся занятой состоянием конвейера после
+всех этапов. --output сохраняет отчёт (его можно взять базовым); с --baseline
+бенчмарк сравнивает память на книгу и пики этапов с базовым отчётом и завершается
+с кодом 1, если рост больше --max-growth.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_memory --output memory_baseline.json
+    python -m benchmarks.bench_memory --baseline memory_baseline.json --max-growth 0.1
+"""
+import argparse
+import sys
+import tracemalloc
+from typing import Any, Dict, List
+
+import memory_profile
+from fake_llm import FakeLLMClient
+from json_io import dump_json, load_json
+from pipeline import Pipeline, PipelineConfig
+from routing_eval import load_questions
+
+# Этапы с меньшим базовым пиком не сравниваются: их колебания - шум аллокатора
+MIN_COMPARED_BYTES = 64 * 1024
+
+
+def run(questions: List[str], passages: bool) -> Dict[str, Any]:
+    profiler = memory_profile.enable()
+    start = tracemalloc.get_traced_memory()[0]
+    pipeline = Pipeline(PipelineConfig(cache_file=None), client=FakeLLMClient())
+    pipeline.know_map, pipeline.book, pipeline.catalogues
+    if passages:
+        from passage_index import PassageIndex
+        pipeline.passage_index = memory_profile.profiled(
+            "index.passages", PassageIndex.build, pipeline.book, pipeline.know_map
+        )
+    for question in questions:
+        pipeline.answer(question)
+    per_book = tracemalloc.get_traced_memory()[0] - start
+    report = {
+        "per_book": per_book,
+        "questions": len(questions),
+        "stages": {name: {"peak": record["peak"], "allocated": record["allocated"], "calls": record["calls"]}
+                   for name, record in profiler.stages.items()},
+    }
+    print(profiler.format_report())
+    del pipeline
+    memory_profile.disable()
+    return report
+
+
+def regressions(report: Dict[str, Any], baseline: Dict[str, Any], max_growth: float) -> List[str]:
+    """
+    Этапы (и память на книгу), выросшие относительно базового отчёта больше чем на max_growth.
+    """
+    checks = [("на книгу", baseline["per_book"], report["per_book"])]
+    for name, record in baseline["stages"].items():
+        if name in report["stages"] and record["peak"] >= MIN_COMPARED_BYTES:
+            checks.append((f"пик {name}", record["peak"], report["stages"][name]["peak"]))
+    return [
+        f"{label}: {before / 1024:.0f} -> {after / 1024:.0f} КиБ (+{after / before - 1:.0%})"
+        for label, before, after in checks if before and after > before * (1 + max_growth)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--questions", type=int, default=10, help="сколько вопросов из data_eval прогнать")
+    parser.add_argument("--no-passages", action="store_true", help="без индекса фрагментов")
+    parser.add_argument("--output", help="сохранить отчёт в JSON")
+    parser.add_argument("--baseline", help="базовый отчёт для сравнения")
+    parser.add_argument("--max-growth", type=float, default=0.1, help="допустимый рост памяти (доля)")
+    args = parser.parse_args()
+
+    questions = [item["question"] for item in load_questions()[:args.questions]]
+    report = run(questions, passages=not args.no_passages)
+    print(f"\nПамять на книгу: {report['per_book'] / 2 ** 20:.1f} МиБ ({report['questions']} вопросов)")
+    if args.output:
+        dump_json(report, args.output)
+    if args.baseline:
+        failed = regressions(report, load_json(args.baseline), args.max_growth)
+        for line in failed:
+            print(f"РЕГРЕССИЯ {line}")
+        if failed:
+            sys.exit(1)
+        print(f"Рост памяти в пределах {args.max_growth:.0%} от {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
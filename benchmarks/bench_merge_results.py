@@ -0,0 +1,83 @@
+# bench_merge_results.py
+"""
+Слияние результатов batch со страницами: потоковое (merge_results) против
+загрузки всего в память (json.load страниц и результатов, dump_json).
+Страницы книги размножаются до --pages, результаты генерируются по одному на
+страницу; замеряются время и пик traced-памяти.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_merge_results [--pages 20000]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from json_io import dump_json, load_json
+from tests.batch_llm_api_for_metadata.merge_results import merge_batch_results
+
+PAGES_FILE = "data_update/kniga_only_pages.json"
+
+
+def make_library(directory: str, count: int):
+    source = load_json(PAGES_FILE)
+    pages = [{**source[i % len(source)], "pageNumber": i + 1} for i in range(count)]
+    pages_file = os.path.join(directory, "pages.json")
+    dump_json(pages, pages_file)
+    results_file = os.path.join(directory, "output.jsonl")
+    with open(results_file, "w", encoding="utf-8") as f:
+        for page in pages:
+            content = json.dumps({"summary": f"Кратко о странице {page['pageNumber']}", "keywords": ["ключ"]})
+            f.write(json.dumps({
+                "custom_id": f"page_{page['pageNumber']}",
+                "response": {"status_code": 200, "body": {"choices": [{"message": {"content": content}}]}},
+                "error": None,
+            }, ensure_ascii=False) + "\n")
+    return pages_file, results_file
+
+
+def merge_in_memory(pages_file: str, results_file: str) -> None:
+    pages = load_json(pages_file)
+    with open(results_file, encoding="utf-8") as f:
+        results = [json.loads(line) for line in f]
+    by_id = {result["custom_id"]: result for result in results}
+    for page in pages:
+        result = by_id.get(f"page_{page['pageNumber']}")
+        if result is not None:
+            analysis = json.loads(result["response"]["body"]["choices"][0]["message"]["content"])
+            page.setdefault("metadata", {}).update(analysis)
+    dump_json(pages, pages_file)
+
+
+def measure(func) -> tuple:
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        pages_file, results_file = make_library(directory, args.pages)
+        size = os.path.getsize(pages_file) + os.path.getsize(results_file)
+        print(f"Страниц: {args.pages}, данных: {size / 2 ** 20:.1f} МиБ")
+        variants = {
+            "в памяти": lambda: merge_in_memory(pages_file, results_file),
+            "потоково": lambda: merge_batch_results([results_file], pages_file, os.path.join(directory, "retry.json")),
+        }
+        for name, func in variants.items():
+            seconds, peak = measure(func)
+            print(f"{name:10} {seconds:7.2f} с, пик памяти {peak / 2 ** 20:7.1f} МиБ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# bench_models.py
+"""
+Сравнение представления карты знаний и страниц в виде вложенных dict
+и в виде slotted-моделей из book_models: память на узел и скорость доступа к полям.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_models
+"""
+import json
+import sys
+import timeit
+import tracemalloc
+from dataclasses import fields, is_dataclass
+
+from book_models import book_from_dict, know_map_from_dict
+
+KNOW_MAP_FILE = "data_know_map/know_map_full.json"
+BOOK_FILE = "data_update/kniga_full_content.json"
+
+
+def measure_memory(build):
+    """
+    Память (байт), выделенная при построении объекта, без учёта исходного текста файла.
+    """
+    tracemalloc.start()
+    obj = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, current
+
+
+def container_bytes(obj) -> int:
+    """
+    Размер «скелета» структуры: dict/list/модели без строк и чисел,
+    которые одинаковы в обоих представлениях.
+    """
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(container_bytes(v) for v in obj.values())
+    if isinstance(obj, list):
+        return sys.getsizeof(obj) + sum(container_bytes(v) for v in obj)
+    if is_dataclass(obj):
+        return sys.getsizeof(obj) + sum(container_bytes(getattr(obj, f.name)) for f in fields(obj))
+    return 0
+
+
+def walk_dicts(data):
+    total = 0
+    for part in data.get("content", {}).get("parts", []):
+        total += len(part.get("title", "Нет заголовка"))
+        for chapter in part.get("chapters", []):
+            total += len(chapter.get("summary", "Нет описания"))
+            for sub in chapter.get("subchapters", []):
+                total += len(sub.get("title", "Нет заголовка")) + len(sub.get("pages", []))
+    return total
+
+
+def walk_models(know_map):
+    total = 0
+    for part in know_map.parts:
+        total += len(part.title)
+        for chapter in part.chapters:
+            total += len(chapter.summary)
+            for sub in chapter.subchapters:
+                total += len(sub.title) + len(sub.pages)
+    return total
+
+
+def count_nodes(know_map):
+    return sum(1 + sum(1 + len(ch.subchapters) for ch in part.chapters) for part in know_map.parts)
+
+
+def main():
+    with open(KNOW_MAP_FILE, "r", encoding="utf-8") as f:
+        know_map_text = f.read()
+    with open(BOOK_FILE, "r", encoding="utf-8") as f:
+        book_text = f.read()
+
+    know_map_dict, know_map_dict_mem = measure_memory(lambda: json.loads(know_map_text))
+    know_map, know_map_mem = measure_memory(lambda: know_map_from_dict(json.loads(know_map_text)))
+    book_dict, book_dict_mem = measure_memory(lambda: json.loads(book_text))
+    book, book_mem = measure_memory(lambda: book_from_dict(json.loads(book_text)))
+
+    nodes = count_nodes(know_map)
+    pages = len(book.pages)
+    assert walk_dicts(know_map_dict) == walk_models(know_map)
+
+    dict_walk = min(timeit.repeat(lambda: walk_dicts(know_map_dict), number=1000, repeat=5)) / 1000
+    model_walk = min(timeit.repeat(lambda: walk_models(know_map), number=1000, repeat=5)) / 1000
+    decode = min(timeit.repeat(lambda: know_map_from_dict(know_map_dict), number=100, repeat=5)) / 100
+
+    print(f"Карта знаний: {nodes} узлов (части, главы, подглавы)")
+    print(f"  dict:   {know_map_dict_mem / 1024:8.1f} KB, {know_map_dict_mem / nodes:8.0f} B/узел")
+    print(f"  модели: {know_map_mem / 1024:8.1f} KB, {know_map_mem / nodes:8.0f} B/узел")
+    know_map_dict_skeleton = container_bytes(know_map_dict["content"]["parts"])
+    know_map_skeleton = container_bytes(know_map.parts)
+    print(f"  скелет dict:   {know_map_dict_skeleton / nodes:8.0f} B/узел")
+    print(f"  скелет модели: {know_map_skeleton / nodes:8.0f} B/узел")
+    print(f"  обход dict:   {dict_walk * 1e6:8.1f} мкс")
+    print(f"  обход модели: {model_walk * 1e6:8.1f} мкс")
+    print(f"  декодирование dict -> модели: {decode * 1e6:8.1f} мкс")
+    print(f"Книга: {pages} страниц")
+    print(f"  dict:   {book_dict_mem / 1024:8.1f} KB, {book_dict_mem / pages:8.0f} B/страница")
+    print(f"  модели: {book_mem / 1024:8.1f} KB, {book_mem / pages:8.0f} B/страница")
+    print(f"  скелет dict:   {container_bytes(book_dict['book']['pages']) / pages:8.0f} B/страница")
+    print(f"  скелет модели: {container_bytes(book.pages) / pages:8.0f} B/страница")
+
+
+if __name__ == "__main__":
+    main()
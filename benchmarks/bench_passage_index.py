@@ -0,0 +1,67 @@
+# bench_passage_index.py
+"""
+Индекс фрагментов книги (passage_index): время построения и загрузки, задержка
+поиска по всей книге и внутри подглавы, размер контекста финального шага
+(все страницы подглавы против k фрагментов) на размеченных вопросах.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_passage_index
+"""
+import tempfile
+import time
+import timeit
+
+from content_book_parser import PageContentParser
+from json_io import load_book, load_know_map
+from passage_index import PassageIndex
+from routing_eval import load_questions
+from token_counter import estimate_tokens
+
+KNOW_MAP_FILE = "data_know_map/know_map_full.json"
+BOOK_FILE = "data_update/kniga_full_content.json"
+K = 6
+
+
+def per_call_ms(func, number: int = 200) -> float:
+    return min(timeit.repeat(func, number=number, repeat=3)) / number * 1000
+
+
+def main():
+    know_map = load_know_map(KNOW_MAP_FILE)
+    book = load_book(BOOK_FILE)
+    questions = load_questions()
+
+    start = time.perf_counter()
+    index = PassageIndex.build(book, know_map)
+    print(f"Построение: {time.perf_counter() - start:.2f} с, фрагментов {len(index.passages)}, "
+          f"матрица {index.matrix.shape} ({index.matrix.nbytes / 2 ** 20:.1f} МиБ)")
+
+    with tempfile.TemporaryDirectory() as directory:
+        index.save(directory)
+        for mmap in (False, True):
+            start = time.perf_counter()
+            loaded = PassageIndex.load(directory, mmap=mmap)
+            print(f"Загрузка (mmap={mmap}): {(time.perf_counter() - start) * 1000:.1f} мс")
+        del loaded
+
+    question, gold = questions[0]["question"], questions[0]["subchapter_number"]
+    print(f"Поиск top-{K} по всей книге: {per_call_ms(lambda: index.search(question, K)):.3f} мс")
+    print(f"Поиск top-{K} внутри подглавы: "
+          f"{per_call_ms(lambda: index.search(question, K, know_map, subchapter=gold)):.3f} мс")
+
+    parser = PageContentParser(know_map, book)
+    page_tokens = passage_tokens = global_hits = 0
+    for item in questions:
+        gold = item["subchapter_number"]
+        page_tokens += estimate_tokens(parser.parse_final_content(gold))
+        passage_tokens += estimate_tokens(parser.parse_relevant_passages(gold, item["question"], index, K))
+        best = index.search(item["question"], 1)[0]
+        global_hits += best.page_number in know_map.find_subchapter(gold).pages
+    count = len(questions)
+    print(f"Контекст финального шага, токенов на вопрос: страницы {page_tokens / count:.0f}, "
+          f"фрагменты {passage_tokens / count:.0f} ({passage_tokens / page_tokens:.0%})")
+    print(f"Лучший фрагмент по всей книге на страницах нужной подглавы: {global_hits / count:.0%}")
+
+
+if __name__ == "__main__":
+    main()
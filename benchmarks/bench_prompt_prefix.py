@@ -0,0 +1,84 @@
+# bench_prompt_prefix.py
+"""
+Доля входных токенов, пригодных для префикс-кеша провайдера, на workload'е из вопросов
+по всем подглавам книги: прежняя раскладка промптов против prompt_layout.
+
+Навигация выполняется с FakeLLMClient (без сети); через ObservedClient каждый запрос
+попадает в PrefixReuseMeter.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_prompt_prefix
+"""
+from client_observer import ObservedClient
+from fake_llm import FakeLLMClient
+from json_io import load_book, load_know_map
+from pipeline import answer_question
+from prompt_layout import PrefixReuseMeter
+from response_schema import format_name
+
+KNOW_MAP_FILE = "data_know_map/know_map_full.json"
+BOOK_FILE = "data_update/kniga_full_content.json"
+# Кеш провайдеров обычно работает блоками токенов
+BLOCK_TOKENS = 128
+
+LEGACY_LABELS = {
+    "BookPartReasoning": "Описания частей книги: ",
+    "ChapterReasoning": "Описания глав выбранной части книги:\n",
+    "SubchapterReasoning": "Описания подглав выбранной главы:\n",
+}
+
+
+def legacy_messages(kwargs):
+    """
+    Сообщения в том виде, в каком их собирали шаги до prompt_layout.
+    """
+    system, user = kwargs["messages"]
+    system_prompt = kwargs["_raw_system_prompt"]
+    label = format_name(kwargs.get("response_format"))
+    catalogue_and_question = user["content"].split(":\n", 1)[1]
+    catalogue, question = catalogue_and_question.rsplit("\n\nВопрос пользователя: ", 1)
+    if label == "BookPartReasoning":
+        content = f"{LEGACY_LABELS[label]}{catalogue}\nВопрос пользователя: {question}"
+    elif label in LEGACY_LABELS:
+        content = f"{LEGACY_LABELS[label]}{catalogue}\n\nВопрос пользователя: {question}"
+    else:
+        content = f"""
+            Контент книги который был найден ранее специальным ботом по вопрос пользователя: {catalogue}
+            Вопрос пользователя: {question}"""
+    return [{"role": "system", "content": f"ИНСТРУКЦИИ: {system_prompt}"}, {"role": "user", "content": content}]
+
+
+def main():
+    import gigachat_module
+
+    raw_prompts = {
+        "BookPartReasoning": gigachat_module.SYSTEM_PROMPT_PART,
+        "ChapterReasoning": gigachat_module.SYSTEM_PROMPT_CHAPTER,
+        "SubchapterReasoning": gigachat_module.SYSTEM_PROMPT_SUBCHAPTER,
+        "text": gigachat_module.SYSTEM_PROMPT_FINAL,
+    }
+    know_map = load_know_map(KNOW_MAP_FILE)
+    book = load_book(BOOK_FILE)
+    questions = [f"Что автор говорит в разделе «{sub.title}»?" for sub in know_map.iter_subchapters()]
+
+    current = PrefixReuseMeter(block_tokens=BLOCK_TOKENS)
+    legacy = PrefixReuseMeter(block_tokens=BLOCK_TOKENS)
+
+    def observer(kwargs, response, elapsed):
+        current.observer(kwargs, response, elapsed)
+        label = format_name(kwargs.get("response_format"))
+        legacy.observe(legacy_messages({**kwargs, "_raw_system_prompt": raw_prompts[label]}), label)
+
+    client = ObservedClient(FakeLLMClient(), observer)
+    for question in questions:
+        answer_question(client, know_map, book, question)
+
+    print(f"Вопросов: {len(questions)}, блок кеша: {BLOCK_TOKENS} токенов")
+    print("\nПрежняя раскладка:")
+    print(legacy.report())
+    print("\nprompt_layout:")
+    print(current.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# bench_schema_tokens.py
+"""
+Из чего состоят входные токены шагов навигации: системный промпт, JSON-схема
+ответа, каталог и вопрос - с полной схемой Pydantic-модели (прежний
+beta.chat.completions.parse) и с компактной (response_schema.compile_schema).
+
+Запросы перехватываются на FakeLLMClient, вопросы - data_eval/questions.jsonl.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_schema_tokens
+"""
+from typing import Dict, List
+
+from client_observer import ObservedClient
+from fake_llm import FakeLLMClient, split_prompt
+from json_io import load_know_map
+from pipeline import Catalogues, navigate
+from response_schema import SCHEMA_MODES, format_name, schema_tokens
+from routing_eval import load_questions
+from token_counter import estimate_tokens
+
+KNOW_MAP_FILE = "data_know_map/know_map_full.json"
+PARTS = ("system", "schema", "catalogue", "question")
+
+
+def breakdown(kwargs) -> Dict[str, int]:
+    system, user = kwargs["messages"]
+    catalogue, question = split_prompt(user["content"])
+    return {
+        "system": estimate_tokens(system["content"]),
+        "schema": schema_tokens(kwargs.get("response_format")),
+        "catalogue": estimate_tokens(catalogue),
+        "question": estimate_tokens(question),
+    }
+
+
+def measure(know_map, questions: List[str], schema_mode: str) -> Dict[str, Dict[str, int]]:
+    totals: Dict[str, Dict[str, int]] = {}
+
+    def observer(kwargs, response, elapsed):
+        step = totals.setdefault(format_name(kwargs.get("response_format")), dict.fromkeys(PARTS, 0))
+        for key, value in breakdown(kwargs).items():
+            step[key] += value
+
+    client = ObservedClient(FakeLLMClient(), observer)
+    catalogues = Catalogues(know_map)
+    for question in questions:
+        navigate(client, know_map, question, catalogues=catalogues, schema_mode=schema_mode)
+    return totals
+
+
+def main():
+    know_map = load_know_map(KNOW_MAP_FILE)
+    questions = [item["question"] for item in load_questions()]
+    results = {mode: measure(know_map, questions, mode) for mode in SCHEMA_MODES}
+    print(f"Вопросов: {len(questions)}; входных токенов на запрос (среднее)")
+    print(f"{'шаг':22} {'схема':6} " + " ".join(f"{part:>10}" for part in PARTS) + f" {'всего':>10}")
+    for step in results["full"]:
+        for mode in ("full", "slim"):
+            row = results[mode][step]
+            cells = " ".join(f"{row[part] / len(questions):10.0f}" for part in PARTS)
+            print(f"{step:22} {mode:6} {cells} {sum(row.values()) / len(questions):10.0f}")
+    full = sum(sum(row.values()) for row in results["full"].values())
+    slim = sum(sum(row.values()) for row in results["slim"].values())
+    print(f"Навигация целиком: {full / len(questions):.0f} -> {slim / len(questions):.0f} токенов на вопрос "
+          f"({1 - slim / full:.1%} меньше)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# bench_shared_store.py
+"""
+N процессов-воркеров: каждый загружает книгу и карту знаний из JSON (как раньше)
+или открывает общее хранилище shared_store через mmap. Для каждого варианта -
+время старта воркера и его частная память (Private_* из /proc/self/smaps_rollup,
+то есть память, которую воркер не делит с другими процессами) после загрузки и
+ответа на один вопрос (шаги навигации с каталогами + финальный контент).
+
+Запуск из корня репозитория (Linux):
+    python -m benchmarks.bench_shared_store [--workers 4]
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+KNOW_MAP_FILE = "data_know_map/know_map_full.json"
+BOOK_FILE = "data_update/kniga_full_content.json"
+PART, CHAPTER = 3, 7
+
+
+def private_kib() -> int:
+    total = 0
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            if line.startswith(("Private_Clean:", "Private_Dirty:")):
+                total += int(line.split()[1])
+    return total
+
+
+def load_json_models(_store_file):
+    from json_io import load_book, load_know_map
+    return load_know_map(KNOW_MAP_FILE), load_book(BOOK_FILE)
+
+
+def load_shared(store_file):
+    from shared_store import SharedStore
+    store = SharedStore(store_file)
+    return store.know_map, store.book
+
+
+def worker(args):
+    load, store_file = args
+    # Импорты модулей не относятся к данным книги - до замера
+    from content_book_parser import PageContentParser
+    from pipeline import Catalogues
+    import json_io, shared_store  # noqa: F401
+
+    before = private_kib()
+    start = time.perf_counter()
+    know_map, book = load(store_file)
+    startup_ms = (time.perf_counter() - start) * 1000
+    catalogues = Catalogues(know_map)
+    catalogues.parts(), catalogues.chapters(PART), catalogues.subchapters(PART, CHAPTER)
+    subchapter = know_map.find_chapter(PART, CHAPTER).subchapters[0].subchapter_number
+    PageContentParser(know_map, book).parse_final_content(subchapter)
+    return startup_ms, private_kib() - before
+
+
+def main():
+    from shared_store import build_store
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        store_file = build_store(KNOW_MAP_FILE, BOOK_FILE, os.path.join(directory, "book_store.bin"))
+        print(f"Хранилище: {os.path.getsize(store_file) / 1024:.0f} КиБ, воркеров: {args.workers}")
+        context = multiprocessing.get_context("spawn")
+        for name, load in (("JSON в каждом воркере", load_json_models), ("shared_store (mmap)", load_shared)):
+            with context.Pool(args.workers) as pool:
+                results = pool.map(worker, [(load, store_file)] * args.workers)
+            startup = sum(ms for ms, _ in results) / len(results)
+            private = [kib for _, kib in results]
+            print(f"{name:24} старт {startup:7.2f} мс, частная память на воркер {sum(private) / len(private):8.0f} КиБ,"
+                  f" всего {sum(private) / 1024:6.1f} МиБ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# eval_model_cascade.py
+"""
+Каскад моделей навигации (model_cascade) против навигации только моделью шага
+(GigaChat-Max): точность выбора подглавы, доля эскалаций к модели шага,
+задержка навигации, запросы и стоимость на вопрос и сэкономленная стоимость.
+
+Каждый вариант --cascade - строка уровней каскада (model_cascade.parse_tiers),
+например "local:0.3", "faq:0.6,local:0.5" (нужен индекс faq_index, --faq-dir)
+или "local:0.6,GigaChat-Lite:0.7". По умолчанию используется
+FakeLLMClient; он не отличает модели и всегда сообщает confidence 1, поэтому
+на нём осмысленны уровни local, а уровни-модели проверяются на --backend
+real/record/replay (см. routing_eval).
+
+Запуск из корня репозитория:
+    python -m benchmarks.eval_model_cascade [--cascade local:0.3 --cascade local:0.6]
+"""
+import argparse
+import time
+
+from client_observer import ObservedClient
+from faq_index import INDEX_DIR, FaqIndex
+from json_io import load_know_map
+from local_ranker import LocalRanker
+from model_cascade import FAQ_TIER, ModelCascade, parse_tiers
+from pipeline import Catalogues, navigate
+from routing_eval import (
+    KNOW_MAP_FILE,
+    QUESTIONS_FILE,
+    UsageMeter,
+    create_backend,
+    gold_levels,
+    load_questions,
+    percentile
+)
+
+DEFAULT_CASCADES = ["local:0.3", "local:0.5", "local:0.7"]
+
+
+def run(client, know_map, catalogues, questions, routing_mode: str, spec=None, ranker=None, faq_dir=INDEX_DIR):
+    meter = UsageMeter()
+    observed = ObservedClient(client, meter.observer)
+    cascade = None
+    if spec:
+        tiers = parse_tiers(spec)
+        faq_index = FaqIndex.load(faq_dir) if any(tier.name == FAQ_TIER for tier in tiers) else None
+        cascade = ModelCascade(observed, know_map, tiers, ranker, faq_index=faq_index)
+    hits, latencies = 0, []
+    for item in questions:
+        start = time.perf_counter()
+        result = navigate(
+            observed, know_map, item["question"], catalogues=catalogues, routing_mode=routing_mode, cascade=cascade
+        )
+        latencies.append(time.perf_counter() - start)
+        gold = gold_levels(know_map, item["subchapter_number"])["subchapter"]
+        hits += str(result["subchapter"].selected_subchapter) == gold
+    return meter, cascade, hits / len(questions), percentile(latencies, 50)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", choices=["fake", "real", "record", "replay"], default="fake")
+    parser.add_argument("--cassette", help="файл записи ответов для record/replay")
+    parser.add_argument("--questions", default=QUESTIONS_FILE)
+    parser.add_argument("--routing-mode", default="lean")
+    parser.add_argument("--cascade", action="append", help="уровни каскада; можно указать несколько вариантов")
+    parser.add_argument("--faq-dir", default=INDEX_DIR, help="индекс синтетических вопросов для уровня faq")
+    args = parser.parse_args()
+
+    client = create_backend(args.backend, args.cassette, replay_latency=True)
+    know_map = load_know_map(KNOW_MAP_FILE)
+    catalogues = Catalogues(know_map)
+    ranker = LocalRanker(know_map)
+    questions = load_questions(args.questions)
+    count = len(questions)
+
+    print(f"Вопросов: {count}, режим: {args.routing_mode}, бэкенд: {args.backend}")
+    print(f"{'каскад':28} {'acc sub':>8} {'эскалаций':>10} {'p50, с':>8} {'запросов':>9} {'стоимость':>10}"
+          f" {'экономия':>9}")
+    baseline, _, accuracy, p50 = run(client, know_map, catalogues, questions, args.routing_mode)
+    print(f"{'без каскада':28} {accuracy:8.0%} {1:10.0%} {p50:8.3f} {baseline.calls / count:9.2f}"
+          f" {baseline.cost / count:10.4f} {0:9.0%}")
+    for spec in args.cascade or DEFAULT_CASCADES:
+        meter, cascade, accuracy, p50 = run(
+            client, know_map, catalogues, questions, args.routing_mode, spec, ranker, args.faq_dir
+        )
+        report = cascade.report()
+        saved = 1 - meter.cost / baseline.cost if baseline.cost else 0.0
+        print(f"{spec:28} {accuracy:8.0%} {report['escalation_rate']:10.0%} {p50:8.3f} {meter.calls / count:9.2f}"
+              f" {meter.cost / count:10.4f} {saved:9.0%}")
+        by_level = ", ".join(f"{level} {rate:.0%}" for level, rate in report["escalation_rate_by_level"].items())
+        print(f"{'':28} эскалации по уровням: {by_level}; отклонено проверкой: {report['rejected']}")
+
+
+if __name__ == "__main__":
+    main()
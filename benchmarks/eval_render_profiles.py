@@ -0,0 +1,49 @@
+# eval_render_profiles.py
+"""
+Сравнение профилей отображения карты знаний (render_profiles): входные токены
+каталогов на шагах навигации и точность выбора части/главы/подглавы на размеченном
+наборе вопросов (data_eval/questions.jsonl: {"question", "subchapter_number"}).
+
+По умолчанию навигация выполняется с FakeLLMClient (без сети) - это проверка
+того, сколько информации для выбора остаётся в каталоге. С --real запросы идут в
+GigaChat, токен берётся из переменной окружения GIGACHAT_ACCESS_TOKEN.
+
+Запуск из корня репозитория:
+    python -m benchmarks.eval_render_profiles [--real] [--summary-tokens 40]
+"""
+import argparse
+
+from json_io import load_know_map
+from render_profiles import PROFILE_NAMES, get_profile
+from routing_eval import KNOW_MAP_FILE, QUESTIONS_FILE, create_backend, evaluate, load_questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--real", action="store_true", help="навигация через GigaChat вместо FakeLLMClient")
+    parser.add_argument("--summary-tokens", type=int, default=40)
+    parser.add_argument("--questions", default=QUESTIONS_FILE)
+    args = parser.parse_args()
+
+    client = create_backend("real" if args.real else "fake")
+
+    know_map = load_know_map(KNOW_MAP_FILE)
+    questions = load_questions(args.questions)
+    print(f"Вопросов: {len(questions)}, бэкенд: {'GigaChat' if args.real else 'FakeLLMClient'}")
+    print(f"{'профиль':12} {'ток. part':>10} {'ток. chap':>10} {'ток. sub':>10} {'всего':>8}"
+          f" {'acc part':>9} {'acc chap':>9} {'acc sub':>8}")
+    baseline = None
+    for name in PROFILE_NAMES:
+        profile = get_profile(name, know_map, args.summary_tokens)
+        report = evaluate(client, know_map, questions, "sequential", profile)
+        tokens = report["per_question"]["prompt_tokens_by_level"]
+        accuracy = {level: values["top1"] for level, values in report["accuracy"].items()}
+        total = sum(tokens.values())
+        baseline = baseline or total
+        print(f"{name:12} {tokens['part']:10.0f} {tokens['chapter']:10.0f} {tokens['subchapter']:10.0f}"
+              f" {total:8.0f} {accuracy['part']:9.0%} {accuracy['chapter']:9.0%} {accuracy['subchapter']:8.0%}"
+              f"  ({total / baseline:.0%} от full)")
+
+
+if __name__ == "__main__":
+    main()
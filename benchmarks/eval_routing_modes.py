@@ -0,0 +1,58 @@
+# eval_routing_modes.py
+"""
+Сравнение режимов навигации (gigachat_module.ROUTING_MODES): full - три поля
+рассуждений перед выбором, lean - только номер узла, brief - номер, короткое
+обоснование и уверенность. Для каждого режима - точность выбора, задержка
+навигации и число выходных токенов на вопрос.
+
+По умолчанию используется FakeLLMClient, который генерирует текстовые поля по
+--text-words слов и тратит --seconds-per-token на каждый выходной токен, то есть
+моделирует время генерации. С --backend real/record/replay (см. routing_eval)
+сравнение идёт на ответах GigaChat.
+
+Запуск из корня репозитория:
+    python -m benchmarks.eval_routing_modes [--backend replay --cassette routing.jsonl]
+"""
+import argparse
+
+from fake_llm import FakeLLMClient
+from gigachat_module import ROUTING_MODES
+from json_io import load_know_map
+from routing_eval import KNOW_MAP_FILE, QUESTIONS_FILE, create_backend, evaluate, load_questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", choices=["fake", "real", "record", "replay"], default="fake")
+    parser.add_argument("--cassette", help="файл записи ответов для record/replay")
+    parser.add_argument("--strategy", default="sequential")
+    parser.add_argument("--questions", default=QUESTIONS_FILE)
+    parser.add_argument("--text-words", type=int, default=60, help="слов в каждом текстовом поле (fake)")
+    parser.add_argument("--seconds-per-token", type=float, default=0.0002, help="время генерации токена (fake)")
+    args = parser.parse_args()
+
+    if args.backend == "fake":
+        client = FakeLLMClient(text_words=args.text_words, seconds_per_token=args.seconds_per_token)
+    else:
+        client = create_backend(args.backend, args.cassette, replay_latency=True)
+    know_map = load_know_map(KNOW_MAP_FILE)
+    questions = load_questions(args.questions)
+
+    print(f"Вопросов: {len(questions)}, бэкенд: {args.backend}, стратегия: {args.strategy}")
+    print(f"{'режим':7} {'acc part':>9} {'acc chap':>9} {'acc sub':>8} {'p50, с':>8} {'p90, с':>8}"
+          f" {'вход':>7} {'выход':>7}")
+    baseline = None
+    for mode in ROUTING_MODES:
+        report = evaluate(client, know_map, questions, args.strategy, routing_mode=mode)
+        accuracy = {level: values["top1"] for level, values in report["accuracy"].items()}
+        latency, usage = report["latency_seconds"], report["per_question"]
+        baseline = baseline or latency["p50"]
+        print(f"{mode:7} {accuracy['part']:9.0%} {accuracy['chapter']:9.0%} {accuracy['subchapter']:8.0%}"
+              f" {latency['p50']:8.3f} {latency['p90']:8.3f} {usage['prompt_tokens']:7.0f}"
+              f" {usage['completion_tokens']:7.0f}  (p50 {latency['p50'] / baseline:.0%} от full)")
+        if report["errors"]:
+            print(f"        ошибок: {len(report['errors'])}, первая: {report['errors'][0]['error']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+# book_models.py
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+# Значения по умолчанию для отсутствующих полей (раньше подставлялись через .get() в парсерах)
+DEFAULT_TITLE = "Нет заголовка"
+DEFAULT_SUMMARY = "Нет описания"
+
+
+# -------------------------------------------------------------------
+# Узлы карты знаний (know_map_full.json)
+# -------------------------------------------------------------------
+@dataclass(slots=True)
+class Subchapter:
+    title: str
+    summary: str
+    key_points: List[str]
+    subchapter_number: Optional[str]
+    pages: List[int]
+    part_number: Optional[int] = None
+    chapter_number: Optional[int] = None
+
+
+@dataclass(slots=True)
+class Chapter:
+    title: str
+    summary: str
+    key_points: List[str]
+    chapter_number: Optional[int]
+    pages: List[int]
+    subchapters: List[Subchapter]
+    part_number: Optional[int] = None
+
+
+@dataclass(slots=True)
+class Part:
+    title: str
+    summary: str
+    key_points: List[str]
+    part_number: Optional[int]
+    pages: List[int]
+    chapters: List[Chapter]
+
+
+@dataclass(slots=True)
+class Section:
+    """
+    Разделы вне частей: предисловие, вступление, эпилог, приложение.
+    """
+    title: str
+    summary: str
+    key_points: List[str]
+    pages: List[int]
+
+
+@dataclass(slots=True)
+class KnowMap:
+    parts: List[Part]
+    sections: Dict[str, Section] = field(default_factory=dict)
+    _parts_by_number: Dict[int, Part] = field(default_factory=dict, repr=False, compare=False)
+    _subchapters_by_number: Dict[str, Subchapter] = field(default_factory=dict, repr=False, compare=False)
+
+    def __post_init__(self):
+        for part in self.parts:
+            self._parts_by_number.setdefault(part.part_number, part)
+            for chapter in part.chapters:
+                for sub in chapter.subchapters:
+                    self._subchapters_by_number.setdefault(str(sub.subchapter_number), sub)
+
+    def find_part(self, part_number: int) -> Optional[Part]:
+        return self._parts_by_number.get(part_number)
+
+    def find_chapter(self, part_number: int, chapter_number: int) -> Optional[Chapter]:
+        part = self.find_part(part_number)
+        if part is None:
+            return None
+        for chapter in part.chapters:
+            if chapter.chapter_number == chapter_number:
+                return chapter
+        return None
+
+    def find_subchapter(self, subchapter_number: str) -> Optional[Subchapter]:
+        return self._subchapters_by_number.get(str(subchapter_number))
+
+    def iter_chapters(self):
+        for part in self.parts:
+            yield from part.chapters
+
+    def iter_subchapters(self):
+        for part in self.parts:
+            for chapter in part.chapters:
+                yield from chapter.subchapters
+
+
+# -------------------------------------------------------------------
+# Страницы книги (kniga_full_content.json / kniga_only_pages.json)
+# -------------------------------------------------------------------
+@dataclass(slots=True)
+class Quote:
+    id: int
+    text: str
+    author: str
+
+
+@dataclass(slots=True)
+class PageMetadata:
+    isChapterStart: bool = False
+    partTitle: Optional[str] = None
+    quotes: List[Quote] = field(default_factory=list)
+    summary: str = ""
+    keywords: List[str] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class Page:
+    pageNumber: int
+    content: str
+    metadata: Optional[PageMetadata] = None
+
+
+@dataclass(slots=True)
+class Book:
+    pages: List[Page]
+    title: Optional[str] = None
+    author: Optional[str] = None
+    isbn: Optional[str] = None
+    publisher: Optional[str] = None
+    year: Optional[int] = None
+    totalPages: Optional[int] = None
+    _pages_by_number: Dict[int, Page] = field(default_factory=dict, repr=False, compare=False)
+    _indices_by_number: Dict[int, List[int]] = field(default_factory=dict, repr=False, compare=False)
+
+    def __post_init__(self):
+        for index, page in enumerate(self.pages):
+            self._pages_by_number.setdefault(page.pageNumber, page)
+            self._indices_by_number.setdefault(page.pageNumber, []).append(index)
+
+    def get_page(self, page_number: int) -> Optional[Page]:
+        return self._pages_by_number.get(page_number)
+
+    def find_pages(self, page_numbers: Iterable[int]) -> List[Page]:
+        """
+        Все страницы с номерами из page_numbers (и повторяющимися номерами тоже) в порядке книги.
+        """
+        indices = {i for number in page_numbers for i in self._indices_by_number.get(number, ())}
+        return [self.pages[i] for i in sorted(indices)]
+
+
+# -------------------------------------------------------------------
+# Декодирование из dict (результат json.load) в модели
+# -------------------------------------------------------------------
+def _key_points(node: Dict[str, Any]) -> List[str]:
+    key_points = node.get("key_points", [])
+    if isinstance(key_points, list):
+        return [str(point) for point in key_points]
+    return [str(key_points)]
+
+
+def subchapter_from_dict(node: Dict[str, Any], part_number: int = None, chapter_number: int = None) -> Subchapter:
+    return Subchapter(
+        title=node.get("title", DEFAULT_TITLE),
+        summary=node.get("summary", DEFAULT_SUMMARY),
+        key_points=_key_points(node),
+        subchapter_number=node.get("subchapter_number"),
+        pages=node.get("pages", []),
+        part_number=node.get("part_number", part_number),
+        chapter_number=node.get("chapter_number", chapter_number)
+    )
+
+
+def chapter_from_dict(node: Dict[str, Any], part_number: int = None) -> Chapter:
+    part_number = node.get("part_number", part_number)
+    chapter_number = node.get("chapter_number")
+    return Chapter(
+        title=node.get("title", DEFAULT_TITLE),
+        summary=node.get("summary", DEFAULT_SUMMARY),
+        key_points=_key_points(node),
+        chapter_number=chapter_number,
+        pages=node.get("pages", []),
+        subchapters=[subchapter_from_dict(sub, part_number, chapter_number) for sub in node.get("subchapters", [])],
+        part_number=part_number
+    )
+
+
+def part_from_dict(node: Dict[str, Any]) -> Part:
+    part_number = node.get("part_number")
+    return Part(
+        title=node.get("title", DEFAULT_TITLE),
+        summary=node.get("summary", DEFAULT_SUMMARY),
+        key_points=_key_points(node),
+        part_number=part_number,
+        pages=node.get("pages", []),
+        chapters=[chapter_from_dict(ch, part_number) for ch in node.get("chapters", [])]
+    )
+
+
+def know_map_from_dict(data: Dict[str, Any]) -> KnowMap:
+    """
+    Строит KnowMap из содержимого know_map_full.json.
+    """
+    content = data.get("content", {})
+    sections = {
+        name: Section(
+            title=node.get("title", DEFAULT_TITLE),
+            summary=node.get("summary", DEFAULT_SUMMARY),
+            key_points=_key_points(node),
+            pages=node.get("pages", [])
+        )
+        for name, node in content.items()
+        if name != "parts" and isinstance(node, dict)
+    }
+    return KnowMap(parts=[part_from_dict(part) for part in content.get("parts", [])], sections=sections)
+
+
+def page_from_dict(node: Dict[str, Any]) -> Page:
+    metadata = node.get("metadata")
+    if metadata is not None:
+        metadata = PageMetadata(
+            isChapterStart=metadata.get("isChapterStart", False),
+            partTitle=metadata.get("partTitle"),
+            quotes=[Quote(q.get("id"), q.get("text", ""), q.get("author", "")) for q in metadata.get("quotes", [])],
+            summary=metadata.get("summary", ""),
+            keywords=metadata.get("keywords", [])
+        )
+    return Page(pageNumber=node.get("pageNumber"), content=str(node.get("content", "")), metadata=metadata)
+
+
+def book_from_dict(data: Any) -> Book:
+    """
+    Строит Book из kniga_full_content.json ({"book": {...}}) или из списка страниц
+    (kniga_only_pages.json).
+    """
+    if isinstance(data, list):
+        return Book(pages=[page_from_dict(page) for page in data])
+    book = data.get("book", {})
+    return Book(
+        pages=[page_from_dict(page) for page in book.get("pages", [])],
+        title=book.get("title"),
+        author=book.get("author"),
+        isbn=book.get("isbn"),
+        publisher=book.get("publisher"),
+        year=book.get("year"),
+        totalPages=book.get("totalPages")
+    )
@@ -0,0 +1,370 @@
+# cli.py
+"""
+Единая точка входа для конвейера.
+
+    python cli.py answer "Вопрос" [--config pipelines.json --name lite] [--routing-model GigaChat-Lite]
+                                [--profile keywords] [--passages] [--no-cache]
+                                [--speculative-part-width 2 --speculative-chapter-width 2]
+    python cli.py ingest data_row/kniga.pdf|data_update/combined_output.txt --output ... [--index] [--raw]
+    python cli.py annotate [--pages data_update/kniga_only_pages.json] [--deadline 3600] [--packed | --rolling]
+    python cli.py bench [имя ...] [-- аргументы бенчмарка]
+    python cli.py inspect
+
+Глобальный --memory-profile отчёт.json (или MEMORY_PROFILE) включает профилирование
+памяти по этапам (memory_profile) для любой подкоманды.
+
+На уровне модуля импортируются только argparse/os/sys. Тяжёлые зависимости
+(openai, httpx, pydantic, numpy, unstructured) импортируются внутри подкоманд,
+которым они нужны; если необязательного пакета нет, ошибка возникает только при
+запуске такой подкоманды. Поэтому inspect и --help стартуют за миллисекунды.
+"""
+import argparse
+import importlib
+import os
+import sys
+
+KNOW_MAP_FILE = "data_know_map/know_map_full.json"
+PAGES_FILE = "data_update/kniga_only_pages.json"
+PASSAGE_INDEX_DIR = "data_index/passages"
+CACHE_FILE = "navigation_cache.sqlite3"
+SHARED_STORE_FILE = "data_index/book_store.bin"
+FAQ_INDEX_DIR = "data_index/faq"
+BENCHMARKS_DIR = "benchmarks"
+EXTRACT_SCRIPT = "tests/extract_data_for_json_schema.py/test_extract_text_page_element.py"
+
+PAGE_HEADER = "===== Страница "
+
+
+def require(module: str, command: str, package: str = None):
+    """
+    Импортирует необязательную зависимость подкоманды или завершает работу с подсказкой.
+    """
+    try:
+        return importlib.import_module(module)
+    except ImportError:
+        raise SystemExit(f"Для команды {command} нужен пакет {package or module}: pip install {package or module}")
+
+
+def load_script(path: str):
+    """
+    Модуль из файла по пути (каталоги скриптов извлечения не являются пакетами).
+    """
+    import importlib.util
+
+    spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(path))[0], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# -------------------------------------------------------------------
+# answer
+# -------------------------------------------------------------------
+def cmd_answer(args) -> None:
+    require("openai", "answer")
+    require("httpx", "answer")
+    import dataclasses
+    from pipeline import Pipeline, resolve_config
+
+    try:
+        config = resolve_config(args.config, args.name)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    # Явно заданные параметры командной строки важнее конфигурации
+    overrides = {
+        "know_map_file": args.know_map,
+        "book_file": args.book,
+        "passage_index_dir": args.passage_index,
+        "cache_file": "" if args.no_cache else args.cache,
+        "profile": args.profile,
+        "passages": args.passages or None,
+        "part_model": args.part_model or args.routing_model,
+        "chapter_model": args.chapter_model or args.routing_model,
+        "subchapter_model": args.subchapter_model or args.routing_model,
+        "final_model": args.final_model,
+        "schema_mode": args.schema_mode,
+        "routing_mode": args.routing_mode,
+        "speculative_part_width": args.speculative_part_width,
+        "speculative_chapter_width": args.speculative_chapter_width,
+    }
+    config = dataclasses.replace(config, **{key: value for key, value in overrides.items() if value is not None})
+    if config.passages:
+        require("numpy", "answer --passages")
+
+    pipeline = Pipeline(config)
+    try:
+        pipeline.client
+    except ValueError as e:
+        raise SystemExit(str(e))
+    result = pipeline.answer(args.question)
+    print(f"Часть {result['part'].selected_part}, глава {result['chapter'].selected_chapter}, "
+          f"подглава {result['subchapter'].selected_subchapter}")
+    confidence = getattr(result["subchapter"], "confidence", None)
+    if confidence is not None:
+        print(f"Уверенность: {confidence:.2f}. {result['subchapter'].justification}")
+    print(result["answer"])
+
+
+# -------------------------------------------------------------------
+# ingest
+# -------------------------------------------------------------------
+def read_page_text(path: str):
+    """
+    Страницы из текстового вывода извлечения (combined_output.txt): блоки,
+    начинающиеся строкой "===== Страница N =====".
+    """
+    pages, number, lines = [], None, []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith(PAGE_HEADER):
+                if number is not None:
+                    pages.append({"pageNumber": number, "content": "".join(lines).strip()})
+                number, lines = int(line[len(PAGE_HEADER):].split()[0]), []
+            elif number is not None:
+                lines.append(line)
+    if number is not None:
+        pages.append({"pageNumber": number, "content": "".join(lines).strip()})
+    return pages
+
+
+def extract_pages(args):
+    """
+    Страницы книги из PDF или текстового файла с маркерами страниц.
+    """
+    if args.source.lower().endswith(".pdf"):
+        require("unstructured", "ingest (PDF)", "unstructured[pdf]")
+        extractor = load_script(EXTRACT_SCRIPT)
+        pages_by_number = extractor.process_pdf(args.source, strategy=args.strategy)
+        pages = [
+            {"pageNumber": number, "content": "\n".join(str(element.text) for element in elements)}
+            for number, elements in sorted(pages_by_number.items())
+        ]
+    else:
+        pages = read_page_text(args.source)
+    return pages
+
+
+def cmd_ingest(args) -> None:
+    import memory_profile
+    from json_io import dump_json
+
+    with memory_profile.stage("ingest.extract"):
+        pages = extract_pages(args)
+    if not args.raw:
+        from text_normalizer import normalize_pages
+
+        with memory_profile.stage("ingest.normalize"):
+            report = normalize_pages(pages, args.title)
+        print(f"Нормализация: {report}")
+    with memory_profile.stage("ingest.save"):
+        dump_json({"book": {"title": args.title, "pages": pages}}, args.output)
+    print(f"Страниц: {len(pages)} -> {args.output}")
+
+    if args.index:
+        require("numpy", "ingest --index")
+        from json_io import load_book, load_know_map
+        from passage_index import PassageIndex
+        from know_map_store import build_shards
+        from shared_store import build_store
+        from render_profiles import build_condensed_summaries, save_condensed_summaries
+
+        with memory_profile.stage("load.know_map"):
+            know_map = load_know_map(args.know_map)
+        with memory_profile.stage("load.book"):
+            book = load_book(args.output)
+        with memory_profile.stage("index.passages"):
+            index = PassageIndex.build(book, know_map)
+            index.save(args.passage_index)
+        with memory_profile.stage("index.summaries"):
+            condensed_file = save_condensed_summaries(build_condensed_summaries(know_map), args.know_map)
+        with memory_profile.stage("index.shards"):
+            build_shards(args.know_map)
+        with memory_profile.stage("index.shared_store"):
+            build_store(args.know_map, args.output, SHARED_STORE_FILE)
+        print(f"Индекс фрагментов: {len(index.passages)} -> {args.passage_index}")
+        print(f"Выжимки summary: {condensed_file}")
+        print(f"Хранилище для воркеров: {SHARED_STORE_FILE}")
+        # Вопросы генерируются отдельным офлайн-заданием; индекс пересобирается под новую карту знаний
+        from faq_index import FAQ_FILE, build_faq_index
+        if os.path.exists(FAQ_FILE):
+            with memory_profile.stage("index.faq"):
+                faq_index = build_faq_index(args.know_map, FAQ_FILE, FAQ_INDEX_DIR)
+            print(f"Индекс синтетических вопросов: {len(faq_index.questions)} -> {FAQ_INDEX_DIR}")
+
+
+# -------------------------------------------------------------------
+# annotate
+# -------------------------------------------------------------------
+def cmd_annotate(args) -> None:
+    require("openai", "annotate")
+    from tests.batch_llm_api_for_metadata.send_online import annotate_pages
+
+    mode, _ = annotate_pages(args.pages, deadline_seconds=args.deadline, packed=args.packed, rolling=args.rolling)
+    print(f"Режим разметки: {mode}")
+
+
+# -------------------------------------------------------------------
+# bench
+# -------------------------------------------------------------------
+def list_benchmarks():
+    return sorted(
+        name[:-3] for name in os.listdir(BENCHMARKS_DIR)
+        if name.endswith(".py") and name.startswith(("bench_", "eval_"))
+    )
+
+
+def cmd_bench(args) -> None:
+    import runpy
+
+    available = list_benchmarks()
+    if not args.names:
+        print("\n".join(available))
+        return
+    for name in args.names:
+        module = name if name in available else f"bench_{name}"
+        if module not in available:
+            raise SystemExit(f"Неизвестный бенчмарк: {name}. Доступны: {', '.join(available)}")
+        print(f"== {module}")
+        sys.argv = [module, *args.extra]
+        runpy.run_module(f"{BENCHMARKS_DIR}.{module}", run_name="__main__")
+
+
+# -------------------------------------------------------------------
+# inspect
+# -------------------------------------------------------------------
+def npy_shape(path: str):
+    """
+    Форма массива из заголовка .npy без импорта numpy.
+    """
+    import ast
+
+    with open(path, "rb") as f:
+        if f.read(6) != b"\x93NUMPY":
+            raise ValueError(f"{path}: не .npy файл")
+        major = f.read(2)[0]
+        header_length = int.from_bytes(f.read(2 if major == 1 else 4), "little")
+        return ast.literal_eval(f.read(header_length).decode("latin1"))["shape"]
+
+
+def cmd_inspect(args) -> None:
+    from json_io import load_know_map
+
+    know_map = load_know_map(args.know_map)
+    chapters = sum(1 for _ in know_map.iter_chapters())
+    subchapters = sum(1 for _ in know_map.iter_subchapters())
+    print(f"Карта знаний {args.know_map}: частей {len(know_map.parts)}, глав {chapters}, подглав {subchapters}")
+
+    matrix_file = os.path.join(args.passage_index, "matrix.npy")
+    if os.path.exists(matrix_file):
+        rows, dim = npy_shape(matrix_file)
+        print(f"Индекс фрагментов {args.passage_index}: фрагментов {rows}, размерность {dim}")
+    else:
+        print(f"Индекс фрагментов {args.passage_index}: не построен (cli.py ingest ... --index)")
+
+    if os.path.exists(SHARED_STORE_FILE):
+        print(f"Хранилище для воркеров {SHARED_STORE_FILE}: {os.path.getsize(SHARED_STORE_FILE) / 1024:.0f} КиБ")
+    else:
+        print(f"Хранилище для воркеров {SHARED_STORE_FILE}: не построено (cli.py ingest ... --index)")
+
+    faq_matrix_file = os.path.join(FAQ_INDEX_DIR, "matrix.npy")
+    if os.path.exists(faq_matrix_file):
+        rows, _ = npy_shape(faq_matrix_file)
+        print(f"Индекс синтетических вопросов {FAQ_INDEX_DIR}: вопросов {rows}")
+    else:
+        print(f"Индекс синтетических вопросов {FAQ_INDEX_DIR}: не построен "
+              f"(python -m tests.batch_llm_api_for_metadata.send_faq)")
+
+    if os.path.exists(args.cache):
+        import sqlite3
+
+        with sqlite3.connect(args.cache) as conn:
+            count = conn.execute("SELECT COUNT(DISTINCT question) FROM navigation").fetchone()[0]
+        print(f"Кеш навигации {args.cache}: вопросов {count}")
+    else:
+        print(f"Кеш навигации {args.cache}: пуст")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cli.py", description="Навигация по книге и ответы на вопросы")
+    parser.add_argument("--know-map")
+    parser.add_argument("--passage-index")
+    parser.add_argument("--cache")
+    parser.add_argument(
+        "--memory-profile", default=os.environ.get("MEMORY_PROFILE"),
+        help="JSON-отчёт памяти по этапам (tracemalloc и RSS), см. memory_profile"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    answer = commands.add_parser("answer", help="ответить на вопрос по книге")
+    answer.add_argument("question")
+    answer.add_argument("--config", help="JSON-файл конфигурации (по умолчанию $PIPELINE_CONFIG или PIPELINE_*)")
+    answer.add_argument("--name", help="имя конфигурации в файле с несколькими")
+    answer.add_argument("--book")
+    answer.add_argument("--profile", choices=["full", "truncated", "keywords", "condensed"])
+    answer.add_argument("--passages", action="store_true", help="в финальный промпт - только релевантные фрагменты")
+    answer.add_argument("--no-cache", action="store_true")
+    answer.add_argument("--routing-model", help="модель для всех шагов навигации")
+    answer.add_argument("--part-model")
+    answer.add_argument("--chapter-model")
+    answer.add_argument("--subchapter-model")
+    answer.add_argument("--final-model")
+    answer.add_argument("--schema-mode", choices=["slim", "full"], help="схема ответа шагов навигации")
+    answer.add_argument("--routing-mode", choices=["full", "lean", "brief"],
+                        help="full - с рассуждениями, lean - только выбор, brief - выбор с обоснованием")
+    answer.add_argument("--speculative-part-width", type=int,
+                        help="спекулятивная навигация: частей-кандидатов, разворачиваемых заранее (0 - выкл.)")
+    answer.add_argument("--speculative-chapter-width", type=int,
+                        help="спекулятивная навигация: глав-кандидатов в каждой ветке (0 - выкл.)")
+    answer.set_defaults(handler=cmd_answer)
+
+    ingest = commands.add_parser("ingest", help="извлечь страницы книги из PDF или текстового вывода")
+    ingest.add_argument("source")
+    ingest.add_argument("--output", required=True, help="куда записать страницы (формат kniga_full_content.json)")
+    ingest.add_argument("--title")
+    ingest.add_argument("--strategy", default="fast", help="стратегия unstructured для PDF")
+    ingest.add_argument("--raw", action="store_true", help="без нормализации текста страниц (text_normalizer)")
+    ingest.add_argument(
+        "--index", action="store_true",
+        help="построить индекс фрагментов, выжимки, шарды карты знаний и хранилище для воркеров"
+    )
+    ingest.set_defaults(handler=cmd_ingest)
+
+    annotate = commands.add_parser("annotate", help="заполнить summary/keywords страниц через LLM")
+    annotate.add_argument("--pages", default=PAGES_FILE)
+    annotate.add_argument("--deadline", type=float, help="дедлайн в секундах для выбора online/batch")
+    mode = annotate.add_mutually_exclusive_group()
+    mode.add_argument("--packed", action="store_true", help="по несколько страниц в запросе (pages_A-B)")
+    mode.add_argument("--rolling", action="store_true", help="summary предыдущей страницы главы в запросе (только онлайн)")
+    annotate.set_defaults(handler=cmd_annotate)
+
+    bench = commands.add_parser("bench", help="запустить бенчмарки (без имён - список)")
+    bench.add_argument("names", nargs="*")
+    bench.set_defaults(handler=cmd_bench)
+
+    inspect = commands.add_parser("inspect", help="состояние карты знаний, индексов и кеша")
+    inspect.set_defaults(handler=cmd_inspect)
+    return parser
+
+
+def main(argv=None) -> None:
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # Всё после "--" передаётся бенчмарку как есть
+    extra = []
+    if "--" in argv:
+        position = argv.index("--")
+        argv, extra = argv[:position], argv[position + 1:]
+    args = build_parser().parse_args(argv)
+    args.extra = extra
+    # answer берёт пути из конфигурации конвейера, остальным подкомандам нужны значения по умолчанию
+    if args.command != "answer":
+        args.know_map = args.know_map or KNOW_MAP_FILE
+        args.passage_index = args.passage_index or PASSAGE_INDEX_DIR
+        args.cache = args.cache or CACHE_FILE
+    if args.memory_profile:
+        import memory_profile
+        memory_profile.enable(args.memory_profile)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# client_observer.py
+"""
+Прокси OpenAI-совместимого клиента, который сообщает наблюдателю о каждом запросе.
+
+Перехватываются методы, которые использует проект:
+client.chat.completions.create/parse и client.beta.chat.completions.parse.
+Наблюдатель получает аргументы запроса, ответ и время выполнения в секундах.
+"""
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict
+
+Observer = Callable[[Dict[str, Any], Any, float], None]
+
+
+class _ObservedCompletions:
+    def __init__(self, completions, observer: Observer):
+        self._completions = completions
+        self._observer = observer
+
+    def _call(self, method: str, kwargs: Dict[str, Any]):
+        start = time.perf_counter()
+        response = getattr(self._completions, method)(**kwargs)
+        self._observer(kwargs, response, time.perf_counter() - start)
+        return response
+
+    def create(self, **kwargs):
+        return self._call("create", kwargs)
+
+    def parse(self, **kwargs):
+        return self._call("parse", kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._completions, name)
+
+
+class ObservedClient:
+    def __init__(self, client, observer: Observer):
+        self._client = client
+        self.chat = SimpleNamespace(completions=_ObservedCompletions(client.chat.completions, observer))
+        self.beta = SimpleNamespace(
+            chat=SimpleNamespace(completions=_ObservedCompletions(client.beta.chat.completions, observer))
+        )
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
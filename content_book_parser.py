@@ -1,7 +1,32 @@
 # content_book_parser.py
 
-import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Union
+
+from book_models import Book, Chapter, KnowMap, Part, Subchapter, book_from_dict, know_map_from_dict
+from render_profiles import FULL_PROFILE, RenderProfile, node_key
+
+
+def as_know_map(data: Union[KnowMap, Dict[str, Any]]) -> KnowMap:
+    """
+    Возвращает KnowMap; dict (результат json.load) декодируется в модели один раз.
+    Прочие объекты (know_map_store.KnowMapStore) передаются как есть.
+    """
+    return know_map_from_dict(data) if isinstance(data, dict) else data
+
+
+def format_key_points(key_points: List[str]) -> str:
+    return ", ".join(key_points)
+
+
+def format_block(tag: str, number: str, title: str, summary: Optional[str], key_points: str) -> str:
+    """
+    Блок узла карты знаний для промпта; при summary=None строка <summary> не выводится.
+    """
+    lines = [f"<{tag}> {number}:", f"<title>: {title}"]
+    if summary is not None:
+        lines.append(f"<summary>: {summary}")
+    lines.append(f"<key_points>: {key_points}")
+    return "\n".join(lines)
 
 class ContentPartsParser:
     """
@@ -21,42 +46,37 @@ class ContentPartsParser:
             ]
         }
     }
+
+    Данные декодируются в KnowMap (book_models) один раз, парсер работает с моделями.
+    profile (render_profiles) задаёт, насколько подробно выводятся summary и key_points.
     """
-    def __init__(self, data: Dict[str, Any]):
-        self.data = data
+    def __init__(self, data: Union[KnowMap, Dict[str, Any]], profile: RenderProfile = FULL_PROFILE):
+        self.know_map = as_know_map(data)
+        self.profile = profile
 
-    def parse_title(self, part: Dict[str, Any]) -> str:
-        return part.get("title", "Нет заголовка")
+    def parse_title(self, part: Part) -> str:
+        return part.title
 
-    def parse_summary(self, part: Dict[str, Any]) -> str:
-        return part.get("summary", "Нет описания")
+    def parse_summary(self, part: Part) -> str:
+        return part.summary
 
-    def parse_key_points(self, part: Dict[str, Any]) -> str:
-        key_points = part.get("key_points", [])
-        if isinstance(key_points, list):
-            return ", ".join(str(point) for point in key_points)
-        return str(key_points)
+    def parse_key_points(self, part: Part) -> str:
+        return format_key_points(part.key_points)
 
-    def parse_part_number(self, part: Dict[str, Any]) -> str:
-        return str(part.get("part_number", "Не указан номер"))
+    def parse_part_number(self, part: Part) -> str:
+        return "Не указан номер" if part.part_number is None else str(part.part_number)
 
-    def format_part(self, part: Dict[str, Any]) -> str:
+    def format_part(self, part: Part) -> str:
         title = self.parse_title(part)
-        summary = self.parse_summary(part)
-        key_points = self.parse_key_points(part)
+        summary = None
+        if self.profile.include_summary:
+            summary = self.profile.render_summary(node_key("part", part.part_number), self.parse_summary(part))
+        key_points = format_key_points(self.profile.render_key_points(part.key_points))
         part_number = self.parse_part_number(part)
-
-        formatted = (
-            f"<Part> {part_number}:\n"
-            f"<title>: {title}\n"
-            f"<summary>: {summary}\n"
-            f"<key_points>: {key_points}"
-        )
-        return formatted
+        return format_block("Part", part_number, title, summary, key_points)
 
     def parse_parts(self) -> List[str]:
-        parts = self.data.get("content", {}).get("parts", [])
-        return [self.format_part(part) for part in parts]
+        return [self.format_part(part) for part in self.know_map.parts]
     
     
 class ChapterParser:
@@ -84,48 +104,39 @@ class ChapterParser:
         }
     }
     """
-    def __init__(self, data: Dict[str, Any]):
-        self.data = data
+    def __init__(self, data: Union[KnowMap, Dict[str, Any]], profile: RenderProfile = FULL_PROFILE):
+        self.know_map = as_know_map(data)
+        self.profile = profile
 
-    def parse_title(self, chapter: Dict[str, Any]) -> str:
-        return chapter.get("title", "Нет заголовка")
+    def parse_title(self, chapter: Chapter) -> str:
+        return chapter.title
 
-    def parse_summary(self, chapter: Dict[str, Any]) -> str:
-        return chapter.get("summary", "Нет описания")
+    def parse_summary(self, chapter: Chapter) -> str:
+        return chapter.summary
 
-    def parse_key_points(self, chapter: Dict[str, Any]) -> str:
-        key_points = chapter.get("key_points", [])
-        if isinstance(key_points, list):
-            return ", ".join(str(point) for point in key_points)
-        return str(key_points)
+    def parse_key_points(self, chapter: Chapter) -> str:
+        return format_key_points(chapter.key_points)
 
-    def parse_chapter_number(self, chapter: Dict[str, Any]) -> str:
-        return str(chapter.get("chapter_number", "Не указан номер"))
+    def parse_chapter_number(self, chapter: Chapter) -> str:
+        return "Не указан номер" if chapter.chapter_number is None else str(chapter.chapter_number)
 
-    def format_chapter(self, chapter: Dict[str, Any]) -> str:
+    def format_chapter(self, chapter: Chapter) -> str:
         title = self.parse_title(chapter)
-        summary = self.parse_summary(chapter)
-        key_points = self.parse_key_points(chapter)
+        summary = None
+        if self.profile.include_summary:
+            summary = self.profile.render_summary(node_key("chapter", chapter.chapter_number), self.parse_summary(chapter))
+        key_points = format_key_points(self.profile.render_key_points(chapter.key_points))
         chapter_number = self.parse_chapter_number(chapter)
-
-        formatted = (
-            f"<Chapter> {chapter_number}:\n"
-            f"<title>: {title}\n"
-            f"<summary>: {summary}\n"
-            f"<key_points>: {key_points}"
-        )
-        return formatted
+        return format_block("Chapter", chapter_number, title, summary, key_points)
 
     def parse_chapters_by_part(self, selected_part: int) -> List[str]:
         """
         Находит объект part с заданным part_number и парсит все главы из него.
         """
-        parts = self.data.get("content", {}).get("parts", [])
-        for part in parts:
-            if part.get("part_number") == selected_part:
-                chapters = part.get("chapters", [])
-                return [self.format_chapter(ch) for ch in chapters]
-        return []
+        part = self.know_map.find_part(selected_part)
+        if part is None:
+            return []
+        return [self.format_chapter(ch) for ch in part.chapters]
     
 class SubchapterParser:
     """
@@ -159,47 +170,36 @@ class SubchapterParser:
         }
     }
     """
-    def __init__(self, data: Dict[str, Any]):
-        self.data = data
+    def __init__(self, data: Union[KnowMap, Dict[str, Any]], profile: RenderProfile = FULL_PROFILE):
+        self.know_map = as_know_map(data)
+        self.profile = profile
 
-    def parse_title(self, subchapter: Dict[str, Any]) -> str:
-        return subchapter.get("title", "Нет заголовка")
+    def parse_title(self, subchapter: Subchapter) -> str:
+        return subchapter.title
 
-    def parse_summary(self, subchapter: Dict[str, Any]) -> str:
-        return subchapter.get("summary", "Нет описания")
+    def parse_summary(self, subchapter: Subchapter) -> str:
+        return subchapter.summary
 
-    def parse_key_points(self, subchapter: Dict[str, Any]) -> str:
-        key_points = subchapter.get("key_points", [])
-        if isinstance(key_points, list):
-            return ", ".join(str(point) for point in key_points)
-        return str(key_points)
+    def parse_key_points(self, subchapter: Subchapter) -> str:
+        return format_key_points(subchapter.key_points)
 
-    def parse_subchapter_number(self, subchapter: Dict[str, Any]) -> str:
-        return str(subchapter.get("subchapter_number", "Не указан номер"))
+    def parse_subchapter_number(self, subchapter: Subchapter) -> str:
+        return "Не указан номер" if subchapter.subchapter_number is None else str(subchapter.subchapter_number)
 
-    def format_subchapter(self, subchapter: Dict[str, Any]) -> str:
+    def format_subchapter(self, subchapter: Subchapter) -> str:
         title = self.parse_title(subchapter)
-        summary = self.parse_summary(subchapter)
-        key_points = self.parse_key_points(subchapter)
+        summary = None
+        if self.profile.include_summary:
+            summary = self.profile.render_summary(node_key("subchapter", subchapter.subchapter_number), self.parse_summary(subchapter))
+        key_points = format_key_points(self.profile.render_key_points(subchapter.key_points))
         subchapter_number = self.parse_subchapter_number(subchapter)
-        formatted = (
-            f"<Subchapter> {subchapter_number}:\n"
-            f"<title>: {title}\n"
-            f"<summary>: {summary}\n"
-            f"<key_points>: {key_points}"
-        )
-        return formatted
+        return format_block("Subchapter", subchapter_number, title, summary, key_points)
 
     def parse_subchapters_by_chapter(self, selected_part: int, selected_chapter: int) -> List[str]:
-        parts = self.data.get("content", {}).get("parts", [])
-        for part in parts:
-            if part.get("part_number") == selected_part:
-                chapters = part.get("chapters", [])
-                for chapter in chapters:
-                    if chapter.get("chapter_number") == selected_chapter:
-                        subchapters = chapter.get("subchapters", [])
-                        return [self.format_subchapter(sub) for sub in subchapters]
-        return []
+        chapter = self.know_map.find_chapter(selected_part, selected_chapter)
+        if chapter is None:
+            return []
+        return [self.format_subchapter(sub) for sub in chapter.subchapters]
     
     
 class PageContentParser:
@@ -249,36 +249,30 @@ class PageContentParser:
         }
     }
     """
-    def __init__(self, know_map_data: Dict[str, Any], kniga_data: Dict[str, Any]):
-        self.know_map_data = know_map_data
-        self.kniga_data = kniga_data
+    def __init__(
+        self,
+        know_map_data: Union[KnowMap, Dict[str, Any]],
+        kniga_data: Union[Book, Dict[str, Any]]
+    ):
+        self.know_map = as_know_map(know_map_data)
+        # dict/list (результат json.load) декодируется, Book и shared_store.SharedBook - как есть
+        self.book = book_from_dict(kniga_data) if isinstance(kniga_data, (dict, list)) else kniga_data
 
     def get_pages_for_subchapter(self, selected_subchapter: str) -> List[int]:
         """
         Ищем по всему know_map_data объект подглавы с subchapter_number, равным selected_subchapter,
         и возвращаем список номеров страниц из поля pages.
         """
-        parts = self.know_map_data.get("content", {}).get("parts", [])
-        for part in parts:
-            chapters = part.get("chapters", [])
-            for chapter in chapters:
-                subchapters = chapter.get("subchapters", [])
-                for sub in subchapters:
-                    if str(sub.get("subchapter_number")) == str(selected_subchapter):
-                        return sub.get("pages", [])
-        return []
+        sub = self.know_map.find_subchapter(selected_subchapter)
+        return sub.pages if sub is not None else []
 
     def get_page_content(self, page_numbers: List[int]) -> str:
         """
-        По списку номеров страниц ищем в kniga_data все объекты страниц,
-        извлекаем их поле content и объединяем в одну строку.
+        По списку номеров страниц берём через book.find_pages все страницы с этими
+        номерами (включая повторяющиеся номера) в порядке книги; у SharedBook
+        декодируются только они. Их поле content объединяем в одну строку.
         """
-        pages = self.kniga_data.get("book", {}).get("pages", [])
-        contents = []
-        for page in pages:
-            if page.get("pageNumber") in page_numbers:
-                contents.append(str(page.get("content", "")))
-        return "\n\n".join(contents)
+        return "\n\n".join(page.content for page in self.book.find_pages(page_numbers))
 
     def parse_final_content(self, selected_subchapter: str) -> str:
         """
@@ -286,6 +280,18 @@ class PageContentParser:
         """
         page_numbers = self.get_pages_for_subchapter(selected_subchapter)
         return self.get_page_content(page_numbers)
+
+    def parse_relevant_passages(self, selected_subchapter: str, question: str, index, k: int = 6) -> str:
+        """
+        Вместо целых страниц подглавы - k фрагментов из PassageIndex (passage_index),
+        ближайших к вопросу. Если в индексе нет фрагментов подглавы, возвращает страницы целиком.
+        """
+        from passage_index import join_passages
+
+        passages = index.search(question, k, self.know_map, subchapter=selected_subchapter)
+        if not passages:
+            return self.parse_final_content(selected_subchapter)
+        return join_passages(passages)
     
     
 # Пример тестирования новых функций (при запуске напрямую)
@@ -0,0 +1,173 @@
+# fake_llm.py
+"""
+Локальная подмена OpenAI/GigaChat-клиента для тестов и бенчмарков без сети.
+
+FakeLLMClient повторяет используемую часть интерфейса OpenAI-клиента:
+client.beta.chat.completions.parse(...) и client.chat.completions.create(...).
+Выбор части/главы/подглавы детерминирован: берётся блок каталога
+(<Part>/<Chapter>/<Subchapter>) с наибольшим пересечением слов с вопросом.
+На запрос с нумерованным списком вопросов (prompt_layout.build_batch_messages)
+и схемой {"selections": [...]} выбор делается для каждого вопроса.
+"""
+import json
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from prompt_layout import QUESTION_MARKER, QUESTIONS_MARKER
+from response_schema import schema_tokens
+from token_counter import estimate_messages_tokens, estimate_tokens
+
+_BLOCK_PATTERN = re.compile(
+    r"<(?:Part|Chapter|Subchapter)> ([^:\n]+):\n(.*?)(?=\n\n<(?:Part|Chapter|Subchapter)> |\Z)",
+    re.S
+)
+_WORD_PATTERN = re.compile(r"\w{3,}", re.UNICODE)
+_NUMBERED_QUESTION = re.compile(r"^(\d+)\. (.+)$", re.M)
+
+
+def _words(text: str) -> set:
+    # Грубая основа слова: русские словоформы отличаются в основном окончаниями
+    return {word.lower()[:6] for word in _WORD_PATTERN.findall(text)}
+
+
+def split_prompt(user_content: str):
+    """
+    Делит пользовательское сообщение на каталог и вопрос (или список вопросов).
+    """
+    marker = QUESTIONS_MARKER if QUESTIONS_MARKER in user_content else QUESTION_MARKER
+    catalogue, _, question = user_content.rpartition(marker)
+    return catalogue, question.strip()
+
+
+def choose_block(catalogue: str, question: str) -> Optional[str]:
+    """
+    Номер блока каталога с наибольшим пересечением слов с вопросом (первый при равенстве).
+    """
+    question_words = _words(question)
+    best_number, best_score = None, -1
+    for number, body in _BLOCK_PATTERN.findall(catalogue):
+        score = len(question_words & _words(body))
+        if score > best_score:
+            best_number, best_score = number.strip(), score
+    return best_number
+
+
+def _fake_value(name: str, schema: Dict[str, Any], number: Optional[str], text_words: int = 0) -> Any:
+    kind = schema.get("type")
+    if name.startswith("selected_"):
+        if kind == "integer":
+            return int(number) if number and number.isdigit() else 1
+        return number or ""
+    if kind == "string":
+        text = f"fake {name}" + " рассуждение" * text_words
+        return text[:schema["maxLength"]] if "maxLength" in schema else text
+    if kind in ("integer", "number"):
+        return 1
+    if kind == "boolean":
+        return True
+    if kind == "array":
+        return []
+    if kind == "object":
+        return {
+            key: _fake_value(key, value, number, text_words)
+            for key, value in schema.get("properties", {}).items()
+        }
+    return None
+
+
+def make_completion(content: str, parsed: Any, prompt_tokens: int, completion_tokens: int):
+    """
+    Объект ответа в форме ChatCompletion: choices[0].message.content/parsed и usage.
+    """
+    message = SimpleNamespace(role="assistant", content=content, parsed=parsed, refusal=None)
+    return SimpleNamespace(
+        choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")],
+        usage=SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens
+        )
+    )
+
+
+class FakeLLMClient:
+    """
+    Детерминированный клиент без сети.
+
+    delay - искусственная задержка каждого вызова (секунды), чтобы проверять
+    параллельность и объединение одинаковых запросов.
+    text_words - длина текстовых полей структурированного ответа в словах, а
+    seconds_per_token - задержка на каждый выходной токен: вместе они моделируют
+    генерацию длинных рассуждений (время ответа растёт с длиной вывода).
+    calls - журнал вызовов: model, messages, response_format.
+    """
+    def __init__(
+        self,
+        delay: float = 0.0,
+        answer: str = "Ответ fake-модели по найденному контенту.",
+        text_words: int = 0,
+        seconds_per_token: float = 0.0
+    ):
+        self.delay = delay
+        self.answer = answer
+        self.text_words = text_words
+        self.seconds_per_token = seconds_per_token
+        self.calls: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        completions = SimpleNamespace(parse=self._parse, create=self._create)
+        self.chat = SimpleNamespace(completions=completions)
+        self.beta = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+    def _record(self, model: str, messages: List[dict], response_format: Any) -> None:
+        with self._lock:
+            self.calls.append({"model": model, "messages": messages, "response_format": response_format})
+        if self.delay:
+            time.sleep(self.delay)
+
+    def _response(self, messages: List[dict], content: str, parsed: Any = None, response_format: Any = None):
+        # Схема формата ответа тоже входит во входные токены запроса
+        prompt_tokens = estimate_messages_tokens(messages) + schema_tokens(response_format)
+        completion_tokens = estimate_tokens(content)
+        if self.seconds_per_token:
+            time.sleep(completion_tokens * self.seconds_per_token)
+        return make_completion(content, parsed, prompt_tokens, completion_tokens)
+
+    def _selection(self, messages: List[dict]) -> Optional[str]:
+        catalogue, question = split_prompt(str(messages[-1]["content"]))
+        return choose_block(catalogue, question)
+
+    def _values(self, schema: Dict[str, Any], messages: List[dict]) -> Dict[str, Any]:
+        if "selections" not in schema.get("properties", {}):
+            return _fake_value("", {**schema, "type": "object"}, self._selection(messages), self.text_words)
+        # Несколько вопросов: элемент схемы обычно вынесен в $defs
+        item = schema["properties"]["selections"]["items"]
+        if "$ref" in item:
+            item = schema["$defs"][item["$ref"].rsplit("/", 1)[-1]]
+        catalogue, questions = split_prompt(str(messages[-1]["content"]))
+        selections = []
+        for number, question in _NUMBERED_QUESTION.findall(questions):
+            values = _fake_value("", {**item, "type": "object"}, choose_block(catalogue, question), self.text_words)
+            selections.append({**values, "question_id": int(number)})
+        return {"selections": selections}
+
+    def _parse(self, model: str, messages: List[dict], response_format, **kwargs):
+        """
+        Аналог beta.chat.completions.parse: response_format - Pydantic-модель.
+        """
+        self._record(model, messages, response_format)
+        values = self._values(response_format.model_json_schema(), messages)
+        parsed = response_format.model_validate(values)
+        return self._response(messages, parsed.model_dump_json(), parsed, response_format)
+
+    def _create(self, model: str, messages: List[dict], response_format: Dict[str, Any] = None, **kwargs):
+        """
+        Аналог chat.completions.create: с json_schema возвращает JSON по схеме, иначе - текст.
+        """
+        self._record(model, messages, response_format)
+        if response_format and response_format.get("type") == "json_schema":
+            values = self._values(response_format["json_schema"]["schema"], messages)
+            return self._response(messages, json.dumps(values, ensure_ascii=False), response_format=response_format)
+        return self._response(messages, self.answer)
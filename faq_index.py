@@ -0,0 +1,149 @@
+# faq_index.py
+"""
+Индекс синтетических вопросов к подглавам (synthetic FAQ).
+
+Навигация для всех пользователей решает одну и ту же задачу, поэтому её можно
+сделать заранее: офлайн-задание (tests/batch_llm_api_for_metadata/send_faq.py)
+генерирует для каждой подглавы know_map_full.json вероятные вопросы читателей
+и сохраняет их в FAQ_FILE ({"номер подглавы": ["вопрос", ...]}). Здесь вопросы
+векторизуются тем же hashing trick, что и фрагменты passage_index, и вопрос
+пользователя сопоставляется с ближайшими синтетическими вопросами.
+
+Уверенное совпадение (косинусная близость не ниже порога) сразу даёт подглаву,
+а с ней часть и главу: в каскаде навигации (model_cascade, уровень "faq")
+такой вопрос проходит все три шага без запросов к LLM.
+"""
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from book_models import KnowMap
+from json_io import dump_json, load_json
+from passage_index import DEFAULT_DIM, hash_counts
+
+FAQ_FILE = "data_index/faq_questions.json"
+INDEX_DIR = "data_index/faq"
+
+
+@dataclass(slots=True)
+class FaqMatch:
+    question: str
+    subchapter_number: str
+    score: float
+
+
+def _weigh(counts: Dict[int, float], idf: np.ndarray, dim: int) -> np.ndarray:
+    vector = np.zeros(dim, dtype=np.float32)
+    if counts:
+        columns = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        vector[columns] = np.sign(values) * np.log1p(np.abs(values)) * idf[columns]
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class FaqIndex:
+    """
+    questions[i] - синтетический вопрос, subchapters[i] - его подглава,
+    parents[i] - (часть, глава) подглавы для поиска внутри выбранного узла.
+    """
+    def __init__(self, questions: List[str], subchapters: List[str], parents: np.ndarray, matrix: np.ndarray,
+                 idf: np.ndarray):
+        self.questions = questions
+        self.subchapters = subchapters
+        self.parents = parents
+        self.matrix = matrix
+        self.idf = idf
+        self.dim = matrix.shape[1]
+
+    @classmethod
+    def build(cls, faq: Dict[str, List[str]], know_map: KnowMap, dim: int = DEFAULT_DIM) -> "FaqIndex":
+        """
+        Подглавы, которых нет в карте знаний, и повторы вопросов пропускаются.
+        """
+        questions, subchapters, parents = [], [], []
+        for number, items in faq.items():
+            sub = know_map.find_subchapter(number)
+            if sub is None:
+                continue
+            for question in dict.fromkeys(" ".join(q.split()) for q in items):
+                if question:
+                    questions.append(question)
+                    subchapters.append(str(sub.subchapter_number))
+                    parents.append((sub.part_number, sub.chapter_number))
+        counts = [hash_counts(question, dim) for question in questions]
+
+        document_frequency = np.zeros(dim, dtype=np.float32)
+        for row in counts:
+            document_frequency[list(row)] += 1
+        idf = np.log((1 + len(questions)) / (1 + document_frequency)).astype(np.float32) + 1
+
+        matrix = np.zeros((len(questions), dim), dtype=np.float32)
+        for i, row in enumerate(counts):
+            matrix[i] = _weigh(row, idf, dim)
+        return cls(questions, subchapters, np.array(parents, dtype=np.int32).reshape(-1, 2), matrix, idf)
+
+    def vectorize(self, text: str) -> np.ndarray:
+        return _weigh(hash_counts(text, self.dim), self.idf, self.dim)
+
+    def match(self, question: str, k: int = 5, part: int = None, chapter: int = None) -> List[FaqMatch]:
+        """
+        k ближайших синтетических вопросов; part/chapter ограничивают поиск подглавами узла.
+        """
+        rows = np.arange(len(self.questions))
+        if part is not None:
+            rows = rows[self.parents[rows, 0] == part]
+        if chapter is not None:
+            rows = rows[self.parents[rows, 1] == chapter]
+        if len(rows) == 0:
+            return []
+        scores = self.matrix[rows] @ self.vectorize(question)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [FaqMatch(self.questions[rows[i]], self.subchapters[rows[i]], float(scores[i])) for i in top]
+
+    def route(self, question: str, part: int = None, chapter: int = None) -> Tuple[Optional[str], float]:
+        """
+        Подглава ближайшего синтетического вопроса и его близость (уверенность совпадения).
+        """
+        matches = self.match(question, 1, part, chapter)
+        if not matches:
+            return None, 0.0
+        return matches[0].subchapter_number, matches[0].score
+
+    # ---------------------------------------------------------------
+    # Сохранение: matrix.npy и idf.npy + questions.json
+    # ---------------------------------------------------------------
+    def save(self, directory: str = INDEX_DIR) -> None:
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "matrix.npy"), self.matrix)
+        np.save(os.path.join(directory, "idf.npy"), self.idf)
+        rows = [
+            [question, subchapter, int(part), int(chapter)]
+            for question, subchapter, (part, chapter) in zip(self.questions, self.subchapters, self.parents)
+        ]
+        dump_json(rows, os.path.join(directory, "questions.json"), compact=True)
+
+    @classmethod
+    def load(cls, directory: str = INDEX_DIR, mmap: bool = False) -> "FaqIndex":
+        matrix = np.load(os.path.join(directory, "matrix.npy"), mmap_mode="r" if mmap else None)
+        idf = np.load(os.path.join(directory, "idf.npy"))
+        rows = load_json(os.path.join(directory, "questions.json"))
+        parents = np.array([row[2:] for row in rows], dtype=np.int32).reshape(-1, 2)
+        return cls([row[0] for row in rows], [row[1] for row in rows], parents, matrix, idf)
+
+
+def build_faq_index(know_map_file: str, faq_file: str = FAQ_FILE, directory: str = INDEX_DIR) -> FaqIndex:
+    from json_io import load_know_map
+
+    index = FaqIndex.build(load_json(faq_file), load_know_map(know_map_file))
+    index.save(directory)
+    return index
+
+
+if __name__ == "__main__":
+    index = build_faq_index("data_know_map/know_map_full.json")
+    print(f"Синтетических вопросов: {len(index.questions)}, подглав: {len(set(index.subchapters))}")
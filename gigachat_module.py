@@ -1,8 +1,17 @@
 # gigachat_module.py
 
-import httpx
-from pydantic import BaseModel, Field
-from openai import OpenAI
+from functools import lru_cache
+from typing import TYPE_CHECKING, List, Type
+
+from pydantic import BaseModel, Field, create_model
+
+from prompt_layout import build_batch_messages, build_messages
+from response_schema import DEFAULT_SCHEMA_MODE, request_structured
+
+if TYPE_CHECKING:
+    # openai и httpx импортируются только при создании клиента: модели рассуждений
+    # нужны и там, где клиент не создаётся (кеш навигации, оценка, CLI)
+    from openai import OpenAI
 
 # -------------------------------------------------------------------
 # Схема для ответа LLM на шаг 1 (выбор части книги)
@@ -180,6 +189,40 @@ class SubchapterReasoning(BaseModel):
 
 
 
+# -------------------------------------------------------------------
+# Краткие схемы навигации (без рассуждений): только выбор узла.
+# *Brief дополнительно содержат короткое обоснование и уверенность.
+# Полные *Reasoning остаются для аудита и отладки.
+# -------------------------------------------------------------------
+class PartSelection(BaseModel):
+    selected_part: int = Field(..., description="Номер выбранной части книги", gt=0)
+
+
+class ChapterSelection(BaseModel):
+    selected_chapter: int = Field(..., description="Номер выбранной главы", gt=0)
+
+
+class SubchapterSelection(BaseModel):
+    selected_subchapter: str = Field(..., description="Номер выбранной подглавы (subchapter_number)")
+
+
+class BriefFields(BaseModel):
+    justification: str = Field(..., description="Обоснование выбора одним предложением, до 20 слов", max_length=200)
+    confidence: float = Field(..., description="Уверенность в выборе от 0 до 1", ge=0, le=1)
+
+
+class PartBrief(BriefFields, PartSelection):
+    pass
+
+
+class ChapterBrief(BriefFields, ChapterSelection):
+    pass
+
+
+class SubchapterBrief(BriefFields, SubchapterSelection):
+    pass
+
+
 # -------------------------------------------------------------------
 # Константы и настройки
 # -------------------------------------------------------------------
@@ -325,6 +368,98 @@ SYSTEM_PROMPT_FINAL = (
 )
 
 
+# Промпты краткой навигации: ответ - только номер узла (и в режиме brief - обоснование и уверенность)
+def _routing_prompt(nodes: str, field: str, example: str, brief: bool) -> str:
+    extra = (
+        f', "justification": "<одно предложение, до 20 слов>", "confidence": <число от 0 до 1>'
+        if brief else ""
+    )
+    return f"""
+You are an AI assistant that routes a user's question to the most relevant {nodes} of a book. You will receive descriptions of the {nodes}s and the user question.
+
+Do not write any reasoning. Respond with JSON only, in exactly this format:
+{{"{field}": {example}{extra}}}
+
+Choose strictly one {nodes}. Base the choice solely on the provided descriptions and not on external knowledge.
+"""
+
+
+SYSTEM_PROMPT_PART_LEAN = _routing_prompt("part", "selected_part", "2", brief=False)
+SYSTEM_PROMPT_CHAPTER_LEAN = _routing_prompt("chapter", "selected_chapter", "4", brief=False)
+SYSTEM_PROMPT_SUBCHAPTER_LEAN = _routing_prompt("subchapter", "selected_subchapter", '"1.2.15"', brief=False)
+SYSTEM_PROMPT_PART_BRIEF = _routing_prompt("part", "selected_part", "2", brief=True)
+SYSTEM_PROMPT_CHAPTER_BRIEF = _routing_prompt("chapter", "selected_chapter", "4", brief=True)
+SYSTEM_PROMPT_SUBCHAPTER_BRIEF = _routing_prompt("subchapter", "selected_subchapter", '"1.2.15"', brief=True)
+
+# Режимы навигации: уровень -> (системный промпт, схема ответа)
+ROUTING_MODES = {
+    "full": {
+        "part": (SYSTEM_PROMPT_PART, BookPartReasoning),
+        "chapter": (SYSTEM_PROMPT_CHAPTER, ChapterReasoning),
+        "subchapter": (SYSTEM_PROMPT_SUBCHAPTER, SubchapterReasoning),
+    },
+    "lean": {
+        "part": (SYSTEM_PROMPT_PART_LEAN, PartSelection),
+        "chapter": (SYSTEM_PROMPT_CHAPTER_LEAN, ChapterSelection),
+        "subchapter": (SYSTEM_PROMPT_SUBCHAPTER_LEAN, SubchapterSelection),
+    },
+    "brief": {
+        "part": (SYSTEM_PROMPT_PART_BRIEF, PartBrief),
+        "chapter": (SYSTEM_PROMPT_CHAPTER_BRIEF, ChapterBrief),
+        "subchapter": (SYSTEM_PROMPT_SUBCHAPTER_BRIEF, SubchapterBrief),
+    },
+}
+DEFAULT_ROUTING_MODE = "full"
+
+
+# Навигация нескольких вопросов одним запросом (batch_router): каталог уровня
+# отправляется один раз, вопросы - нумерованным списком, ответ - выбор для каждого
+def _batch_routing_prompt(nodes: str, field: str, example: str, brief: bool) -> str:
+    extra = (
+        f', "justification": "<одно предложение, до 20 слов>", "confidence": <число от 0 до 1>'
+        if brief else ""
+    )
+    return f"""
+You are an AI assistant that routes several user questions to the most relevant {nodes} of a book. You will receive descriptions of the {nodes}s once and a numbered list of questions.
+
+Do not write any reasoning. Respond with JSON only, one selection for every question, in exactly this format:
+{{"selections": [{{"question_id": 1, "{field}": {example}{extra}}}, {{"question_id": 2, ...}}]}}
+
+Choose strictly one {nodes} for each question, independently of the other questions. Base the choice solely on the provided descriptions and not on external knowledge.
+"""
+
+
+@lru_cache(maxsize=None)
+def batch_model(model: Type[BaseModel]) -> Type[BaseModel]:
+    """
+    Схема ответа на несколько вопросов: {"selections": [<model> + question_id, ...]}.
+    """
+    item = create_model(
+        f"{model.__name__}Item", __base__=model,
+        question_id=(int, Field(..., description="Номер вопроса из списка", ge=1))
+    )
+    return create_model(f"{model.__name__}Batch", selections=(List[item], ...))
+
+
+BATCH_ROUTING_MODES = {
+    mode: {
+        level: (_batch_routing_prompt(level, field, example, brief=mode == "brief"), batch_model(model))
+        for level, field, example, model in (
+            ("part", "selected_part", "2", steps["part"][1]),
+            ("chapter", "selected_chapter", "4", steps["chapter"][1]),
+            ("subchapter", "selected_subchapter", '"1.2.15"', steps["subchapter"][1]),
+        )
+    }
+    for mode, steps in ROUTING_MODES.items() if mode != "full"
+}
+# Подписи каталогов уровней - те же, что в get_*_reasoning
+BATCH_CATALOGUE_LABELS = {
+    "part": "Описания частей книги",
+    "chapter": "Описания глав выбранной части книги",
+    "subchapter": "Описания подглав выбранной главы",
+}
+
+
 QUESTION_USER_PART = "Какое рабочее уравнение-практику предлагает автор для работы с привычкой №20?"
 QUESTION_USER_CHAPTER = "Какое рабочее уравнение-практику предлагает автор для работы с привычкой №20?"
 QUESTION_USER_SUBCHAPTER = "Какое рабочее уравнение-практику предлагает автор для работы с привычкой №20?"
@@ -334,10 +469,16 @@ QUESTION_USER_FINAL = "Какое рабочее уравнение-практи
 # -------------------------------------------------------------------
 # Функции для создания клиента и получения ответа
 # -------------------------------------------------------------------
-def create_client(access_token: str) -> OpenAI:
+# Модель по умолчанию для всех шагов; каждый шаг принимает свою модель через model
+DEFAULT_MODEL = "GigaChat-Max"
+
+def create_client(access_token: str) -> "OpenAI":
     """
     Создаёт клиента OpenAI с отключенной проверкой SSL.
     """
+    import httpx
+    from openai import OpenAI
+
     http_client = httpx.Client(verify=False)
     client = OpenAI(
         api_key=access_token,
@@ -347,75 +488,81 @@ def create_client(access_token: str) -> OpenAI:
     return client
 
 def get_book_part_reasoning(
-    client: OpenAI,
+    client: "OpenAI",
     system_prompt: str,
     content_parts: str,
-    question_user: str
+    question_user: str,
+    model: str = DEFAULT_MODEL,
+    schema_mode: str = DEFAULT_SCHEMA_MODE,
+    response_model: Type[BaseModel] = BookPartReasoning
 ) -> BookPartReasoning:
     """
-    Отправляет запрос модели и парсит ответ в формате BookPartReasoning.
+    Отправляет запрос модели и парсит ответ в формате BookPartReasoning
+    (или response_model краткого режима навигации, см. ROUTING_MODES).
     """
-    response = client.beta.chat.completions.parse(
-        model="GigaChat-Max",
-        temperature=0,
-        messages=[
-            {"role": "system", "content": f"ИНСТРУКЦИИ: {system_prompt}"},
-            {"role": "user", "content": (
-                f"Описания частей книги: {content_parts}\n"
-                f"Вопрос пользователя: {question_user}"
-            )}
-        ],
-        response_format=BookPartReasoning,
-    )
-    return response.choices[0].message.parsed
+    messages = build_messages(system_prompt, "Описания частей книги", content_parts, question_user)
+    return request_structured(client, model, messages, response_model, schema_mode)
 
 def get_chapter_reasoning(
-    client: OpenAI,
+    client: "OpenAI",
     system_prompt: str,
     chapters_content: str,
-    question_user: str
-) -> str:
-    response = client.beta.chat.completions.parse(
-        model="GigaChat-Max",
-        temperature=0,
-        messages=[
-            {"role": "system", "content": f"ИНСТРУКЦИИ: {system_prompt}"},
-            {"role": "user", "content": (
-                f"Описания глав выбранной части книги:\n{chapters_content}\n\nВопрос пользователя: {question_user}"
-            )}
-        ],
-        response_format=ChapterReasoning,
-    )
-    return response.choices[0].message.parsed
-
-
-def get_subchapter_reasoning(client: OpenAI, system_prompt: str, subchapters_content: str, question_user: str) -> SubchapterReasoning:
-    response = client.beta.chat.completions.parse(
-        model="GigaChat-Max",
-        temperature=0,
-        messages=[
-            {"role": "system", "content": f"ИНСТРУКЦИИ: {system_prompt}"},
-            {"role": "user", "content": f"Описания подглав выбранной главы:\n{subchapters_content}\n\nВопрос пользователя: {question_user}"}
-        ],
-        response_format=SubchapterReasoning,
-    )
-    return response.choices[0].message.parsed
+    question_user: str,
+    model: str = DEFAULT_MODEL,
+    schema_mode: str = DEFAULT_SCHEMA_MODE,
+    response_model: Type[BaseModel] = ChapterReasoning
+) -> ChapterReasoning:
+    messages = build_messages(system_prompt, "Описания глав выбранной части книги", chapters_content, question_user)
+    return request_structured(client, model, messages, response_model, schema_mode)
+
 
+def get_subchapter_reasoning(
+    client: "OpenAI",
+    system_prompt: str,
+    subchapters_content: str,
+    question_user: str,
+    model: str = DEFAULT_MODEL,
+    schema_mode: str = DEFAULT_SCHEMA_MODE,
+    response_model: Type[BaseModel] = SubchapterReasoning
+) -> SubchapterReasoning:
+    messages = build_messages(system_prompt, "Описания подглав выбранной главы", subchapters_content, question_user)
+    return request_structured(client, model, messages, response_model, schema_mode)
+
+
+def get_batch_reasoning(
+    client: "OpenAI",
+    level: str,
+    system_prompt: str,
+    catalogue: str,
+    questions: List[str],
+    response_model: Type[BaseModel],
+    model: str = DEFAULT_MODEL,
+    schema_mode: str = DEFAULT_SCHEMA_MODE
+) -> BaseModel:
+    """
+    Один запрос навигации уровня level для нескольких вопросов; response_model -
+    схема из BATCH_ROUTING_MODES ({"selections": [...]}).
+    """
+    messages = build_batch_messages(system_prompt, BATCH_CATALOGUE_LABELS[level], catalogue, questions)
+    return request_structured(client, model, messages, response_model, schema_mode)
 
-def get_final_answer(client: OpenAI, system_prompt: str, final_content: str, question_user: str) -> str:
+
+def get_final_answer(
+    client: "OpenAI",
+    system_prompt: str,
+    final_content: str,
+    question_user: str,
+    model: str = DEFAULT_MODEL
+) -> str:
     response = client.chat.completions.create(
-    model="GigaChat-Max",
+    model=model,
     temperature = 0,
-    messages=[
-            {
-                "role": "system",
-                "content": f"ИНСТРУКЦИИ: {system_prompt}"
-            },
-            # Промпт оставлен пустым для дальнейшего заполнения
-            {"role": "user", "content": f"""
-            Контент книги который был найден ранее специальным ботом по вопрос пользователя: {final_content}
-            Вопрос пользователя: {question_user}"""}
-        ],
+    messages=build_messages(
+        system_prompt,
+        "Контент книги который был найден ранее специальным ботом по вопрос пользователя",
+        final_content,
+        question_user
+    ),
     )
     return response.choices[0].message.content
 
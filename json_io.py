@@ -0,0 +1,89 @@
+# json_io.py
+
+import hashlib
+import json
+from typing import Any, Union
+
+from book_models import Book, KnowMap, book_from_dict, know_map_from_dict
+
+# Выбираем самый быстрый доступный JSON-бэкенд: orjson -> msgspec -> стандартный json
+try:
+    import orjson
+    BACKEND = "orjson"
+except ImportError:
+    orjson = None
+    try:
+        import msgspec
+        BACKEND = "msgspec"
+    except ImportError:
+        msgspec = None
+        BACKEND = "json"
+
+if BACKEND == "msgspec":
+    _msgspec_encoder = msgspec.json.Encoder()
+    _msgspec_decoder = msgspec.json.Decoder()
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """
+    Декодирует JSON из bytes или str.
+    """
+    if BACKEND == "orjson":
+        return orjson.loads(data)
+    if BACKEND == "msgspec":
+        return _msgspec_decoder.decode(data.encode("utf-8") if isinstance(data, str) else data)
+    return json.loads(data)
+
+
+def dumps(obj: Any, compact: bool = False) -> bytes:
+    """
+    Кодирует объект в UTF-8 JSON (без экранирования кириллицы).
+    compact=True - без отступов, для файлов, которые читают только программы;
+    иначе - с отступом 2, как раньше писались все файлы.
+    """
+    if BACKEND == "orjson":
+        return orjson.dumps(obj) if compact else orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    if BACKEND == "msgspec":
+        data = _msgspec_encoder.encode(obj)
+        return data if compact else msgspec.json.format(data, indent=2)
+    if compact:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def load_json(file_path: str) -> Any:
+    """
+    Загружает данные из JSON-файла.
+    """
+    with open(file_path, "rb") as f:
+        return loads(f.read())
+
+
+def dump_json(obj: Any, file_path: str, compact: bool = False) -> None:
+    """
+    Сохраняет данные в JSON-файл.
+    """
+    with open(file_path, "wb") as f:
+        f.write(dumps(obj, compact=compact))
+
+
+def file_fingerprint(file_path: str) -> str:
+    """
+    sha256 содержимого файла (проверка, что производные данные посчитаны для него).
+    """
+    with open(file_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_know_map(file_path: str) -> KnowMap:
+    """
+    Загружает know_map_full.json сразу в типизированные модели.
+    """
+    return know_map_from_dict(load_json(file_path))
+
+
+def load_book(file_path: str) -> Book:
+    """
+    Загружает kniga_full_content.json (или список страниц) сразу в типизированные модели.
+    """
+    return book_from_dict(load_json(file_path))
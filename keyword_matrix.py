@@ -0,0 +1,202 @@
+# keyword_matrix.py
+"""
+Разреженная матрица «термин-документ» по ключевым словам страниц (metadata.keywords
+из batch-разметки) и key_points подглав карты знаний.
+
+Строка матрицы - документ ("subchapter:2.4.25" или "page:94", при нескольких
+книгах с префиксом книги), столбец - основа слова (local_ranker.tokenize).
+Веса - tf-idf с L2-нормировкой строк, поэтому оценка вопроса против всех
+документов - одно произведение матрицы на вектор вопроса.
+
+Матрица хранится по столбцам (CSC), так что оценка затрагивает только столбцы
+терминов вопроса. Если установлен scipy, используется scipy.sparse, иначе
+произведение считается на NumPy: вклады ненулевых элементов выбранных столбцов
+складываются по строкам через np.bincount.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from book_models import Book, KnowMap
+from local_ranker import tokenize
+
+try:
+    from scipy import sparse
+    BACKEND = "scipy"
+except ImportError:
+    sparse = None
+    BACKEND = "numpy"
+
+
+class KeywordMatrix:
+    """
+    documents - пары (ключ документа, список ключевых фраз).
+    """
+    def __init__(self, documents: Iterable[Tuple[str, List[str]]]):
+        self.keys: List[str] = []
+        self.vocabulary: Dict[str, int] = {}
+        rows, columns = [], []
+        for row, (key, phrases) in enumerate(documents):
+            self.keys.append(key)
+            for term in tokenize(" ".join(phrases)):
+                columns.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+                rows.append(row)
+        self.key_index = {key: i for i, key in enumerate(self.keys)}
+        shape = (len(self.keys), len(self.vocabulary))
+
+        # COO: сортировка по (строка, столбец) и схлопывание повторов в tf
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = np.asarray(columns, dtype=np.int64)
+        pairs, tf = np.unique(rows * max(shape[1], 1) + columns, return_counts=True)
+        row_of_nnz = pairs // max(shape[1], 1)
+        indices = (pairs % max(shape[1], 1)).astype(np.int32)
+
+        document_frequency = np.bincount(indices, minlength=shape[1])
+        self.idf = (np.log((1 + shape[0]) / (1 + document_frequency)) + 1).astype(np.float32)
+        data = (1 + np.log(tf)).astype(np.float32) * self.idf[indices]
+        norms = np.sqrt(np.bincount(row_of_nnz, weights=data * data, minlength=shape[0]))
+        data /= np.where(norms == 0, 1, norms)[row_of_nnz].astype(np.float32)
+
+        # Хранение по столбцам (CSC): оценка вопроса трогает только столбцы его терминов,
+        # а не все ненулевые элементы матрицы
+        order = np.argsort(indices, kind="stable")
+        self.shape = shape
+        self.indptr = np.concatenate(([0], np.cumsum(document_frequency))).astype(np.int64)
+        self.indices = row_of_nnz[order].astype(np.int32)
+        self.data = data[order]
+        self._csc = sparse.csc_matrix((self.data, self.indices, self.indptr), shape=shape) if sparse is not None else None
+
+    def query_terms(self, question: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Столбцы терминов вопроса и их веса (tf * idf).
+        """
+        weights: Dict[int, float] = {}
+        for term in tokenize(question):
+            column = self.vocabulary.get(term)
+            if column is not None:
+                weights[column] = weights.get(column, 0.0) + float(self.idf[column])
+        columns = np.fromiter(weights.keys(), dtype=np.int64, count=len(weights))
+        return columns, np.fromiter(weights.values(), dtype=np.float32, count=len(weights))
+
+    def score(self, question: str) -> np.ndarray:
+        """
+        Оценки всех документов для вопроса (скалярное произведение tf-idf векторов).
+        """
+        columns, weights = self.query_terms(question)
+        if len(columns) == 0:
+            return np.zeros(self.shape[0], dtype=np.float32)
+        if self._csc is not None:
+            return np.asarray(self._csc[:, columns] @ weights, dtype=np.float32).ravel()
+        starts, ends = self.indptr[columns], self.indptr[columns + 1]
+        lengths = ends - starts
+        # Позиции ненулевых элементов выбранных столбцов одним массивом
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        return np.bincount(
+            self.indices[positions],
+            weights=self.data[positions] * np.repeat(weights, lengths),
+            minlength=self.shape[0]
+        ).astype(np.float32)
+
+    def top_k(self, question: str, k: int = 10, prefix: Optional[str] = None) -> List[Tuple[str, float]]:
+        """
+        k лучших документов с ненулевой оценкой; prefix ограничивает вид документа ("subchapter:", "page:").
+        """
+        scores = self.score(question)
+        if prefix is not None:
+            mask = np.fromiter((key.startswith(prefix) for key in self.keys), dtype=bool, count=len(self.keys))
+            scores = np.where(mask, scores, 0)
+        k = min(k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.keys[i], float(scores[i])) for i in top]
+
+
+def library_documents(know_map: KnowMap, book: Optional[Book] = None, book_id: str = "") -> List[Tuple[str, List[str]]]:
+    """
+    Документы одной книги: подглавы (заголовок + key_points) и страницы (metadata.keywords).
+    book_id добавляется к ключам, чтобы в одной матрице могли быть несколько книг.
+    """
+    prefix = f"{book_id}/" if book_id else ""
+    documents = [
+        (f"{prefix}subchapter:{sub.subchapter_number}", [sub.title, *sub.key_points])
+        for sub in know_map.iter_subchapters()
+    ]
+    if book is not None:
+        documents.extend(
+            (f"{prefix}page:{page.pageNumber}", page.metadata.keywords)
+            for page in book.pages if page.metadata is not None and page.metadata.keywords
+        )
+    return documents
+
+
+class KeywordRanker:
+    """
+    Ранжирование подглав по матрице ключевых слов с тем же интерфейсом, что у
+    local_ranker.LocalRanker (можно передать в SpeculativeNavigator и др.).
+
+    Оценка подглавы = оценка её key_points + page_weight * лучшая оценка её страниц;
+    оценки частей и глав - максимум по их подглавам. Всё считается векторно
+    по одному произведению матрицы на вектор вопроса.
+    """
+    def __init__(self, know_map: KnowMap, book: Optional[Book] = None, page_weight: float = 0.5):
+        self.know_map = know_map
+        self.page_weight = page_weight
+        self.matrix = KeywordMatrix(library_documents(know_map, book))
+        subchapters = list(know_map.iter_subchapters())
+        self.subchapter_numbers = [str(sub.subchapter_number) for sub in subchapters]
+        self.subchapter_rows = np.array(
+            [self.matrix.key_index[f"subchapter:{number}"] for number in self.subchapter_numbers], dtype=np.int64
+        )
+        self.part_of = np.array([sub.part_number for sub in subchapters], dtype=np.int64)
+        self.chapter_of = np.array([sub.chapter_number for sub in subchapters], dtype=np.int64)
+
+        # Пары (подглава, строка страницы) для агрегации оценок страниц
+        owners, page_rows = [], []
+        for i, sub in enumerate(subchapters):
+            for page in sub.pages:
+                row = self.matrix.key_index.get(f"page:{page}")
+                if row is not None:
+                    owners.append(i)
+                    page_rows.append(row)
+        self._page_owners = np.asarray(owners, dtype=np.int64)
+        self._page_rows = np.asarray(page_rows, dtype=np.int64)
+
+    def subchapter_scores(self, question: str) -> np.ndarray:
+        scores = self.matrix.score(question)
+        result = scores[self.subchapter_rows].astype(np.float64)
+        if len(self._page_rows):
+            best_page = np.zeros(len(result))
+            np.maximum.at(best_page, self._page_owners, scores[self._page_rows])
+            result += self.page_weight * best_page
+        return result
+
+    @staticmethod
+    def _ranked(keys: np.ndarray, scores: np.ndarray) -> List[Tuple[int, float]]:
+        """
+        Максимум оценок подглав по родительскому узлу, по убыванию.
+        """
+        unique, inverse = np.unique(keys, return_inverse=True)
+        best = np.full(len(unique), -np.inf)
+        np.maximum.at(best, inverse, scores)
+        order = np.argsort(-best, kind="stable")
+        return [(int(unique[i]), float(best[i])) for i in order]
+
+    def rank_parts(self, question: str) -> List[Tuple[int, float]]:
+        return self._ranked(self.part_of, self.subchapter_scores(question))
+
+    def rank_chapters(self, question: str, part_number: int = None) -> List[Tuple[int, float]]:
+        scores = self.subchapter_scores(question)
+        if part_number is None:
+            return self._ranked(self.chapter_of, scores)
+        return self._ranked(self.chapter_of[self.part_of == part_number], scores[self.part_of == part_number])
+
+    def rank_subchapters(self, question: str, part_number: int = None, chapter_number: int = None) -> List[Tuple[str, float]]:
+        scores = self.subchapter_scores(question)
+        keys = np.array(self.subchapter_numbers, dtype=object)
+        if chapter_number is not None:
+            mask = (self.chapter_of == chapter_number) & (self.part_of == part_number)
+            keys, scores = keys[mask], scores[mask]
+        order = np.argsort(-scores, kind="stable")
+        return [(keys[i], float(scores[i])) for i in order]
@@ -0,0 +1,212 @@
+# know_map_store.py
+"""
+Карта знаний с загрузкой по уровням вместо чтения know_map_full.json целиком.
+
+Навигационный индекс - mapping_data.json (часть -> номера глав, глава -> названия
+подглав). Шагу 1 нужны только know_map_parts.json, шагам 2-3 - одна часть:
+её главы и подглавы лежат в шарде shards/part_<N>.json (строится build_shards
+из know_map_full.json, с номерами подглав и страницами). Если шарда нет, часть
+собирается из know_map_chapters.json и know_map_subchapters.json; номера подглав
+выводятся из порядка в mapping_data.json, страниц в этих файлах нет.
+
+Загруженные шарды держатся в LRU-кеше на max_shards частей. KnowMapStore
+поддерживает то же чтение, что и KnowMap (parts, find_part, find_chapter,
+find_subchapter, iter_chapters, iter_subchapters), поэтому его можно передавать
+в парсеры content_book_parser, pipeline.Catalogues и navigate/answer_question.
+В отличие от KnowMap, у частей из parts список chapters пуст: главы всей книги
+перебираются через iter_chapters, главы одной части - через find_part.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from book_models import Chapter, KnowMap, Part, Subchapter, chapter_from_dict, part_from_dict
+from json_io import dump_json, load_json, loads
+
+KNOW_MAP_DIR = "data_know_map"
+MAPPING_FILE = "mapping_data.json"
+PARTS_FILE = "know_map_parts.json"
+CHAPTERS_FILE = "know_map_chapters.json"
+SUBCHAPTERS_FILE = "know_map_subchapters.json"
+SHARDS_DIR = "shards"
+DEFAULT_MAX_SHARDS = 8
+
+
+def shard_file(shards_dir: str, part_number: int) -> str:
+    return os.path.join(shards_dir, f"part_{part_number}.json")
+
+
+def build_shards(know_map_file: str, shards_dir: str = os.path.join(KNOW_MAP_DIR, SHARDS_DIR)) -> List[str]:
+    """
+    Шарды частей из know_map_full.json: {"part_number", "pages", "chapters": [... с подглавами ...]}.
+    """
+    os.makedirs(shards_dir, exist_ok=True)
+    files = []
+    for part in load_json(know_map_file)["content"]["parts"]:
+        path = shard_file(shards_dir, part["part_number"])
+        shard = {"part_number": part["part_number"], "pages": part.get("pages", []), "chapters": part.get("chapters", [])}
+        dump_json(shard, path, compact=True)
+        files.append(path)
+    return files
+
+
+class KnowMapStore:
+    def __init__(
+        self,
+        directory: str = KNOW_MAP_DIR,
+        shards_dir: Optional[str] = None,
+        max_shards: int = DEFAULT_MAX_SHARDS
+    ):
+        self.directory = directory
+        self.shards_dir = shards_dir or os.path.join(directory, SHARDS_DIR)
+        self.max_shards = max_shards
+        self._lock = threading.RLock()
+        self._shards: "OrderedDict[Any, Any]" = OrderedDict()
+        self._parts: Optional[List[Part]] = None
+        # Статистика для бенчмарков: сколько файлов и байт прочитано
+        self.files_read = 0
+        self.bytes_read = 0
+
+        mapping = self._read(MAPPING_FILE)["content"]
+        self.parts_to_chapters: Dict[int, List[int]] = {
+            int(part): [int(chapter) for chapter in chapters]
+            for part, chapters in mapping["parts_to_chapters"].items()
+        }
+        self.chapters_to_subchapters: Dict[int, List[str]] = {
+            int(chapter): list(titles) for chapter, titles in mapping["chapters_to_subchapters"].items()
+        }
+
+    def _read(self, name: str, directory: Optional[str] = None) -> Any:
+        with open(os.path.join(directory or self.directory, name), "rb") as f:
+            data = f.read()
+        self.files_read += 1
+        self.bytes_read += len(data)
+        return loads(data)
+
+    def _cached(self, key: Any, load: Callable[[], Any]) -> Any:
+        """
+        LRU по шардам: при превышении max_shards вытесняется давно не использованный.
+        """
+        with self._lock:
+            if key in self._shards:
+                self._shards.move_to_end(key)
+                return self._shards[key]
+            value = load()
+            self._shards[key] = value
+            while len(self._shards) > self.max_shards:
+                self._shards.popitem(last=False)
+            return value
+
+    @property
+    def cached_shards(self) -> List[Any]:
+        return list(self._shards)
+
+    # ---------------------------------------------------------------
+    # Уровень 1: части (без глав)
+    # ---------------------------------------------------------------
+    @property
+    def parts(self) -> List[Part]:
+        """
+        Части для каталога шага 1; их chapters пусты - главы загружаются через find_part.
+        """
+        with self._lock:
+            if self._parts is None:
+                self._parts = [part_from_dict(node) for node in self._read(PARTS_FILE)["content"]]
+            return self._parts
+
+    # ---------------------------------------------------------------
+    # Уровни 2-3: одна часть с главами и подглавами
+    # ---------------------------------------------------------------
+    def _level_rows(self, name: str) -> List[Dict[str, Any]]:
+        return self._cached(("level", name), lambda: self._read(name)["content"])
+
+    def _load_part_from_levels(self, part_number: int) -> List[Chapter]:
+        chapters = [row for row in self._level_rows(CHAPTERS_FILE) if row.get("part_number") == part_number]
+        subchapters = [row for row in self._level_rows(SUBCHAPTERS_FILE) if row.get("part_number") == part_number]
+        result = []
+        for row in chapters:
+            number = row["chapter_number"]
+            titles = self.chapters_to_subchapters.get(number, [])
+            subs = [
+                {**sub, "subchapter_number": f"{part_number}.{number}.{titles.index(sub['title']) + 1}"
+                 if sub["title"] in titles else None}
+                for sub in subchapters if sub.get("chapter_number") == number
+            ]
+            result.append(chapter_from_dict({**row, "subchapters": subs}, part_number))
+        return result
+
+    def _load_part(self, part_number: int) -> Optional[Part]:
+        summary = next((part for part in self.parts if part.part_number == part_number), None)
+        if summary is None:
+            return None
+        path = shard_file(self.shards_dir, part_number)
+        if os.path.exists(path):
+            data = self._read(os.path.basename(path), self.shards_dir)
+            chapters = [chapter_from_dict(node, part_number) for node in data["chapters"]]
+            pages = data.get("pages", summary.pages)
+        else:
+            chapters, pages = self._load_part_from_levels(part_number), summary.pages
+        return Part(summary.title, summary.summary, summary.key_points, part_number, pages, chapters)
+
+    def find_part(self, part_number: int) -> Optional[Part]:
+        if part_number not in self.parts_to_chapters:
+            return None
+        return self._cached(("part", part_number), lambda: self._load_part(part_number))
+
+    def find_chapter(self, part_number: int, chapter_number: int) -> Optional[Chapter]:
+        if chapter_number not in self.parts_to_chapters.get(part_number, []):
+            return None
+        part = self.find_part(part_number)
+        return next((chapter for chapter in part.chapters if chapter.chapter_number == chapter_number), None)
+
+    def find_subchapter(self, subchapter_number: str) -> Optional[Subchapter]:
+        """
+        Номер подглавы "часть.глава.N" сразу указывает на шард нужной части.
+        """
+        try:
+            part_number, chapter_number, _ = (int(n) for n in str(subchapter_number).split("."))
+        except ValueError:
+            return None
+        chapter = self.find_chapter(part_number, chapter_number)
+        if chapter is None:
+            return None
+        return next((sub for sub in chapter.subchapters if str(sub.subchapter_number) == str(subchapter_number)), None)
+
+    def iter_chapters(self) -> Iterator[Chapter]:
+        """
+        Все главы книги; загружает шарды всех частей по очереди.
+        """
+        for part_number in self.parts_to_chapters:
+            yield from self.find_part(part_number).chapters
+
+    def iter_subchapters(self) -> Iterator[Subchapter]:
+        """
+        Все подглавы книги; загружает шарды всех частей по очереди.
+        """
+        for chapter in self.iter_chapters():
+            yield from chapter.subchapters
+
+    def to_know_map(self) -> KnowMap:
+        """
+        Полная KnowMap из шардов (для кода, которому нужна вся карта).
+        """
+        return KnowMap(parts=[self.find_part(part_number) for part_number in self.parts_to_chapters])
+
+
+def load_know_map_store(know_map_file: str, max_shards: int = DEFAULT_MAX_SHARDS) -> KnowMapStore:
+    """
+    Хранилище для каталога know_map_file; шарды строятся при первом использовании,
+    если их ещё нет или know_map_full.json новее.
+    """
+    directory = os.path.dirname(know_map_file) or "."
+    store_dir = os.path.join(directory, SHARDS_DIR)
+    first_shard = shard_file(store_dir, 1)
+    if not os.path.exists(first_shard) or os.path.getmtime(first_shard) < os.path.getmtime(know_map_file):
+        build_shards(know_map_file, store_dir)
+    return KnowMapStore(directory, store_dir, max_shards)
+
+
+if __name__ == "__main__":
+    files = build_shards(os.path.join(KNOW_MAP_DIR, "know_map_full.json"))
+    print(f"Шардов частей: {len(files)} -> {os.path.join(KNOW_MAP_DIR, SHARDS_DIR)}")
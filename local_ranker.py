@@ -0,0 +1,115 @@
+# local_ranker.py
+"""
+Локальное ранжирование частей, глав и подглав по вопросу без обращения к LLM.
+
+Текст узла берётся из тех же блоков, что уходят в промпты (ContentPartsParser,
+ChapterParser, SubchapterParser), и оценивается по BM25. Для русской морфологии
+слова грубо приводятся к основе обрезкой до STEM_LENGTH символов.
+"""
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from book_models import KnowMap
+from content_book_parser import ContentPartsParser, ChapterParser, SubchapterParser
+
+STEM_LENGTH = 6
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+_STOP_WORDS = {
+    "как", "что", "это", "для", "или", "так", "его", "она", "они", "при", "чем", "все", "над",
+    "под", "без", "уже", "нет", "был", "где", "кто", "title", "summary", "key_points",
+    "part", "chapter", "subchapter",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Слова текста в нижнем регистре, обрезанные до основы; числа сохраняются целиком.
+    """
+    tokens = []
+    for word in _WORD_PATTERN.findall(text.lower()):
+        if word.isdigit():
+            tokens.append(word)
+        elif len(word) >= 3 and word not in _STOP_WORDS:
+            tokens.append(word[:STEM_LENGTH])
+    return tokens
+
+
+class BM25Index:
+    """
+    BM25 по небольшому набору документов (узлов одного уровня карты знаний).
+    """
+    def __init__(self, documents: Dict[object, str]):
+        self.keys = list(documents)
+        self.term_counts = [Counter(tokenize(documents[key])) for key in self.keys]
+        self.lengths = [sum(counts.values()) for counts in self.term_counts]
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        document_frequency = Counter(term for counts in self.term_counts for term in counts)
+        n = len(self.keys)
+        self.idf = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for term, df in document_frequency.items()
+        }
+
+    def score(self, question: str, keys=None) -> List[Tuple[object, float]]:
+        """
+        Ключи документов по убыванию релевантности (при равенстве - в исходном порядке).
+        keys ограничивает ранжирование подмножеством документов.
+        """
+        terms = set(tokenize(question))
+        allowed = None if keys is None else set(keys)
+        scored = []
+        for position, key in enumerate(self.keys):
+            if allowed is not None and key not in allowed:
+                continue
+            counts, length = self.term_counts[position], self.lengths[position]
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / self.avg_length) if self.avg_length else BM25_K1
+            value = 0.0
+            for term in terms:
+                tf = counts.get(term)
+                if tf:
+                    value += self.idf[term] * tf * (BM25_K1 + 1) / (tf + norm)
+            scored.append((position, key, value))
+        scored.sort(key=lambda item: (-item[2], item[0]))
+        return [(key, value) for _, key, value in scored]
+
+
+class LocalRanker:
+    """
+    Кандидаты для каждого уровня навигации: части, главы выбранной части,
+    подглавы выбранной главы.
+    """
+    def __init__(self, know_map: KnowMap):
+        self.know_map = know_map
+        parts_parser = ContentPartsParser(know_map)
+        chapter_parser = ChapterParser(know_map)
+        subchapter_parser = SubchapterParser(know_map)
+        self.parts = BM25Index({part.part_number: parts_parser.format_part(part) for part in know_map.parts})
+        self.chapters = BM25Index({
+            chapter.chapter_number: chapter_parser.format_chapter(chapter)
+            for chapter in know_map.iter_chapters()
+        })
+        self.subchapters = BM25Index({
+            str(sub.subchapter_number): subchapter_parser.format_subchapter(sub)
+            for sub in know_map.iter_subchapters()
+        })
+
+    def rank_parts(self, question: str) -> List[Tuple[int, float]]:
+        return self.parts.score(question)
+
+    def rank_chapters(self, question: str, part_number: int = None) -> List[Tuple[int, float]]:
+        if part_number is None:
+            return self.chapters.score(question)
+        part = self.know_map.find_part(part_number)
+        return self.chapters.score(question, [ch.chapter_number for ch in part.chapters] if part else [])
+
+    def rank_subchapters(self, question: str, part_number: int = None, chapter_number: int = None) -> List[Tuple[str, float]]:
+        if chapter_number is None:
+            return self.subchapters.score(question)
+        chapter = self.know_map.find_chapter(part_number, chapter_number)
+        keys = [str(sub.subchapter_number) for sub in chapter.subchapters] if chapter else []
+        return self.subchapters.score(question, keys)
@@ -0,0 +1,228 @@
+# memory_profile.py
+"""
+Профилирование памяти по этапам (включается явно).
+
+Этапы размечаются в коде через with memory_profile.stage("load.book"): ...
+Пока профилировщик не включён, stage возвращает пустой контекст и ничего не стоит.
+Включённый профилировщик на каждом этапе снимает снимки tracemalloc до и после,
+пик traced-памяти внутри этапа (с учётом вложенных этапов), RSS процесса до/после
+и пиковый RSS, а также top-N мест в коде, где память выросла сильнее всего.
+Повторные вызовы этапа (например, шаг навигации для каждого вопроса) суммируются.
+
+Включение:
+    MEMORY_PROFILE=memory_report.json python cli.py answer "..."
+или из кода: memory_profile.enable("memory_report.json"). Отчёт (JSON) пишется
+при выходе из процесса или явно через save().
+"""
+import atexit
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, List, Optional
+
+from json_io import dump_json
+
+ENV_VAR = "MEMORY_PROFILE"
+DEFAULT_TOP = 10
+
+# Кадры, которые не относятся к коду приложения
+_IGNORED_FILES = (tracemalloc.__file__, "<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>", "<unknown>")
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def current_rss() -> Optional[int]:
+    """
+    Текущий RSS процесса в байтах (Linux, /proc); None, если недоступно.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss() -> Optional[int]:
+    """
+    Пиковый RSS процесса в байтах за всё время работы.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдаёт КиБ, macOS - байты
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _is_ignored(stat: tracemalloc.StatisticDiff) -> bool:
+    # Фильтруем уже сгруппированную статистику: Snapshot.filter_traces перебирает
+    # каждую трассу через fnmatch и на большой куче занимает секунды
+    filename = stat.traceback[0].filename
+    return filename in _IGNORED_FILES or filename == __file__
+
+
+class MemoryProfiler:
+    """
+    top - сколько мест с наибольшим приростом памяти сохранять для этапа;
+    frames - глубина стека tracemalloc (1 - только строка, где выделена память);
+    snapshot_calls - для скольких первых вызовов этапа снимать снимки. Сравнение
+    снимков на куче в сотни тысяч трасс занимает секунды, а у повторных вызовов
+    (шаг навигации на каждый вопрос) места выделения те же; для остальных вызовов
+    пишутся только счётчики памяти и RSS.
+    """
+    def __init__(self, top: int = DEFAULT_TOP, frames: int = 1, snapshot_calls: int = 1):
+        self.top = top
+        self.frames = frames
+        self.snapshot_calls = snapshot_calls
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        # Для каждого открытого этапа - максимальный пик его вложенных этапов
+        self._child_peaks: List[int] = []
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+
+    @contextmanager
+    def stage(self, name: str):
+        self.start()
+        calls = self.stages[name]["calls"] if name in self.stages else 0
+        before = tracemalloc.take_snapshot() if calls < self.snapshot_calls else None
+        rss_before = current_rss()
+        traced_before, parent_peak = tracemalloc.get_traced_memory()
+        if self._child_peaks:
+            self._child_peaks[-1] = max(self._child_peaks[-1], parent_peak)
+        tracemalloc.reset_peak()
+        self._child_peaks.append(0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            traced_after, own_peak = tracemalloc.get_traced_memory()
+            peak = max(own_peak, self._child_peaks.pop())
+            if self._child_peaks:
+                self._child_peaks[-1] = max(self._child_peaks[-1], peak)
+            top = None
+            if before is not None:
+                after = tracemalloc.take_snapshot()
+                stats = (
+                    stat for stat in after.compare_to(before, "lineno")
+                    if stat.size_diff > 0 and not _is_ignored(stat)
+                )
+                top = [
+                    {"where": str(stat.traceback), "size_diff": stat.size_diff, "count_diff": stat.count_diff}
+                    for stat, _ in zip(stats, range(self.top))
+                ]
+            self._record(name, {
+                "seconds": seconds,
+                "allocated": traced_after - traced_before,
+                "peak": peak - traced_before,
+                "rss_before": rss_before,
+                "rss_after": current_rss(),
+                "peak_rss": peak_rss(),
+                "top": top,
+            })
+
+    def _record(self, name: str, sample: Dict[str, Any]) -> None:
+        """
+        Повторные вызовы этапа: время и прирост суммируются, пик - максимум,
+        top - от вызова со снимками и наибольшим пиком.
+        """
+        record = self.stages.get(name)
+        if record is None:
+            self.stages[name] = {"calls": 1, **sample, "top": sample["top"] or []}
+            return
+        record["calls"] += 1
+        record["seconds"] += sample["seconds"]
+        record["allocated"] += sample["allocated"]
+        record["rss_after"] = sample["rss_after"]
+        record["peak_rss"] = sample["peak_rss"]
+        if sample["peak"] > record["peak"]:
+            record["peak"] = sample["peak"]
+            if sample["top"] is not None:
+                record["top"] = sample["top"]
+
+    def report(self) -> Dict[str, Any]:
+        traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+        return {
+            "pid": os.getpid(),
+            "python": sys.version.split()[0],
+            "traced_current": traced,
+            "rss": current_rss(),
+            "peak_rss": peak_rss(),
+            "stages": self.stages,
+        }
+
+    def save(self, file_path: str) -> None:
+        dump_json(self.report(), file_path)
+
+    def format_report(self, top: int = 3) -> str:
+        lines = [f"{'этап':28} {'вызовов':>8} {'прирост, КиБ':>13} {'пик, КиБ':>10} {'RSS, МиБ':>9} {'время, с':>9}"]
+        for name, record in self.stages.items():
+            rss = record["rss_after"] / 2 ** 20 if record["rss_after"] else 0.0
+            lines.append(
+                f"{name:28} {record['calls']:8} {record['allocated'] / 1024:13.1f} {record['peak'] / 1024:10.1f}"
+                f" {rss:9.1f} {record['seconds']:9.3f}"
+            )
+            for item in record["top"][:top]:
+                lines.append(f"    {item['size_diff'] / 1024:10.1f} КиБ  {item['where']}")
+        return "\n".join(lines)
+
+
+_active: Optional[MemoryProfiler] = None
+
+
+def stage(name: str):
+    """
+    Контекст этапа; без включённого профилировщика - пустой.
+    """
+    return _active.stage(name) if _active is not None else nullcontext()
+
+
+def enable(
+    report_file: Optional[str] = None,
+    top: int = DEFAULT_TOP,
+    frames: int = 1,
+    snapshot_calls: int = 1
+) -> MemoryProfiler:
+    """
+    Включает профилировщик процесса; с report_file отчёт записывается при выходе.
+    """
+    global _active
+    if _active is None:
+        _active = MemoryProfiler(top, frames, snapshot_calls)
+        _active.start()
+        if report_file:
+            atexit.register(_active.save, report_file)
+    return _active
+
+
+def enable_from_env() -> Optional[MemoryProfiler]:
+    """
+    Включает профилировщик, если задана переменная MEMORY_PROFILE (путь к файлу отчёта).
+    """
+    report_file = os.environ.get(ENV_VAR)
+    return enable(report_file) if report_file else None
+
+
+def disable() -> None:
+    global _active
+    _active = None
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def active() -> Optional[MemoryProfiler]:
+    return _active
+
+
+def profiled(name: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Вызов func(*args, **kwargs) внутри этапа name.
+    """
+    with stage(name):
+        return func(*args, **kwargs)
@@ -0,0 +1,219 @@
+# model_cascade.py
+"""
+Каскад моделей для шагов навигации: дешёвый уровень решает первым, GigaChat-Max
+вызывается только для неуверенных решений.
+
+Уровни каскада перечисляются строкой вида "faq:0.6,local:0.5,GigaChat-Lite:0.7":
+- faq - индекс синтетических вопросов (faq_index) без обращения к LLM;
+  уверенность - близость ближайшего синтетического вопроса среди подглав узла;
+- local - LocalRanker (BM25) без обращения к LLM; уверенность - относительный
+  отрыв лучшего кандидата от второго: (s1 - s2) / s1;
+- имя модели - запрос к этой модели в режиме brief (gigachat_module.ROUTING_MODES),
+  уверенность - поле confidence ответа.
+Число после двоеточия - порог: решение уровня принимается, если уверенность не
+ниже порога и выбранный узел есть в карте знаний среди потомков выбранного
+родителя. Иначе шаг переходит к следующему уровню, а после последнего - к
+обычному запросу шага (модель из StepModels, режим навигации конфигурации).
+
+Решение нижнего уровня возвращается в схеме brief (выбор, обоснование уровня и
+его уверенность), а не в схеме режима навигации: поля рассуждений режима full
+заполняет только модель шага. Вместе с решением decide возвращает имя уровня,
+который его принял; navigate записывает его в decided_by и кладёт в кеш
+навигации только решения финального запроса шага.
+"""
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Tuple
+
+from pydantic import BaseModel
+
+from book_models import KnowMap
+from gigachat_module import get_book_part_reasoning, get_chapter_reasoning, get_subchapter_reasoning, ROUTING_MODES
+from response_schema import DEFAULT_SCHEMA_MODE
+
+LOCAL_TIER = "local"
+FAQ_TIER = "faq"
+FINAL_TIER = "final"
+DEFAULT_THRESHOLD = 0.5
+JUSTIFICATION_LENGTH = 200
+
+# Уровень -> поле с выбранным номером и функция запроса шага
+LEVEL_STEPS = {
+    "part": ("selected_part", get_book_part_reasoning),
+    "chapter": ("selected_chapter", get_chapter_reasoning),
+    "subchapter": ("selected_subchapter", get_subchapter_reasoning),
+}
+
+
+@dataclass(frozen=True)
+class CascadeTier:
+    name: str
+    threshold: float = DEFAULT_THRESHOLD
+
+
+def parse_tiers(spec: str) -> List[CascadeTier]:
+    """
+    "local:0.5,GigaChat-Lite:0.7" -> уровни каскада по порядку; без порога - DEFAULT_THRESHOLD.
+    """
+    tiers = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, threshold = item.partition(":")
+        tiers.append(CascadeTier(name.strip(), float(threshold) if threshold else DEFAULT_THRESHOLD))
+    if not tiers:
+        raise ValueError("Пустой список уровней каскада")
+    return tiers
+
+
+def as_brief(level: str, value: Any, justification: str, confidence: float) -> BaseModel:
+    """
+    Решение нижнего уровня в схеме brief шага level.
+    """
+    attr, _ = LEVEL_STEPS[level]
+    _, response_model = ROUTING_MODES["brief"][level]
+    return response_model.model_validate({
+        attr: value,
+        "justification": justification[:JUSTIFICATION_LENGTH],
+        "confidence": min(max(confidence, 0.0), 1.0),
+    })
+
+
+class ModelCascade:
+    """
+    tiers - уровни каскада до финального запроса шага (parse_tiers).
+    ranker нужен для уровня local (по умолчанию LocalRanker строится лениво),
+    faq_index (faq_index.FaqIndex) - для уровня faq.
+    Статистика в stats: решения и время (секунды) по уровням каскада и число
+    решений, отклонённых проверкой по карте знаний.
+    """
+    def __init__(
+        self,
+        client,
+        know_map: KnowMap,
+        tiers: List[CascadeTier],
+        ranker=None,
+        schema_mode: str = DEFAULT_SCHEMA_MODE,
+        faq_index=None
+    ):
+        if faq_index is None and any(tier.name == FAQ_TIER for tier in tiers):
+            raise ValueError("Для уровня каскада faq нужен faq_index")
+        self.client = client
+        self.know_map = know_map
+        self.tiers = tiers
+        self.faq_index = faq_index
+        self.schema_mode = schema_mode
+        self._ranker = ranker
+        self._lock = threading.Lock()
+        names = [tier.name for tier in tiers] + [FINAL_TIER]
+        self.stats: Dict[str, Any] = {
+            "decisions": {level: {name: 0 for name in names} for level in LEVEL_STEPS},
+            "seconds": {name: 0.0 for name in names},
+            "rejected": 0,
+        }
+
+    @property
+    def ranker(self):
+        if self._ranker is None:
+            from local_ranker import LocalRanker
+            self._ranker = LocalRanker(self.know_map)
+        return self._ranker
+
+    def _is_valid(self, level: str, parent: Tuple, selected: Any) -> bool:
+        if level == "part":
+            return self.know_map.find_part(selected) is not None
+        if level == "chapter":
+            return self.know_map.find_chapter(parent[0], selected) is not None
+        sub = self.know_map.find_subchapter(selected)
+        return sub is not None and (sub.part_number, sub.chapter_number) == tuple(parent)
+
+    def _local(self, level: str, parent: Tuple, question: str) -> Tuple[Any, float, str]:
+        if level == "part":
+            ranked = self.ranker.rank_parts(question)
+        elif level == "chapter":
+            ranked = self.ranker.rank_chapters(question, *parent)
+        else:
+            ranked = self.ranker.rank_subchapters(question, *parent)
+        if not ranked:
+            return None, 0.0, ""
+        best = ranked[0][1]
+        second = ranked[1][1] if len(ranked) > 1 else 0.0
+        confidence = (best - second) / best if best > 0 else 0.0
+        return ranked[0][0], confidence, f"Выбрано локальным ранжированием (BM25), отрыв {confidence:.2f}"
+
+    def _faq(self, level: str, parent: Tuple, question: str) -> Tuple[Any, float, str]:
+        number, score = self.faq_index.route(question, *parent)
+        sub = self.know_map.find_subchapter(number) if number is not None else None
+        if sub is None:
+            return None, 0.0, ""
+        selected = {"part": sub.part_number, "chapter": sub.chapter_number}.get(level, str(sub.subchapter_number))
+        return selected, score, f"Совпадение с синтетическим вопросом подглавы {number}, близость {score:.2f}"
+
+    def _model(self, tier: CascadeTier, level: str, catalogue: str, question: str) -> Tuple[Any, float, str]:
+        attr, request = LEVEL_STEPS[level]
+        prompt, response_model = ROUTING_MODES["brief"][level]
+        result = request(self.client, prompt, catalogue, question, tier.name, self.schema_mode, response_model)
+        return getattr(result, attr), result.confidence, result.justification
+
+    def _record(self, level: str, tier: str, seconds: float, rejected: bool = False) -> None:
+        with self._lock:
+            self.stats["seconds"][tier] += seconds
+            if rejected:
+                self.stats["rejected"] += 1
+            elif level:
+                self.stats["decisions"][level][tier] += 1
+
+    def decide(
+        self,
+        level: str,
+        parent: Tuple,
+        question: str,
+        catalogue: str,
+        escalate: Callable[[], BaseModel]
+    ) -> Tuple[BaseModel, str]:
+        """
+        Решение шага level (parent - () для части, (part,) для главы, (part, chapter)
+        для подглавы) и имя принявшего его уровня. escalate - обычный запрос шага,
+        последний уровень каскада (FINAL_TIER).
+        """
+        for tier in self.tiers:
+            start = time.perf_counter()
+            try:
+                if tier.name == LOCAL_TIER:
+                    selected, confidence, justification = self._local(level, parent, question)
+                elif tier.name == FAQ_TIER:
+                    selected, confidence, justification = self._faq(level, parent, question)
+                else:
+                    selected, confidence, justification = self._model(tier, level, catalogue, question)
+            except Exception:
+                self._record("", tier.name, time.perf_counter() - start)
+                continue
+            if not self._is_valid(level, parent, selected):
+                self._record(level, tier.name, time.perf_counter() - start, rejected=True)
+                continue
+            accepted = confidence >= tier.threshold
+            self._record(level if accepted else "", tier.name, time.perf_counter() - start)
+            if accepted:
+                return as_brief(level, selected, justification, confidence), tier.name
+        start = time.perf_counter()
+        result = escalate()
+        self._record(level, FINAL_TIER, time.perf_counter() - start)
+        return result, FINAL_TIER
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Доля решений каждого уровня каскада и доля эскалаций к финальному запросу.
+        """
+        decisions = self.stats["decisions"]
+        total = sum(sum(by_tier.values()) for by_tier in decisions.values())
+        escalated = sum(by_tier[FINAL_TIER] for by_tier in decisions.values())
+        return {
+            "steps": total,
+            "escalation_rate": escalated / total if total else 0.0,
+            "escalation_rate_by_level": {
+                level: by_tier[FINAL_TIER] / sum(by_tier.values()) if sum(by_tier.values()) else 0.0
+                for level, by_tier in decisions.items()
+            },
+            "decisions": decisions,
+            "seconds": self.stats["seconds"],
+            "rejected": self.stats["rejected"],
+        }
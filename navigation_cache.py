@@ -0,0 +1,145 @@
+# navigation_cache.py
+"""
+Постоянная таблица мемоизации навигации: нормализованный вопрос -> результаты
+рассуждений шагов 1-3 (часть, глава, подглава).
+
+Записи живут ttl_seconds и автоматически сбрасываются, когда меняется содержимое
+know_map_full.json (по хешу файла). Попадание на любом уровне позволяет продолжить
+каскад с этого уровня, а не с шага 1.
+
+Ключ записи - (namespace, fingerprint, вопрос, уровень). namespace описывает всё,
+от чего зависит выбор, кроме карты знаний: модели шагов, профиль каталогов,
+режимы навигации и схемы (Pipeline строит его по конфигурации). Поэтому
+конфигурации и книги с общим файлом кеша не отдают друг другу свои результаты.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Type
+
+from pydantic import BaseModel, ValidationError
+
+from gigachat_module import BookPartReasoning, ChapterReasoning, SubchapterReasoning
+from json_io import file_fingerprint
+
+DEFAULT_CACHE_FILE = "navigation_cache.sqlite3"
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# Уровни в порядке каскада и модели их результатов
+LEVELS = {
+    "part": BookPartReasoning,
+    "chapter": ChapterReasoning,
+    "subchapter": SubchapterReasoning,
+}
+
+
+def normalize_question(question: str) -> str:
+    """
+    Ключ вопроса: без регистра, лишних пробелов и финальной пунктуации.
+    """
+    return re.sub(r"\s+", " ", question).strip().lower().rstrip("?!. ")
+
+
+class NavigationCache:
+    def __init__(
+        self,
+        know_map_file: str,
+        cache_file: str = DEFAULT_CACHE_FILE,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        namespace: str = ""
+    ):
+        self.know_map_file = know_map_file
+        self.ttl_seconds = ttl_seconds
+        # Записи старых версий карты знаний удаляются только в своём пространстве:
+        # в том же файле могут лежать результаты для других книг
+        self.namespace = f"{os.path.abspath(know_map_file)}|{namespace}"
+        self._lock = threading.Lock()
+        self._stat = None
+        self._fingerprint = None
+        self._conn = sqlite3.connect(cache_file, check_same_thread=False)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(navigation)")]
+        if columns and "namespace" not in columns:
+            # Файл кеша старого формата (ключ без namespace) - это только кеш, пересоздаём
+            self._conn.execute("DROP TABLE navigation")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS navigation (
+                namespace TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                question TEXT NOT NULL,
+                level TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (namespace, fingerprint, question, level)
+            )
+            """
+        )
+        self._conn.commit()
+
+    @property
+    def fingerprint(self) -> str:
+        """
+        Хеш know_map_full.json; пересчитывается только при изменении mtime/размера файла.
+        При смене хеша записи этого namespace для старой карты знаний удаляются.
+        """
+        stat = os.stat(self.know_map_file)
+        key = (stat.st_mtime_ns, stat.st_size)
+        if key != self._stat:
+            fingerprint = file_fingerprint(self.know_map_file)
+            if fingerprint != self._fingerprint:
+                self._conn.execute(
+                    "DELETE FROM navigation WHERE namespace = ? AND fingerprint != ?", (self.namespace, fingerprint)
+                )
+                self._conn.commit()
+            self._stat, self._fingerprint = key, fingerprint
+        return self._fingerprint
+
+    def get(self, question: str, models: Optional[Dict[str, Type[BaseModel]]] = None) -> Dict[str, BaseModel]:
+        """
+        Результаты, известные для вопроса, - только непрерывный префикс каскада:
+        глава без части (или подглава без главы) не используется.
+        models - схемы уровней для режима навигации (по умолчанию полные). Запись,
+        которая не проходит проверку схемой, считается промахом.
+        """
+        models = models or LEVELS
+        with self._lock:
+            rows = dict(self._conn.execute(
+                "SELECT level, result FROM navigation "
+                "WHERE namespace = ? AND fingerprint = ? AND question = ? AND created_at >= ?",
+                (self.namespace, self.fingerprint, normalize_question(question), time.time() - self.ttl_seconds)
+            ).fetchall())
+        results = {}
+        for level, model in models.items():
+            if level not in rows:
+                break
+            try:
+                results[level] = model.model_validate_json(rows[level])
+            except ValidationError:
+                break
+        return results
+
+    def put(self, question: str, level: str, result: BaseModel) -> None:
+        if level not in LEVELS:
+            raise ValueError(f"Неизвестный уровень навигации: {level}")
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO navigation VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    self.namespace, self.fingerprint, normalize_question(question), level,
+                    result.model_dump_json(), time.time()
+                )
+            )
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM navigation WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,275 @@
+# passage_index.py
+"""
+Индекс фрагментов (абзацев) книги для поиска релевантных отрывков.
+
+Страницы kniga_full_content.json режутся на фрагменты до max_tokens токенов по
+границам абзацев; фрагмент не пересекает границу страницы и помечается частью,
+главой и подглавой своей страницы (первой из карты знаний, в которой она указана).
+
+Векторы - hashing trick без обучаемой модели: основы слов и пары соседних основ
+хешируются (crc32) в dim корзин со знаком, веса - log(1 + tf) * idf, строки
+нормированы. Матрица хранится как float32 .npy и может открываться через mmap.
+Поиск - одно умножение матрицы на вектор вопроса; фильтр по подглаве/главе/части
+ограничивает кандидатов страницами узла из карты знаний.
+"""
+import os
+import re
+import zlib
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from book_models import Book, KnowMap
+from json_io import dump_json, load_json
+from local_ranker import tokenize
+from token_counter import estimate_tokens
+
+INDEX_DIR = "data_index/passages"
+DEFAULT_DIM = 4096
+DEFAULT_CHUNK_TOKENS = 120
+
+_SENTENCE_END = re.compile(r"[.!?…:»\"')]\s*$")
+_SENTENCE_PATTERN = re.compile(r"(?<=[.!?…])\s+")
+
+
+@dataclass(slots=True)
+class Passage:
+    text: str
+    page_number: int
+    part_number: Optional[int]
+    chapter_number: Optional[int]
+    subchapter_number: Optional[str]
+    position: int = 0
+    score: float = 0.0
+
+
+# -------------------------------------------------------------------
+# Нарезка страниц на фрагменты
+# -------------------------------------------------------------------
+def split_paragraphs(text: str) -> List[str]:
+    """
+    Абзацы страницы: строки склеиваются, пока строка не заканчивается концом
+    предложения; перенос слова через дефис на конце строки снимается.
+    """
+    paragraphs, current = [], ""
+    for line in text.split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        if current.endswith("-") and current[-2:-1].isalpha():
+            current = current[:-1] + line
+        else:
+            current = f"{current} {line}" if current else line
+        if _SENTENCE_END.search(current):
+            paragraphs.append(current)
+            current = ""
+    if current:
+        paragraphs.append(current)
+    return paragraphs
+
+
+def chunk_text(text: str, max_tokens: int = DEFAULT_CHUNK_TOKENS) -> List[str]:
+    """
+    Абзацы объединяются во фрагменты до max_tokens; слишком длинный абзац
+    делится по предложениям.
+    """
+    pieces = []
+    for paragraph in split_paragraphs(text):
+        if estimate_tokens(paragraph) <= max_tokens:
+            pieces.append(paragraph)
+        else:
+            pieces.extend(s for s in _SENTENCE_PATTERN.split(paragraph) if s)
+
+    chunks, current, used = [], [], 0
+    for piece in pieces:
+        tokens = estimate_tokens(piece)
+        if current and used + tokens > max_tokens:
+            chunks.append(" ".join(current))
+            current, used = [], 0
+        current.append(piece)
+        used += tokens
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def page_tags(know_map: KnowMap) -> Dict[int, Tuple[int, int, str]]:
+    """
+    Страница -> (часть, глава, подглава) первой подглавы, в которой она указана.
+    """
+    tags = {}
+    for sub in know_map.iter_subchapters():
+        for page in sub.pages:
+            tags.setdefault(page, (sub.part_number, sub.chapter_number, str(sub.subchapter_number)))
+    return tags
+
+
+def build_passages(book: Book, know_map: KnowMap, max_tokens: int = DEFAULT_CHUNK_TOKENS) -> List[Passage]:
+    tags = page_tags(know_map)
+    passages = []
+    for page in book.pages:
+        part, chapter, sub = tags.get(page.pageNumber, (None, None, None))
+        for chunk in chunk_text(page.content, max_tokens):
+            passages.append(Passage(chunk, page.pageNumber, part, chapter, sub, len(passages)))
+    return passages
+
+
+# -------------------------------------------------------------------
+# Hashing-векторы
+# -------------------------------------------------------------------
+@lru_cache(maxsize=65536)
+def _bucket(feature: str, dim: int) -> Tuple[int, float]:
+    h = zlib.crc32(feature.encode("utf-8"))
+    return h % dim, (1.0 if (h >> 31) & 1 else -1.0)
+
+
+def features(text: str) -> List[str]:
+    stems = tokenize(text)
+    return stems + [f"{a} {b}" for a, b in zip(stems, stems[1:])]
+
+
+def hash_counts(text: str, dim: int) -> Dict[int, float]:
+    counts: Dict[int, float] = {}
+    for feature in features(text):
+        index, sign = _bucket(feature, dim)
+        counts[index] = counts.get(index, 0.0) + sign
+    return counts
+
+
+class PassageIndex:
+    def __init__(self, passages: List[Passage], matrix: np.ndarray, idf: np.ndarray):
+        self.passages = passages
+        self.matrix = matrix
+        self.idf = idf
+        self.dim = matrix.shape[1]
+        self.pages = np.fromiter((p.page_number for p in passages), dtype=np.int32, count=len(passages))
+
+    @classmethod
+    def build(
+        cls,
+        book: Book,
+        know_map: KnowMap,
+        dim: int = DEFAULT_DIM,
+        max_tokens: int = DEFAULT_CHUNK_TOKENS
+    ) -> "PassageIndex":
+        passages = build_passages(book, know_map, max_tokens)
+        counts = [hash_counts(p.text, dim) for p in passages]
+
+        document_frequency = np.zeros(dim, dtype=np.float32)
+        for row in counts:
+            document_frequency[list(row)] += 1
+        idf = np.log((1 + len(passages)) / (1 + document_frequency)).astype(np.float32) + 1
+
+        matrix = np.zeros((len(passages), dim), dtype=np.float32)
+        for i, row in enumerate(counts):
+            if row:
+                columns = np.fromiter(row.keys(), dtype=np.int64, count=len(row))
+                values = np.fromiter(row.values(), dtype=np.float32, count=len(row))
+                matrix[i, columns] = np.sign(values) * np.log1p(np.abs(values)) * idf[columns]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1, norms)
+        return cls(passages, matrix, idf)
+
+    def vectorize(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for index, value in hash_counts(text, self.dim).items():
+            vector[index] = np.sign(value) * np.log1p(abs(value)) * self.idf[index]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def candidate_rows(self, know_map: KnowMap = None, part: int = None, chapter: int = None,
+                       subchapter: str = None) -> Optional[np.ndarray]:
+        """
+        Номера строк фрагментов, лежащих на страницах выбранного узла; None - вся книга.
+        """
+        if know_map is None and (part, chapter, subchapter) != (None, None, None):
+            raise ValueError("Для фильтра по узлу карты знаний нужен know_map")
+        if subchapter is not None:
+            node = know_map.find_subchapter(subchapter)
+        elif chapter is not None:
+            node = know_map.find_chapter(part, chapter)
+        elif part is not None:
+            node = know_map.find_part(part)
+        else:
+            return None
+        if node is None:
+            return np.empty(0, dtype=np.int64)
+        return np.flatnonzero(np.isin(self.pages, node.pages))
+
+    def search(
+        self,
+        question: str,
+        k: int = 5,
+        know_map: KnowMap = None,
+        part: int = None,
+        chapter: int = None,
+        subchapter: str = None
+    ) -> List[Passage]:
+        """
+        k лучших фрагментов по косинусной близости; фильтр part/chapter/subchapter
+        требует know_map (страницы узла берутся из неё).
+        """
+        rows = self.candidate_rows(know_map, part, chapter, subchapter)
+        query = self.vectorize(question)
+        if rows is None:
+            scores = self.matrix @ query
+            rows = np.arange(len(scores))
+        else:
+            scores = self.matrix[rows] @ query
+        if len(scores) == 0:
+            return []
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        results = []
+        for i in top:
+            p = self.passages[rows[i]]
+            results.append(Passage(p.text, p.page_number, p.part_number, p.chapter_number,
+                                   p.subchapter_number, p.position, float(scores[i])))
+        return results
+
+    # ---------------------------------------------------------------
+    # Сохранение: matrix.npy и idf.npy (mmap-совместимые) + passages.json
+    # ---------------------------------------------------------------
+    def save(self, directory: str = INDEX_DIR) -> None:
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "matrix.npy"), self.matrix)
+        np.save(os.path.join(directory, "idf.npy"), self.idf)
+        dump_json(
+            [[p.text, p.page_number, p.part_number, p.chapter_number, p.subchapter_number] for p in self.passages],
+            os.path.join(directory, "passages.json"),
+            compact=True
+        )
+
+    @classmethod
+    def load(cls, directory: str = INDEX_DIR, mmap: bool = False) -> "PassageIndex":
+        """
+        mmap=True - матрица не читается в память целиком, страницы подгружаются ОС по мере поиска
+        и разделяются между процессами.
+        """
+        matrix = np.load(os.path.join(directory, "matrix.npy"), mmap_mode="r" if mmap else None)
+        idf = np.load(os.path.join(directory, "idf.npy"))
+        rows = load_json(os.path.join(directory, "passages.json"))
+        passages = [Passage(*row, position=i) for i, row in enumerate(rows)]
+        return cls(passages, matrix, idf)
+
+
+def join_passages(passages: Iterable[Passage]) -> str:
+    """
+    Текст для промпта: фрагменты в порядке книги, с номерами страниц.
+    """
+    ordered = sorted(passages, key=lambda p: p.position)
+    return "\n\n".join(f"[стр. {p.page_number}] {p.text}" for p in ordered)
+
+
+if __name__ == "__main__":
+    from json_io import load_book, load_know_map
+
+    index = PassageIndex.build(
+        load_book("data_update/kniga_full_content.json"),
+        load_know_map("data_know_map/know_map_full.json")
+    )
+    index.save()
+    print(f"Фрагментов: {len(index.passages)}, матрица {index.matrix.shape} -> {INDEX_DIR}")
@@ -0,0 +1,584 @@
+# pipeline.py
+"""
+Конвейер ответа на вопрос: навигация часть -> глава -> подглава и финальный ответ.
+
+navigate/answer_question - функции без состояния. Pipeline собирает всё, что им
+нужно, по PipelineConfig (файл или переменные окружения): карту знаний, страницы,
+профиль отображения, кеш навигации, индекс фрагментов, клиента и модели шагов.
+Производное состояние (загруженные файлы, каталоги, клиенты) разделяется между
+всеми Pipeline процесса с одинаковыми входами, поэтому один процесс может
+обслуживать много конфигураций без повторной загрузки.
+"""
+import dataclasses
+import os
+import threading
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import memory_profile
+from book_models import Book, KnowMap
+from content_book_parser import ContentPartsParser, ChapterParser, SubchapterParser, PageContentParser
+from gigachat_module import (
+    get_book_part_reasoning,
+    get_chapter_reasoning,
+    get_subchapter_reasoning,
+    get_final_answer,
+    DEFAULT_MODEL,
+    DEFAULT_ROUTING_MODE,
+    ROUTING_MODES,
+    SYSTEM_PROMPT_FINAL
+)
+from model_cascade import FINAL_TIER
+from navigation_cache import NavigationCache
+from render_profiles import (
+    DEFAULT_SUMMARY_TOKENS,
+    FULL_PROFILE,
+    RenderProfile,
+    get_profile,
+    load_condensed_summaries
+)
+from response_schema import DEFAULT_SCHEMA_MODE
+
+
+@dataclass(frozen=True)
+class StepModels:
+    """
+    Модель для каждого шага: навигацию можно отдать более дешёвой модели
+    (например, GigaChat-Lite), а финальный ответ оставить на Max.
+    """
+    part: str = DEFAULT_MODEL
+    chapter: str = DEFAULT_MODEL
+    subchapter: str = DEFAULT_MODEL
+    final: str = DEFAULT_MODEL
+
+
+DEFAULT_MODELS = StepModels()
+
+
+class Catalogues:
+    """
+    Тексты каталогов для промптов навигации. Каждый каталог строится один раз:
+    при одной карте знаний и профиле он одинаков для всех вопросов.
+    """
+    def __init__(self, know_map: KnowMap, profile: RenderProfile = FULL_PROFILE):
+        self.parts_parser = ContentPartsParser(know_map, profile)
+        self.chapter_parser = ChapterParser(know_map, profile)
+        self.subchapter_parser = SubchapterParser(know_map, profile)
+        self._parts: Optional[str] = None
+        self._chapters: Dict[int, str] = {}
+        self._subchapters: Dict[Tuple[int, int], str] = {}
+
+    def parts(self) -> str:
+        if self._parts is None:
+            self._parts = "\n\n".join(self.parts_parser.parse_parts())
+        return self._parts
+
+    def chapters(self, part_number: int) -> str:
+        if part_number not in self._chapters:
+            self._chapters[part_number] = "\n\n".join(self.chapter_parser.parse_chapters_by_part(part_number))
+        return self._chapters[part_number]
+
+    def subchapters(self, part_number: int, chapter_number: int) -> str:
+        key = (part_number, chapter_number)
+        if key not in self._subchapters:
+            self._subchapters[key] = "\n\n".join(
+                self.subchapter_parser.parse_subchapters_by_chapter(part_number, chapter_number)
+            )
+        return self._subchapters[key]
+
+
+def navigate(
+    client,
+    know_map: KnowMap,
+    question: str,
+    cache: Optional[NavigationCache] = None,
+    profile: RenderProfile = FULL_PROFILE,
+    models: StepModels = DEFAULT_MODELS,
+    catalogues: Optional[Catalogues] = None,
+    schema_mode: str = DEFAULT_SCHEMA_MODE,
+    routing_mode: str = DEFAULT_ROUTING_MODE,
+    cascade=None
+) -> Dict[str, Any]:
+    """
+    Шаги 1-3: последовательный выбор части, главы и подглавы книги.
+    С cache каскад продолжается с первого уровня, которого нет в таблице мемоизации;
+    profile задаёт подробность каталогов в промптах (render_profiles),
+    schema_mode - компактная или полная схема ответа (response_schema),
+    routing_mode - full (рассуждения), lean (только выбор) или brief
+    (выбор, обоснование и уверенность), см. gigachat_module.ROUTING_MODES.
+    С cascade (model_cascade.ModelCascade) каждый шаг сначала решают дешёвые
+    уровни каскада, а запрос к модели шага делается только для неуверенных решений;
+    в decided_by результата - уровень, принявший решение каждого шага ("cache" -
+    решение из кеша), в кеш записываются только решения финального запроса шага.
+    """
+    if routing_mode not in ROUTING_MODES:
+        raise ValueError(f"Неизвестный режим навигации: {routing_mode}. Доступны: {', '.join(ROUTING_MODES)}")
+    steps = ROUTING_MODES[routing_mode]
+    catalogues = catalogues or Catalogues(know_map, profile)
+    results = cache.get(question, {level: model for level, (_, model) in steps.items()}) if cache is not None else {}
+
+    decided_by: Dict[str, str] = {level: "cache" for level in results}
+
+    def decide(level: str, parent: Tuple, catalogue: str, request: Callable[[], Any]) -> None:
+        if cascade is None:
+            results[level] = request()
+        else:
+            results[level], decided_by[level] = cascade.decide(level, parent, question, catalogue, request)
+        # Решения нижних уровней каскада в кеш не попадают: кеш общий с конвейерами без каскада
+        if cache is not None and decided_by.get(level, FINAL_TIER) == FINAL_TIER:
+            cache.put(question, level, results[level])
+
+    if "part" not in results:
+        prompt, response_model = steps["part"]
+        catalogue = catalogues.parts()
+        with memory_profile.stage("step.part"):
+            decide("part", (), catalogue, lambda: get_book_part_reasoning(
+                client, prompt, catalogue, question, models.part, schema_mode, response_model
+            ))
+    selected_part = results["part"].selected_part
+
+    if "chapter" not in results:
+        prompt, response_model = steps["chapter"]
+        catalogue = catalogues.chapters(selected_part)
+        with memory_profile.stage("step.chapter"):
+            decide("chapter", (selected_part,), catalogue, lambda: get_chapter_reasoning(
+                client, prompt, catalogue, question, models.chapter, schema_mode, response_model
+            ))
+    selected_chapter = results["chapter"].selected_chapter
+
+    if "subchapter" not in results:
+        prompt, response_model = steps["subchapter"]
+        catalogue = catalogues.subchapters(selected_part, selected_chapter)
+        parent = (selected_part, selected_chapter)
+        with memory_profile.stage("step.subchapter"):
+            decide("subchapter", parent, catalogue, lambda: get_subchapter_reasoning(
+                client, prompt, catalogue, question, models.subchapter, schema_mode, response_model
+            ))
+
+    navigation = {
+        "part": results["part"],
+        "chapter": results["chapter"],
+        "subchapter": results["subchapter"],
+    }
+    if cascade is not None:
+        navigation["decided_by"] = decided_by
+    return navigation
+
+
+def answer_question(
+    client,
+    know_map: KnowMap,
+    book: Book,
+    question: str,
+    cache: Optional[NavigationCache] = None,
+    profile: RenderProfile = FULL_PROFILE,
+    passage_index=None,
+    models: StepModels = DEFAULT_MODELS,
+    catalogues: Optional[Catalogues] = None,
+    schema_mode: str = DEFAULT_SCHEMA_MODE,
+    routing_mode: str = DEFAULT_ROUTING_MODE,
+    cascade=None
+) -> Dict[str, Any]:
+    """
+    Полный конвейер: навигация по карте знаний, извлечение страниц подглавы и финальный ответ.
+    С passage_index (passage_index.PassageIndex) в финальный промпт идут только
+    фрагменты подглавы, ближайшие к вопросу, а не все её страницы.
+    """
+    navigation = navigate(
+        client, know_map, question, cache, profile, models, catalogues, schema_mode, routing_mode, cascade
+    )
+    return answer_from_navigation(client, know_map, book, question, navigation, passage_index, models)
+
+
+def answer_from_navigation(
+    client,
+    know_map: KnowMap,
+    book: Book,
+    question: str,
+    navigation: Dict[str, Any],
+    passage_index=None,
+    models: StepModels = DEFAULT_MODELS
+) -> Dict[str, Any]:
+    """
+    Извлечение страниц выбранной подглавы и финальный ответ для готового результата навигации.
+    """
+    selected_subchapter = navigation["subchapter"].selected_subchapter
+    with memory_profile.stage("step.pages"):
+        page_parser = PageContentParser(know_map, book)
+        if passage_index is not None:
+            final_content = page_parser.parse_relevant_passages(selected_subchapter, question, passage_index)
+        else:
+            final_content = page_parser.parse_final_content(selected_subchapter)
+    with memory_profile.stage("step.final"):
+        final_answer = get_final_answer(client, SYSTEM_PROMPT_FINAL, final_content, question, models.final)
+    return {**navigation, "answer": final_answer}
+
+
+# -------------------------------------------------------------------
+# Конфигурация и объект конвейера
+# -------------------------------------------------------------------
+@dataclass(frozen=True)
+class PipelineConfig:
+    name: str = "default"
+    know_map_file: str = "data_know_map/know_map_full.json"
+    book_file: str = "data_update/kniga_full_content.json"
+    access_token_env: str = "GIGACHAT_ACCESS_TOKEN"
+    part_model: str = DEFAULT_MODEL
+    chapter_model: str = DEFAULT_MODEL
+    subchapter_model: str = DEFAULT_MODEL
+    final_model: str = DEFAULT_MODEL
+    profile: str = "full"
+    summary_tokens: int = DEFAULT_SUMMARY_TOKENS
+    passages: bool = False
+    passage_index_dir: str = "data_index/passages"
+    cache_file: Optional[str] = "navigation_cache.sqlite3"
+    max_concurrency: int = 8
+    # Загрузка карты знаний по частям (know_map_store) вместо know_map_full.json целиком
+    know_map_store: bool = False
+    max_shards: int = 8
+    # Бинарное хранилище страниц и карты знаний (shared_store), общее для процессов-воркеров
+    shared_store: Optional[str] = None
+    schema_mode: str = DEFAULT_SCHEMA_MODE
+    routing_mode: str = DEFAULT_ROUTING_MODE
+    # Каскад моделей навигации (model_cascade), например "faq:0.6,local:0.5,GigaChat-Lite:0.7"
+    cascade: Optional[str] = None
+    # Индекс синтетических вопросов (faq_index) для уровня каскада faq
+    faq_index_dir: str = "data_index/faq"
+    # Микро-батчинг навигации в сервисе (batch_router) для режимов lean и brief
+    batch_routing: bool = False
+    batch_max: int = 8
+    batch_window: float = 0.05
+    # Спекулятивная навигация (speculative_navigation): сколько частей и глав-кандидатов
+    # разворачивать заранее; 0 на обоих уровнях - обычная последовательная навигация
+    speculative_part_width: int = 0
+    speculative_chapter_width: int = 0
+
+    @property
+    def speculative(self) -> bool:
+        return self.speculative_part_width > 0 or self.speculative_chapter_width > 0
+
+    @property
+    def models(self) -> StepModels:
+        return StepModels(self.part_model, self.chapter_model, self.subchapter_model, self.final_model)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PipelineConfig":
+        known = {f.name for f in dataclasses.fields(cls)}
+        unknown = set(data) - known
+        if unknown:
+            raise ValueError(f"Неизвестные параметры конвейера: {', '.join(sorted(unknown))}")
+        return cls(**data)
+
+    @classmethod
+    def from_env(cls, prefix: str = "PIPELINE_", environ: Optional[Dict[str, str]] = None) -> "PipelineConfig":
+        """
+        Параметры из переменных окружения PIPELINE_<ИМЯ_ПОЛЯ>, например
+        PIPELINE_PART_MODEL=GigaChat-Lite, PIPELINE_CACHE_FILE= (пусто - без кеша).
+        """
+        environ = os.environ if environ is None else environ
+        values: Dict[str, Any] = {}
+        for f in dataclasses.fields(cls):
+            raw = environ.get(prefix + f.name.upper())
+            if raw is None:
+                continue
+            if f.type in (int, "int"):
+                values[f.name] = int(raw)
+            elif f.type in (float, "float"):
+                values[f.name] = float(raw)
+            elif f.type in (bool, "bool"):
+                values[f.name] = raw.strip().lower() in ("1", "true", "yes", "on")
+            else:
+                values[f.name] = (raw or None) if f.name in ("cache_file", "shared_store", "cascade") else raw
+        return cls(**values)
+
+
+def load_configs(file_path: str) -> Dict[str, PipelineConfig]:
+    """
+    Конфигурации из JSON-файла: либо один объект с полями PipelineConfig, либо
+    {"defaults": {...}, "pipelines": {"имя": {...}, ...}} - каждая конфигурация
+    дополняет defaults.
+    """
+    from json_io import load_json
+
+    data = load_json(file_path)
+    if "pipelines" not in data:
+        config = PipelineConfig.from_dict(data)
+        return {config.name: config}
+    defaults = data.get("defaults", {})
+    return {
+        name: PipelineConfig.from_dict({**defaults, "name": name, **values})
+        for name, values in data["pipelines"].items()
+    }
+
+
+def resolve_config(config_file: Optional[str] = None, name: Optional[str] = None) -> PipelineConfig:
+    """
+    Конфигурация из файла (по умолчанию - $PIPELINE_CONFIG) или, если файла нет,
+    из переменных окружения PIPELINE_*. name выбирает конфигурацию из файла с
+    несколькими; по умолчанию - $PIPELINE_NAME или единственная.
+    """
+    config_file = config_file or os.environ.get("PIPELINE_CONFIG")
+    if not config_file:
+        return PipelineConfig.from_env()
+    configs = load_configs(config_file)
+    name = name or os.environ.get("PIPELINE_NAME")
+    if name is None:
+        if len(configs) != 1:
+            raise ValueError(f"В {config_file} несколько конфигураций, укажите имя: {', '.join(configs)}")
+        return next(iter(configs.values()))
+    if name not in configs:
+        raise ValueError(f"Конфигурации {name} нет в {config_file}")
+    return configs[name]
+
+
+_shared_lock = threading.RLock()
+_shared: Dict[Tuple, Any] = {}
+
+
+def shared(key: Tuple, build: Callable[[], Any], path: Optional[str] = None) -> Any:
+    """
+    Объект, общий для всех Pipeline процесса. Если указан path, в ключ входят его
+    mtime и размер: изменённый файл будет загружен заново, а объект для прежней
+    версии файла удаляется из реестра.
+    """
+    with _shared_lock:
+        if path is not None:
+            stat = os.stat(path)
+            base = (*key, os.path.abspath(path))
+            key = (*base, stat.st_mtime_ns, stat.st_size)
+            if key not in _shared:
+                for stale in [k for k in _shared if k[:-2] == base]:
+                    del _shared[stale]
+        if key not in _shared:
+            _shared[key] = build()
+        return _shared[key]
+
+
+class Pipeline:
+    """
+    Конвейер одной конфигурации. Всё производное состояние создаётся лениво
+    и берётся из общего реестра shared(). Карта знаний, книга, хранилище,
+    профиль и каталоги запрашиваются у реестра при каждом обращении, поэтому
+    работающий процесс подхватывает изменённые файлы данных.
+    client можно передать явно (FakeLLMClient, ReplayClient и т.п.).
+    """
+    def __init__(self, config: PipelineConfig = PipelineConfig(), client=None):
+        self.config = config
+        if client is not None:
+            self.client = client
+        self._cascade = None
+        self._batch_routers: Dict[str, Any] = {}
+        self._speculative_navigators: Dict[str, Any] = {}
+
+    @property
+    def store(self):
+        """
+        Открытое хранилище shared_store (mmap); собирается, если его нет или оно
+        старше исходных JSON. Пересобранный файл (ingest --index) открывается заново.
+        """
+        from shared_store import SharedStore, ensure_store
+        config = self.config
+        path = ensure_store(config.shared_store, config.know_map_file, config.book_file)
+        return shared(
+            ("shared_store", config.max_shards),
+            lambda: memory_profile.profiled("load.shared_store", SharedStore, path, config.max_shards), path
+        )
+
+    @property
+    def know_map(self) -> KnowMap:
+        path = self.config.know_map_file
+        if self.config.shared_store:
+            return self.store.know_map
+        if self.config.know_map_store:
+            from know_map_store import load_know_map_store
+            max_shards = self.config.max_shards
+            return shared(
+                ("know_map_store", max_shards),
+                lambda: memory_profile.profiled("load.know_map", load_know_map_store, path, max_shards), path
+            )
+        from json_io import load_know_map
+        return shared(("know_map",), lambda: memory_profile.profiled("load.know_map", load_know_map, path), path)
+
+    def _know_map_source(self) -> Tuple[Tuple, str]:
+        """
+        Бэкенд карты знаний для ключей shared() производных от неё объектов и
+        файл, с изменением которого они строятся заново.
+        """
+        config = self.config
+        if config.shared_store:
+            return ("shared_store", os.path.abspath(config.shared_store), config.max_shards), config.shared_store
+        if config.know_map_store:
+            return ("know_map_store", config.max_shards), config.know_map_file
+        return ("know_map",), config.know_map_file
+
+    @property
+    def book(self) -> Book:
+        if self.config.shared_store:
+            return self.store.book
+        from json_io import load_book
+        path = self.config.book_file
+        return shared(("book",), lambda: memory_profile.profiled("load.book", load_book, path), path)
+
+    @property
+    def profile(self) -> RenderProfile:
+        """
+        Для профиля condensed берутся выжимки, сохранённые ingest --index рядом с
+        картой знаний; если их нет или они устарели, выжимки считаются заново.
+        """
+        config = self.config
+
+        def build() -> RenderProfile:
+            condensed = None
+            if config.profile == "condensed":
+                condensed = load_condensed_summaries(config.know_map_file, config.summary_tokens)
+            return get_profile(config.profile, self.know_map, config.summary_tokens, condensed)
+
+        return shared(("profile", config.profile, config.summary_tokens), build, config.know_map_file)
+
+    @property
+    def catalogues(self) -> Catalogues:
+        key = ("catalogues", self.config.profile, self.config.summary_tokens)
+        return shared(
+            key, lambda: memory_profile.profiled("build.catalogues", Catalogues, self.know_map, self.profile),
+            self.config.know_map_file
+        )
+
+    @cached_property
+    def models(self) -> StepModels:
+        return self.config.models
+
+    @cached_property
+    def cache(self) -> Optional[NavigationCache]:
+        return self.cache_for(self.config.routing_mode)
+
+    def cache_for(self, routing_mode: str) -> Optional[NavigationCache]:
+        """
+        Кеш навигации для режима routing_mode (режим можно переопределить в запросе).
+        """
+        if not self.config.cache_file:
+            return None
+        config = self.config
+        # Всё, от чего зависит выбор узлов, кроме самой карты знаний (её хеш учитывает кеш)
+        namespace = "|".join(map(str, (
+            config.part_model, config.chapter_model, config.subchapter_model,
+            config.profile, config.summary_tokens, routing_mode, config.schema_mode
+        )))
+        key = ("navigation_cache", os.path.abspath(config.cache_file), os.path.abspath(config.know_map_file), namespace)
+        return shared(key, lambda: NavigationCache(config.know_map_file, config.cache_file, namespace=namespace))
+
+    @cached_property
+    def passage_index(self):
+        if not self.config.passages:
+            return None
+        from passage_index import PassageIndex
+        directory = self.config.passage_index_dir
+        return shared(
+            ("passage_index",),
+            lambda: memory_profile.profiled("load.passage_index", PassageIndex.load, directory, mmap=True),
+            os.path.join(directory, "matrix.npy")
+        )
+
+    @cached_property
+    def client(self):
+        access_token = os.environ.get(self.config.access_token_env)
+        if not access_token:
+            raise ValueError(f"Не задана переменная окружения {self.config.access_token_env}")
+        from gigachat_module import create_client
+        return shared(("client", self.config.access_token_env, access_token), lambda: create_client(access_token))
+
+    @property
+    def cascade(self):
+        """
+        Каскад моделей навигации этого конвейера; BM25-индекс уровня local общий.
+        Каскад создаётся заново, если карта знаний загружена заново.
+        """
+        if not self.config.cascade:
+            return None
+        know_map = self.know_map
+        if self._cascade is None or self._cascade.know_map is not know_map:
+            self._cascade = self._build_cascade(know_map)
+        return self._cascade
+
+    def _build_cascade(self, know_map: KnowMap):
+        from local_ranker import LocalRanker
+        from model_cascade import FAQ_TIER, ModelCascade, parse_tiers
+        tiers = parse_tiers(self.config.cascade)
+        backend, path = self._know_map_source()
+        ranker = shared(("local_ranker", *backend), lambda: LocalRanker(know_map), path)
+        faq_index = None
+        if any(tier.name == FAQ_TIER for tier in tiers):
+            from faq_index import FaqIndex
+            directory = self.config.faq_index_dir
+            faq_index = shared(
+                ("faq_index",), lambda: FaqIndex.load(directory, mmap=True), os.path.join(directory, "matrix.npy")
+            )
+        return ModelCascade(self.client, know_map, tiers, ranker, self.config.schema_mode, faq_index)
+
+    def navigate(self, question: str, routing_mode: Optional[str] = None) -> Dict[str, Any]:
+        """
+        routing_mode переопределяет режим навигации конфигурации для одного запроса.
+        """
+        routing_mode = routing_mode or self.config.routing_mode
+        if self.config.speculative:
+            return self.speculative_navigator(routing_mode).run(question)
+        return navigate(
+            self.client, self.know_map, question, self.cache_for(routing_mode), self.profile, self.models,
+            self.catalogues, self.config.schema_mode, routing_mode, self.cascade
+        )
+
+    def answer(self, question: str, routing_mode: Optional[str] = None) -> Dict[str, Any]:
+        routing_mode = routing_mode or self.config.routing_mode
+        if self.config.speculative:
+            return self.answer_from_navigation(question, self.navigate(question, routing_mode))
+        return answer_question(
+            self.client, self.know_map, self.book, question, self.cache_for(routing_mode), self.profile,
+            self.passage_index, self.models, self.catalogues, self.config.schema_mode, routing_mode, self.cascade
+        )
+
+    def answer_from_navigation(self, question: str, navigation: Dict[str, Any]) -> Dict[str, Any]:
+        return answer_from_navigation(
+            self.client, self.know_map, self.book, question, navigation, self.passage_index, self.models
+        )
+
+    def batch_router(self, routing_mode: Optional[str] = None):
+        """
+        Микро-батчинг навигации (batch_router.BatchRouter) для режима routing_mode;
+        None, если batch_routing выключен или режим не поддерживает пакетные запросы.
+        Очереди роутера привязаны к циклу событий, поэтому роутер принадлежит
+        этому Pipeline, а не общему реестру shared(). Каскад моделей роутер не использует.
+        """
+        from gigachat_module import BATCH_ROUTING_MODES
+        routing_mode = routing_mode or self.config.routing_mode
+        if not self.config.batch_routing or routing_mode not in BATCH_ROUTING_MODES:
+            return None
+        router = self._batch_routers.get(routing_mode)
+        if router is None or router.know_map is not self.know_map:
+            from batch_router import BatchRouter
+            config = self.config
+            self._batch_routers[routing_mode] = BatchRouter(
+                self.client, self.know_map, self.catalogues, self.profile, self.models, routing_mode,
+                config.schema_mode, config.batch_max, config.batch_window, self.cache_for(routing_mode)
+            )
+        return self._batch_routers[routing_mode]
+
+    def speculative_navigator(self, routing_mode: Optional[str] = None):
+        """
+        Спекулятивная навигация (speculative_navigation.SpeculativeNavigator) для
+        режима routing_mode с шириной из конфигурации; BM25-индекс общий с каскадом.
+        Каскад моделей спекулятивная навигация не использует.
+        """
+        routing_mode = routing_mode or self.config.routing_mode
+        know_map = self.know_map
+        navigator = self._speculative_navigators.get(routing_mode)
+        if navigator is None or navigator.know_map is not know_map:
+            from local_ranker import LocalRanker
+            from speculative_navigation import SpeculativeNavigator
+            config = self.config
+            backend, path = self._know_map_source()
+            ranker = shared(("local_ranker", *backend), lambda: LocalRanker(know_map), path)
+            self._speculative_navigators[routing_mode] = SpeculativeNavigator(
+                self.client, know_map, self.cache_for(routing_mode), self.profile, self.models, self.catalogues,
+                config.schema_mode, routing_mode, ranker, config.speculative_part_width, config.speculative_chapter_width
+            )
+        return self._speculative_navigators[routing_mode]
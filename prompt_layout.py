@@ -0,0 +1,130 @@
+# prompt_layout.py
+"""
+Сборка сообщений с устойчивым префиксом для кеширования промптов на стороне провайдера.
+
+Порядок всегда один: системный промпт -> каталог (части/главы/подглавы или контент
+страниц) -> вопрос пользователя. Системный промпт нормализуется (dedent + strip) один
+раз, поэтому он побайтово одинаков во всех запросах шага; каталог одного уровня тоже
+одинаков для всех вопросов. Всё, что зависит от вопроса, стоит в самом конце.
+
+PrefixReuseMeter измеряет, какая доля входных токенов workload'а совпадает с префиксом
+одного из предыдущих запросов, то есть может быть взята из KV/prompt-кеша.
+"""
+import textwrap
+from functools import lru_cache
+from typing import Dict, List
+
+from response_schema import format_name
+from token_counter import estimate_tokens
+
+QUESTION_MARKER = "Вопрос пользователя:"
+QUESTIONS_MARKER = "Вопросы пользователей:"
+SYSTEM_PREFIX = "ИНСТРУКЦИИ: "
+
+
+@lru_cache(maxsize=None)
+def render_system_prompt(system_prompt: str) -> str:
+    """
+    Нормализованный системный промпт: без общего отступа и пустых строк по краям.
+    """
+    return SYSTEM_PREFIX + textwrap.dedent(system_prompt.lstrip("\n")).strip()
+
+
+def build_messages(system_prompt: str, catalogue_label: str, catalogue: str, question: str) -> List[Dict[str, str]]:
+    """
+    Сообщения запроса: статичные части первыми, вопрос - последним.
+    """
+    return [
+        {"role": "system", "content": render_system_prompt(system_prompt)},
+        {"role": "user", "content": f"{catalogue_label}:\n{catalogue.strip()}\n\n{QUESTION_MARKER} {question.strip()}"},
+    ]
+
+
+def build_batch_messages(
+    system_prompt: str,
+    catalogue_label: str,
+    catalogue: str,
+    questions: List[str]
+) -> List[Dict[str, str]]:
+    """
+    Сообщения запроса с несколькими вопросами: каталог один раз, затем
+    нумерованный список вопросов (по одному в строке, с 1).
+    """
+    numbered = "\n".join(f"{i}. {' '.join(question.split())}" for i, question in enumerate(questions, 1))
+    return [
+        {"role": "system", "content": render_system_prompt(system_prompt)},
+        {"role": "user", "content": f"{catalogue_label}:\n{catalogue.strip()}\n\n{QUESTIONS_MARKER}\n{numbered}"},
+    ]
+
+
+def serialize_messages(messages: List[Dict[str, str]]) -> str:
+    """
+    Строка, в которой сервер видит промпт: роли и содержимое по порядку.
+    """
+    return "".join(f"<|{m['role']}|>{m['content']}" for m in messages)
+
+
+def common_prefix_length(a: str, b: str) -> int:
+    limit = min(len(a), len(b))
+    i = 0
+    while i < limit and a[i] == b[i]:
+        i += 1
+    return i
+
+
+class PrefixReuseMeter:
+    """
+    Для каждого запроса находит самый длинный общий префикс с одним из предыдущих
+    запросов и считает, сколько входных токенов могло быть взято из кеша.
+
+    block_tokens - гранулярность кеша провайдера (переиспользуемая часть округляется
+    вниз до кратного); history - сколько последних запросов хранить для сравнения.
+    """
+    def __init__(self, block_tokens: int = 1, history: int = 256):
+        self.block_tokens = block_tokens
+        self.history = history
+        self._previous: List[str] = []
+        self.requests = 0
+        self.total_tokens = 0
+        self.reused_tokens = 0
+        self.by_label: Dict[str, List[int]] = {}
+
+    def observe(self, messages: List[Dict[str, str]], label: str = "all") -> int:
+        """
+        Учитывает запрос и возвращает число токенов, пригодных для переиспользования.
+        """
+        text = serialize_messages(messages)
+        prefix = max((common_prefix_length(text, previous) for previous in self._previous), default=0)
+        total = estimate_tokens(text)
+        reused = estimate_tokens(text[:prefix]) // self.block_tokens * self.block_tokens
+        reused = min(reused, total)
+
+        self._previous.append(text)
+        if len(self._previous) > self.history:
+            self._previous.pop(0)
+        self.requests += 1
+        self.total_tokens += total
+        self.reused_tokens += reused
+        stats = self.by_label.setdefault(label, [0, 0, 0])
+        stats[0] += 1
+        stats[1] += total
+        stats[2] += reused
+        return reused
+
+    def observer(self, kwargs, response, elapsed) -> None:
+        """
+        Наблюдатель для client_observer.ObservedClient.
+        """
+        self.observe(kwargs["messages"], format_name(kwargs.get("response_format")))
+
+    @property
+    def reuse_ratio(self) -> float:
+        return self.reused_tokens / self.total_tokens if self.total_tokens else 0.0
+
+    def report(self) -> str:
+        lines = [f"Запросов: {self.requests}, входных токенов: {self.total_tokens}, "
+                 f"из префикс-кеша: {self.reused_tokens} ({self.reuse_ratio:.1%})"]
+        for label, (requests, total, reused) in self.by_label.items():
+            ratio = reused / total if total else 0.0
+            lines.append(f"  {label:24} запросов: {requests:4}  токенов: {total:8}  переиспользуемо: {ratio:.1%}")
+        return "\n".join(lines)
@@ -0,0 +1,96 @@
+# recorded_llm.py
+"""
+Запись и воспроизведение ответов LLM (cassette в формате JSONL).
+
+RecordingClient оборачивает настоящий клиент и дописывает в файл каждый ответ:
+ключ запроса (модель, сообщения, формат ответа), текст ответа, usage и время.
+ReplayClient отдаёт записанные ответы без сети - прогоны оценки на реальных
+ответах GigaChat повторяемы и бесплатны. Запрос, которого нет в записи,
+вызывает KeyError.
+"""
+import hashlib
+import json
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+from client_observer import ObservedClient
+from fake_llm import make_completion
+from json_io import dumps, loads
+
+
+def request_key(model: str, messages: List[Dict[str, Any]], response_format: Any = None) -> str:
+    """
+    Хеш того, что определяет ответ модели.
+    """
+    if response_format is None or isinstance(response_format, dict):
+        fmt = response_format
+    else:
+        fmt = response_format.__name__
+    payload = json.dumps([model, messages, fmt], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseRecorder:
+    def __init__(self, cassette_file: str):
+        self.cassette_file = cassette_file
+        self._lock = threading.Lock()
+
+    def observer(self, kwargs, response, elapsed) -> None:
+        usage = getattr(response, "usage", None)
+        record = {
+            "key": request_key(kwargs["model"], kwargs["messages"], kwargs.get("response_format")),
+            "model": kwargs["model"],
+            "content": response.choices[0].message.content,
+            "prompt_tokens": getattr(usage, "prompt_tokens", 0),
+            "completion_tokens": getattr(usage, "completion_tokens", 0),
+            "elapsed": elapsed,
+        }
+        with self._lock, open(self.cassette_file, "ab") as f:
+            f.write(dumps(record, compact=True) + b"\n")
+
+
+class RecordingClient(ObservedClient):
+    """
+    Клиент, который работает как client и записывает ответы в cassette_file.
+    """
+    def __init__(self, client, cassette_file: str):
+        self.recorder = ResponseRecorder(cassette_file)
+        super().__init__(client, self.recorder.observer)
+
+
+class ReplayClient:
+    """
+    replay_latency=True - каждый ответ задерживается на записанное время,
+    чтобы перцентили задержки в оценке были сопоставимы с реальным прогоном.
+    """
+    def __init__(self, cassette_file: str, replay_latency: bool = False):
+        self.replay_latency = replay_latency
+        self.records: Dict[str, Dict[str, Any]] = {}
+        with open(cassette_file, "rb") as f:
+            for line in f:
+                if line.strip():
+                    record = loads(line)
+                    self.records[record["key"]] = record
+        completions = SimpleNamespace(parse=self._parse, create=self._create)
+        self.chat = SimpleNamespace(completions=completions)
+        self.beta = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+    def _lookup(self, model: str, messages: List[dict], response_format: Any) -> Dict[str, Any]:
+        key = request_key(model, messages, response_format)
+        if key not in self.records:
+            raise KeyError(f"Запрос не найден в записи ответов (model={model}, key={key[:12]})")
+        record = self.records[key]
+        if self.replay_latency:
+            time.sleep(record["elapsed"])
+        return record
+
+    def _parse(self, model: str, messages: List[dict], response_format, **kwargs):
+        record = self._lookup(model, messages, response_format)
+        parsed = response_format.model_validate_json(record["content"])
+        return make_completion(record["content"], parsed, record["prompt_tokens"], record["completion_tokens"])
+
+    def _create(self, model: str, messages: List[dict], response_format: Dict[str, Any] = None, **kwargs):
+        record = self._lookup(model, messages, response_format)
+        return make_completion(record["content"], None, record["prompt_tokens"], record["completion_tokens"])
@@ -0,0 +1,216 @@
+# render_profiles.py
+"""
+Профили отображения карты знаний в промптах навигации.
+
+Блоки <Part>/<Chapter>/<Subchapter> по умолчанию содержат полный summary и все
+key_points, хотя для выбора узла обычно хватает заголовка и ключевых слов.
+Профиль определяет, что попадает в блок:
+
+    full       - как раньше: полный summary и все key_points;
+    truncated  - summary, обрезанный до summary_tokens токенов;
+    keywords   - только заголовок и key_points;
+    condensed  - короткая выжимка summary, заранее посчитанная локально
+                 (build_condensed_summaries, без обращения к LLM).
+
+Ключи выжимок: "part:1", "chapter:4", "subchapter:2.4.25". Выжимки сохраняются
+рядом с картой знаний (condensed_file_for) вместе с хешем карты и лимитом
+токенов; load_condensed_summaries отдаёт их, только если и то и другое совпадает.
+"""
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from book_models import KnowMap
+from json_io import dump_json, file_fingerprint, load_json
+from token_counter import estimate_tokens
+
+DEFAULT_SUMMARY_TOKENS = 40
+DEFAULT_CONDENSED_TOKENS = 40
+
+SUMMARY_MODES = ("full", "truncated", "none", "condensed")
+
+_SENTENCE_PATTERN = re.compile(r"(?<=[.!?…])\s+")
+_WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+@dataclass(frozen=True)
+class RenderProfile:
+    name: str
+    summary_mode: str = "full"
+    summary_tokens: int = DEFAULT_SUMMARY_TOKENS
+    max_key_points: Optional[int] = None
+    condensed: Dict[str, str] = field(default_factory=dict, compare=False, hash=False, repr=False)
+
+    def __post_init__(self):
+        if self.summary_mode not in SUMMARY_MODES:
+            raise ValueError(f"Неизвестный режим summary: {self.summary_mode}")
+
+    @property
+    def include_summary(self) -> bool:
+        return self.summary_mode != "none"
+
+    def render_summary(self, key: str, summary: str) -> str:
+        if self.summary_mode == "truncated":
+            return truncate_to_tokens(summary, self.summary_tokens)
+        if self.summary_mode == "condensed":
+            condensed = self.condensed.get(key)
+            return condensed if condensed is not None else condense_summary(summary, [], self.summary_tokens)
+        return summary
+
+    def render_key_points(self, key_points: List[str]) -> List[str]:
+        return key_points if self.max_key_points is None else key_points[:self.max_key_points]
+
+
+FULL_PROFILE = RenderProfile("full")
+
+PROFILE_NAMES = ("full", "truncated", "keywords", "condensed")
+
+
+def node_key(level: str, number) -> str:
+    return f"{level}:{number}"
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Начало текста, укладывающееся в max_tokens токенов (по целым словам).
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    words = text.split()
+    # Двоичный поиск максимального числа слов, влезающих в бюджет
+    low, high = 0, len(words)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(" ".join(words[:middle])) + 1 <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return " ".join(words[:low]).rstrip(",;:") + "…"
+
+
+def _stems(text: str) -> set:
+    return {word[:6] for word in _WORD_PATTERN.findall(text.lower()) if len(word) >= 3}
+
+
+def condense_summary(summary: str, context: List[str], max_tokens: int = DEFAULT_CONDENSED_TOKENS) -> str:
+    """
+    Экстрактивная выжимка: предложения summary, больше всего пересекающиеся по словам
+    с заголовком и key_points (context), в исходном порядке и в пределах max_tokens.
+    Если ни одно предложение не влезает целиком, берётся обрезанное первое.
+    """
+    sentences = [s.strip() for s in _SENTENCE_PATTERN.split(summary.strip()) if s.strip()]
+    if not sentences:
+        return summary
+    context_stems = _stems(" ".join(context))
+    ranked = sorted(
+        range(len(sentences)),
+        # При равенстве пересечения выигрывает более раннее предложение
+        key=lambda i: (-len(_stems(sentences[i]) & context_stems), i)
+    )
+    chosen, used = [], 0
+    for i in ranked:
+        tokens = estimate_tokens(sentences[i])
+        if used + tokens <= max_tokens:
+            chosen.append(i)
+            used += tokens
+    if not chosen:
+        return truncate_to_tokens(sentences[0], max_tokens)
+    return " ".join(sentences[i] for i in sorted(chosen))
+
+
+def build_condensed_summaries(know_map: KnowMap, max_tokens: int = DEFAULT_CONDENSED_TOKENS) -> Dict[str, str]:
+    """
+    Выжимки summary для всех частей, глав и подглав карты знаний.
+    """
+    condensed = {}
+    for part in know_map.parts:
+        condensed[node_key("part", part.part_number)] = condense_summary(
+            part.summary, [part.title, *part.key_points], max_tokens
+        )
+    for chapter in know_map.iter_chapters():
+        condensed[node_key("chapter", chapter.chapter_number)] = condense_summary(
+            chapter.summary, [chapter.title, *chapter.key_points], max_tokens
+        )
+        for sub in chapter.subchapters:
+            condensed[node_key("subchapter", sub.subchapter_number)] = condense_summary(
+                sub.summary, [sub.title, *sub.key_points], max_tokens
+            )
+    return condensed
+
+
+def condensed_file_for(know_map_file: str) -> str:
+    """
+    data_know_map/know_map_full.json -> data_know_map/know_map_condensed.json.
+    """
+    stem = os.path.splitext(os.path.basename(know_map_file))[0]
+    if stem.endswith("_full"):
+        stem = stem[:-len("_full")]
+    return os.path.join(os.path.dirname(know_map_file), f"{stem}_condensed.json")
+
+
+def save_condensed_summaries(
+    condensed: Dict[str, str],
+    know_map_file: str,
+    max_tokens: int = DEFAULT_CONDENSED_TOKENS,
+    file_path: Optional[str] = None
+) -> str:
+    file_path = file_path or condensed_file_for(know_map_file)
+    dump_json({
+        "know_map": file_fingerprint(know_map_file),
+        "max_tokens": max_tokens,
+        "summaries": condensed,
+    }, file_path)
+    return file_path
+
+
+def load_condensed_summaries(
+    know_map_file: str,
+    max_tokens: int = DEFAULT_CONDENSED_TOKENS,
+    file_path: Optional[str] = None
+) -> Optional[Dict[str, str]]:
+    """
+    Сохранённые выжимки; None, если файла нет или он посчитан для другой
+    карты знаний или другого лимита токенов.
+    """
+    file_path = file_path or condensed_file_for(know_map_file)
+    if not os.path.exists(file_path):
+        return None
+    data = load_json(file_path)
+    if not isinstance(data, dict) or "summaries" not in data:
+        return None
+    if data.get("max_tokens") != max_tokens or data.get("know_map") != file_fingerprint(know_map_file):
+        return None
+    return data["summaries"]
+
+
+def get_profile(
+    name: str,
+    know_map: Optional[KnowMap] = None,
+    summary_tokens: int = DEFAULT_SUMMARY_TOKENS,
+    condensed: Optional[Dict[str, str]] = None
+) -> RenderProfile:
+    """
+    Профиль по имени. Для "condensed" выжимки берутся из condensed, а если их нет -
+    считаются по know_map.
+    """
+    if name == "full":
+        return FULL_PROFILE
+    if name == "truncated":
+        return RenderProfile("truncated", "truncated", summary_tokens)
+    if name == "keywords":
+        return RenderProfile("keywords", "none")
+    if name == "condensed":
+        if condensed is None:
+            condensed = build_condensed_summaries(know_map, summary_tokens) if know_map is not None else {}
+        return RenderProfile("condensed", "condensed", summary_tokens, condensed=condensed)
+    raise ValueError(f"Неизвестный профиль отображения: {name}")
+
+
+if __name__ == "__main__":
+    from json_io import load_know_map
+
+    know_map_file = "data_know_map/know_map_full.json"
+    summaries = build_condensed_summaries(load_know_map(know_map_file))
+    path = save_condensed_summaries(summaries, know_map_file)
+    print(f"Сохранено выжимок: {len(summaries)} -> {path}")
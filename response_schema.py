@@ -0,0 +1,127 @@
+# response_schema.py
+"""
+Компактные JSON-схемы ответов для шагов навигации.
+
+Pydantic-модели рассуждений (gigachat_module) хранят подробные описания полей с
+примерами - это документация для разработчиков. При response_format=<модель>
+клиент OpenAI сериализует их в JSON-схему и отправляет в каждом запросе, хотя
+системные промпты шагов уже описывают те же поля и примеры.
+
+compile_schema строит из модели минимальную схему: только типы, обязательные поля
+и ограничения, без description/title/example. Схема строится один раз на модель;
+запрос уходит через chat.completions.create с response_format типа json_schema,
+ответ проверяется той же моделью (model_validate_json).
+"""
+import json
+from functools import lru_cache
+from typing import Any, Dict, List, Type
+
+from pydantic import BaseModel
+
+from token_counter import estimate_tokens
+
+# Ключи JSON-схемы, которые нужны только человеку
+DOC_KEYS = frozenset({"title", "description", "example", "examples", "default"})
+
+SCHEMA_MODES = ("slim", "full")
+DEFAULT_SCHEMA_MODE = "slim"
+
+
+def strip_docs(schema: Any) -> Any:
+    """
+    Копия схемы без документирующих ключей; у объектов запрещаются лишние поля.
+    """
+    if isinstance(schema, list):
+        return [strip_docs(item) for item in schema]
+    if not isinstance(schema, dict):
+        return schema
+    result = {}
+    for key, value in schema.items():
+        if key in DOC_KEYS:
+            continue
+        if key in ("properties", "$defs", "definitions"):
+            # Здесь ключи - имена полей, а не ключевые слова схемы
+            result[key] = {name: strip_docs(child) for name, child in value.items()}
+        else:
+            result[key] = strip_docs(value)
+    if result.get("type") == "object":
+        result.setdefault("additionalProperties", False)
+    return result
+
+
+@lru_cache(maxsize=None)
+def _compiled(model: Type[BaseModel]) -> Dict[str, Any]:
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": model.__name__, "schema": strip_docs(model.model_json_schema())},
+    }
+
+
+def compile_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    response_format для chat.completions.create с минимальной схемой модели.
+    Возвращается новый dict, кешированный оригинал не меняется.
+    """
+    compiled = _compiled(model)
+    return {"type": compiled["type"], "json_schema": dict(compiled["json_schema"])}
+
+
+@lru_cache(maxsize=None)
+def full_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    Схема в том виде, в каком её отправляет beta.chat.completions.parse
+    (для сравнения размеров): строгая схема openai, если он установлен.
+    """
+    try:
+        from openai.lib._pydantic import to_strict_json_schema
+        schema = to_strict_json_schema(model)
+    except ImportError:
+        schema = model.model_json_schema()
+    return {"type": "json_schema", "json_schema": {"name": model.__name__, "schema": schema, "strict": True}}
+
+
+def schema_tokens(response_format: Any) -> int:
+    """
+    Оценка входных токенов, которые добавляет к запросу формат ответа.
+    """
+    if response_format is None:
+        return 0
+    if not isinstance(response_format, dict):
+        response_format = full_schema(response_format)
+    return estimate_tokens(json.dumps(response_format["json_schema"], ensure_ascii=False, separators=(",", ":")))
+
+
+def format_name(response_format: Any) -> str:
+    """
+    Имя формата ответа: Pydantic-модель или dict с json_schema; "text" - без формата.
+    """
+    if response_format is None:
+        return "text"
+    if isinstance(response_format, dict):
+        return response_format.get("json_schema", {}).get("name") or response_format.get("type", "text")
+    return getattr(response_format, "__name__", "text")
+
+
+def request_structured(
+    client,
+    model: str,
+    messages: List[Dict[str, str]],
+    response_model: Type[BaseModel],
+    schema_mode: str = DEFAULT_SCHEMA_MODE
+) -> BaseModel:
+    """
+    Запрос с ответом по схеме response_model.
+    slim - компактная схема и проверка ответа моделью на нашей стороне;
+    full - beta.chat.completions.parse с полной схемой (как раньше).
+    """
+    if schema_mode == "full":
+        response = client.beta.chat.completions.parse(
+            model=model, temperature=0, messages=messages, response_format=response_model
+        )
+        return response.choices[0].message.parsed
+    if schema_mode != "slim":
+        raise ValueError(f"Неизвестный режим схемы: {schema_mode}. Доступны: {', '.join(SCHEMA_MODES)}")
+    response = client.chat.completions.create(
+        model=model, temperature=0, messages=messages, response_format=compile_schema(response_model)
+    )
+    return response_model.model_validate_json(response.choices[0].message.content)
@@ -0,0 +1,381 @@
+# routing_eval.py
+"""
+Оценка навигации на размеченном наборе вопросов.
+
+Вход - JSONL с полями {"question", "subchapter_number"}; правильные часть и глава
+берутся из карты знаний по номеру подглавы. Каждый вопрос проходит через выбранную
+стратегию навигации, а отчёт содержит:
+    - top-1 и top-k точность на уровнях part/chapter/subchapter;
+    - перцентили задержки навигации;
+    - токены и число запросов к LLM на вопрос, стоимость по token_counter.MODEL_PRICES.
+
+Бэкенды: fake (FakeLLMClient), real (GigaChat, токен из GIGACHAT_ACCESS_TOKEN),
+record (real + запись ответов в cassette), replay (ответы из cassette, без сети).
+
+С --baseline/--min-accuracy скрипт работает как регрессионный гейт: при ухудшении
+метрик печатает причины и завершается с кодом 1.
+
+Запуск из корня репозитория:
+    python routing_eval.py --strategy sequential --backend replay --cassette data_eval/cassette.jsonl
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from book_models import KnowMap
+from client_observer import ObservedClient
+from gigachat_module import (
+    BATCH_ROUTING_MODES,
+    DEFAULT_ROUTING_MODE,
+    ROUTING_MODES,
+    BookPartReasoning,
+    ChapterReasoning,
+    SubchapterReasoning
+)
+from json_io import dump_json, load_json, load_know_map, loads
+from render_profiles import FULL_PROFILE, PROFILE_NAMES, RenderProfile, get_profile
+from response_schema import format_name
+from token_counter import estimate_cost, estimate_messages_tokens, estimate_tokens
+
+KNOW_MAP_FILE = "data_know_map/know_map_full.json"
+QUESTIONS_FILE = "data_eval/questions.jsonl"
+PAGES_FILE = "data_update/kniga_only_pages.json"
+DEFAULT_K = 3
+
+# Уровень навигации -> модель результата и поле с выбранным номером
+LEVELS = {
+    "part": (BookPartReasoning, "selected_part"),
+    "chapter": (ChapterReasoning, "selected_chapter"),
+    "subchapter": (SubchapterReasoning, "selected_subchapter"),
+}
+# Схемы ответов всех режимов навигации (полные, краткие и пакетные) -> уровень
+LEVEL_BY_FORMAT = {
+    model.__name__: level
+    for modes in (ROUTING_MODES, BATCH_ROUTING_MODES)
+    for steps in modes.values()
+    for level, (_, model) in steps.items()
+}
+
+Navigator = Callable[[str], Dict[str, Any]]
+
+
+def load_questions(file_path: str = QUESTIONS_FILE) -> List[Dict[str, Any]]:
+    with open(file_path, "rb") as f:
+        return [loads(line) for line in f if line.strip()]
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    Перцентиль с линейной интерполяцией, q от 0 до 100.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def local_reasoning(model: type, value: Any) -> BaseModel:
+    """
+    Результат шага в виде *Reasoning-модели для стратегий, которые выбирают узел без LLM.
+    """
+    fields = {
+        name: "Выбрано локальным ранжированием (BM25)"
+        for name, info in model.model_fields.items() if info.annotation is str
+    }
+    fields[dict(LEVELS.values())[model]] = value
+    return model.model_validate(fields)
+
+
+# -------------------------------------------------------------------
+# Стратегии навигации: фабрика (client, know_map, profile, routing_mode, **options) -> navigate(question)
+# Результат - словарь как у pipeline.navigate; необязательный ключ "candidates"
+# содержит ранжированные номера по уровням для top-k.
+# -------------------------------------------------------------------
+def sequential_strategy(client, know_map: KnowMap, profile: RenderProfile, routing_mode: str, **options) -> Navigator:
+    from pipeline import navigate
+    return lambda question: navigate(client, know_map, question, profile=profile, routing_mode=routing_mode)
+
+
+def speculative_strategy(client, know_map: KnowMap, profile: RenderProfile, routing_mode: str, **options) -> Navigator:
+    """
+    options - part_width и chapter_width (speculative_navigation.SpeculativeNavigator).
+    Отброшенные спекулятивные запросы учитываются в calls и стоимости: run
+    возвращается только после их завершения.
+    """
+    from speculative_navigation import SpeculativeNavigator
+    return SpeculativeNavigator(client, know_map, profile=profile, routing_mode=routing_mode, **options).run
+
+
+def ranker_navigator(know_map: KnowMap, ranker) -> Navigator:
+    """
+    Без LLM: подглавы ранжируются по всей карте знаний сразу, часть и глава
+    берутся как родители лучших подглав (каскад part -> chapter по локальным
+    оценкам ошибается чаще, чем прямой поиск подглавы).
+    """
+    def navigate(question: str) -> Dict[str, Any]:
+        subchapters = [number for number, _ in ranker.rank_subchapters(question)]
+        nodes = [know_map.find_subchapter(number) for number in subchapters]
+        parts = list(dict.fromkeys(sub.part_number for sub in nodes))
+        chapters = list(dict.fromkeys(sub.chapter_number for sub in nodes))
+        return {
+            "part": local_reasoning(BookPartReasoning, parts[0]),
+            "chapter": local_reasoning(ChapterReasoning, chapters[0]),
+            "subchapter": local_reasoning(SubchapterReasoning, subchapters[0]),
+            "candidates": {"part": parts, "chapter": chapters, "subchapter": subchapters},
+        }
+    return navigate
+
+
+def local_strategy(client, know_map: KnowMap, profile: RenderProfile, routing_mode: str, **options) -> Navigator:
+    from local_ranker import LocalRanker
+    return ranker_navigator(know_map, LocalRanker(know_map))
+
+
+def keywords_strategy(client, know_map: KnowMap, profile: RenderProfile, routing_mode: str, **options) -> Navigator:
+    from json_io import load_book
+    from keyword_matrix import KeywordRanker
+    return ranker_navigator(know_map, KeywordRanker(know_map, load_book(PAGES_FILE)))
+
+
+STRATEGIES = {
+    "sequential": sequential_strategy,
+    "speculative": speculative_strategy,
+    "local": local_strategy,
+    "keywords": keywords_strategy,
+}
+
+
+def create_backend(name: str, cassette_file: Optional[str] = None, replay_latency: bool = False):
+    if name == "fake":
+        from fake_llm import FakeLLMClient
+        return FakeLLMClient()
+    if name == "replay":
+        from recorded_llm import ReplayClient
+        return ReplayClient(cassette_file, replay_latency)
+    from gigachat_module import create_client
+    client = create_client(os.environ["GIGACHAT_ACCESS_TOKEN"])
+    if name == "record":
+        from recorded_llm import RecordingClient
+        return RecordingClient(client, cassette_file)
+    if name == "real":
+        return client
+    raise ValueError(f"Неизвестный бэкенд: {name}")
+
+
+# -------------------------------------------------------------------
+# Оценка
+# -------------------------------------------------------------------
+class UsageMeter:
+    """
+    Наблюдатель для ObservedClient: запросы, токены по уровням и стоимость.
+    """
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+        self.by_level: Dict[str, int] = {level: 0 for level in LEVELS}
+
+    def observer(self, kwargs, response, elapsed) -> None:
+        usage = getattr(response, "usage", None)
+        prompt = getattr(usage, "prompt_tokens", None)
+        if prompt is None:
+            prompt = estimate_messages_tokens(kwargs["messages"])
+        completion = getattr(usage, "completion_tokens", None)
+        if completion is None:
+            completion = estimate_tokens(response.choices[0].message.content or "")
+        self.calls += 1
+        self.prompt_tokens += prompt
+        self.completion_tokens += completion
+        self.cost += estimate_cost(kwargs["model"], prompt, completion)
+        level = LEVEL_BY_FORMAT.get(format_name(kwargs.get("response_format")))
+        if level:
+            self.by_level[level] += prompt
+
+
+def gold_levels(know_map: KnowMap, subchapter_number: str) -> Dict[str, Any]:
+    sub = know_map.find_subchapter(subchapter_number)
+    if sub is None:
+        raise ValueError(f"Подглава {subchapter_number} из набора вопросов не найдена в карте знаний")
+    return {"part": sub.part_number, "chapter": sub.chapter_number, "subchapter": str(sub.subchapter_number)}
+
+
+def evaluate(
+    client,
+    know_map: KnowMap,
+    questions: List[Dict[str, Any]],
+    strategy: str = "sequential",
+    profile: RenderProfile = FULL_PROFILE,
+    k: int = DEFAULT_K,
+    routing_mode: str = DEFAULT_ROUTING_MODE,
+    strategy_options: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Прогоняет вопросы через стратегию навигации и собирает отчёт.
+    Ошибки отдельных вопросов (сеть, отсутствие ответа в записи) считаются промахами.
+    strategy_options - параметры фабрики стратегии (например, ширина спекуляции).
+    """
+    meter = UsageMeter()
+    navigate = STRATEGIES[strategy](
+        ObservedClient(client, meter.observer), know_map, profile, routing_mode, **(strategy_options or {})
+    )
+    hits = {level: {"top1": 0, "topk": 0} for level in LEVELS}
+    latencies, misses, errors = [], [], []
+
+    for item in questions:
+        gold = gold_levels(know_map, item["subchapter_number"])
+        start = time.perf_counter()
+        try:
+            result = navigate(item["question"])
+        except Exception as e:
+            errors.append({"question": item["question"], "error": repr(e)})
+            continue
+        latencies.append(time.perf_counter() - start)
+
+        candidates = result.get("candidates", {})
+        for level, (_, attr) in LEVELS.items():
+            selected = getattr(result[level], attr)
+            ranked = candidates.get(level) or [selected]
+            hits[level]["top1"] += str(selected) == str(gold[level])
+            hits[level]["topk"] += str(gold[level]) in [str(number) for number in ranked[:k]]
+        selected_subchapter = str(result["subchapter"].selected_subchapter)
+        if selected_subchapter != gold["subchapter"]:
+            misses.append({"question": item["question"], "gold": gold["subchapter"], "selected": selected_subchapter})
+
+    count = len(questions) or 1
+    return {
+        "strategy": strategy,
+        "profile": profile.name,
+        "routing_mode": routing_mode,
+        "questions": len(questions),
+        "k": k,
+        "accuracy": {
+            level: {name: value / count for name, value in level_hits.items()}
+            for level, level_hits in hits.items()
+        },
+        "latency_seconds": {
+            "mean": sum(latencies) / len(latencies) if latencies else 0.0,
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p99": percentile(latencies, 99),
+        },
+        "per_question": {
+            "calls": meter.calls / count,
+            "prompt_tokens": meter.prompt_tokens / count,
+            "completion_tokens": meter.completion_tokens / count,
+            "prompt_tokens_by_level": {level: value / count for level, value in meter.by_level.items()},
+            "cost": meter.cost / count,
+        },
+        "cost_total": meter.cost,
+        "misses": misses,
+        "errors": errors,
+    }
+
+
+def check_regression(
+    report: Dict[str, Any],
+    baseline: Optional[Dict[str, Any]] = None,
+    min_accuracy: Optional[float] = None,
+    max_accuracy_drop: float = 0.0,
+    max_token_growth: float = 0.05
+) -> List[str]:
+    """
+    Список нарушений: top-1 точность подглавы ниже порога, падение точности
+    на любом уровне больше max_accuracy_drop или рост токенов на вопрос больше
+    max_token_growth (доля) относительно baseline.
+    """
+    problems = []
+    accuracy = report["accuracy"]
+    if min_accuracy is not None and accuracy["subchapter"]["top1"] < min_accuracy:
+        problems.append(f"точность подглавы {accuracy['subchapter']['top1']:.1%} ниже порога {min_accuracy:.1%}")
+    if report["errors"]:
+        problems.append(f"ошибок при навигации: {len(report['errors'])}")
+    if baseline is not None:
+        for level in LEVELS:
+            before, after = baseline["accuracy"][level]["top1"], accuracy[level]["top1"]
+            if after < before - max_accuracy_drop:
+                problems.append(f"точность {level}: {before:.1%} -> {after:.1%}")
+        before = baseline["per_question"]["prompt_tokens"]
+        after = report["per_question"]["prompt_tokens"]
+        if before and after > before * (1 + max_token_growth):
+            problems.append(f"входные токены на вопрос: {before:.0f} -> {after:.0f}")
+    return problems
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    per_question = report["per_question"]
+    latency = report["latency_seconds"]
+    lines = [
+        f"Стратегия: {report['strategy']}, профиль: {report['profile']}, "
+        f"режим навигации: {report.get('routing_mode', DEFAULT_ROUTING_MODE)}, вопросов: {report['questions']}",
+        f"{'уровень':12} {'top-1':>7} {'top-' + str(report['k']):>7}",
+    ]
+    for level, values in report["accuracy"].items():
+        lines.append(f"{level:12} {values['top1']:7.1%} {values['topk']:7.1%}")
+    lines.append(
+        f"Задержка, с: mean {latency['mean']:.3f}  p50 {latency['p50']:.3f}  "
+        f"p90 {latency['p90']:.3f}  p99 {latency['p99']:.3f}"
+    )
+    lines.append(
+        f"На вопрос: запросов {per_question['calls']:.1f}, токенов вход {per_question['prompt_tokens']:.0f} / "
+        f"выход {per_question['completion_tokens']:.0f}, стоимость {per_question['cost']:.4f}"
+    )
+    lines.append(f"Стоимость всего прогона: {report['cost_total']:.4f}, ошибок: {len(report['errors'])}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Оценка точности и задержки навигации по размеченным вопросам")
+    parser.add_argument("--questions", default=QUESTIONS_FILE)
+    parser.add_argument("--know-map", default=KNOW_MAP_FILE)
+    parser.add_argument("--strategy", choices=sorted(STRATEGIES), default="sequential")
+    parser.add_argument("--profile", choices=PROFILE_NAMES, default="full")
+    parser.add_argument("--routing-mode", choices=sorted(ROUTING_MODES), default=DEFAULT_ROUTING_MODE)
+    parser.add_argument("--part-width", type=int, help="speculative: сколько частей-кандидатов разворачивать заранее")
+    parser.add_argument("--chapter-width", type=int, help="speculative: сколько глав-кандидатов в каждой ветке")
+    parser.add_argument("--backend", choices=["fake", "real", "record", "replay"], default="fake")
+    parser.add_argument("--cassette", help="файл записи ответов для record/replay")
+    parser.add_argument("--replay-latency", action="store_true", help="воспроизводить записанные задержки")
+    parser.add_argument("--k", type=int, default=DEFAULT_K)
+    parser.add_argument("--output", help="сохранить отчёт в JSON")
+    parser.add_argument("--baseline", help="отчёт, с которым сравнивать (регрессионный гейт)")
+    parser.add_argument("--min-accuracy", type=float, help="минимальная top-1 точность подглавы")
+    parser.add_argument("--max-accuracy-drop", type=float, default=0.0)
+    parser.add_argument("--max-token-growth", type=float, default=0.05)
+    args = parser.parse_args()
+
+    if args.backend in ("record", "replay") and not args.cassette:
+        parser.error("для record/replay нужен --cassette")
+
+    know_map = load_know_map(args.know_map)
+    client = create_backend(args.backend, args.cassette, args.replay_latency)
+    profile = get_profile(args.profile, know_map)
+    widths = {"part_width": args.part_width, "chapter_width": args.chapter_width}
+    strategy_options = {name: value for name, value in widths.items() if value is not None}
+    if strategy_options and args.strategy != "speculative":
+        parser.error("--part-width/--chapter-width применимы только к --strategy speculative")
+    report = evaluate(
+        client, know_map, load_questions(args.questions), args.strategy, profile, args.k, args.routing_mode,
+        strategy_options
+    )
+    print(format_report(report))
+    if args.output:
+        dump_json(report, args.output)
+
+    baseline = load_json(args.baseline) if args.baseline else None
+    problems = check_regression(report, baseline, args.min_accuracy, args.max_accuracy_drop, args.max_token_growth)
+    for problem in problems:
+        print(f"РЕГРЕССИЯ: {problem}")
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+# shared_store.py
+"""
+Страницы книги и карта знаний в одном бинарном файле, который процессы-воркеры
+открывают через mmap только для чтения.
+
+Каждый воркер (uvicorn/gunicorn, пул multiprocessing для пакетных ответов) раньше
+разбирал kniga_full_content.json и know_map_full.json и держал свою копию моделей.
+Файл хранилища строится один раз (build_store; cli.py ingest --index или первый
+процесс, которому он понадобился), а отображённые страницы файла - общий
+страничный кеш ОС: память под данные книги не растёт с числом воркеров.
+
+При открытии файла читается только заголовок и создаются представления memoryview
+на таблицы смещений - JSON не разбирается. Текст страницы декодируется при
+обращении к ней; часть карты знаний (компактный JSON шарда, как в know_map_store)
+разбирается при первом обращении и держится в LRU на max_shards частей.
+
+Формат (little-endian, секции выровнены по 8 байт):
+    MAGIC, версия, число секций, затем (смещение, длина) каждой секции из SECTIONS.
+    page_numbers    int32[N]   - номера страниц в порядке книги
+    page_offsets    int64[N+1] - границы текста страниц в page_text
+    page_text       UTF-8
+    part_numbers    int32[M]
+    part_offsets    int64[M+1] - границы шардов частей в part_blobs
+    part_blobs      JSON шардов {"part_number", "pages", "chapters"}
+    chapter_offsets int64[M+1] - границы номеров глав части в chapter_numbers
+    chapter_numbers int32
+    meta            JSON: поля книги и части без глав (каталог шага 1)
+Метаданные страниц (summary, keywords) в хранилище не попадают: для ответа
+на вопрос нужен только текст.
+"""
+import mmap
+import os
+import struct
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from collections.abc import Sequence
+from typing import Any, Dict, Iterable, List, Optional
+
+from book_models import Page, Part, chapter_from_dict, part_from_dict
+from json_io import dumps, load_json, loads
+from know_map_store import DEFAULT_MAX_SHARDS, KnowMapStore
+
+STORE_FILE = "data_index/book_store.bin"
+MAGIC = b"BOOKSTOR"
+VERSION = 1
+SECTIONS = (
+    "page_numbers", "page_offsets", "page_text",
+    "part_numbers", "part_offsets", "part_blobs",
+    "chapter_offsets", "chapter_numbers", "meta",
+)
+BOOK_FIELDS = ("title", "author", "isbn", "publisher", "year", "totalPages")
+
+_HEADER = struct.Struct("<8sII")
+_ENTRY = struct.Struct("<QQ")
+
+
+def _offsets(lengths: List[int]) -> bytes:
+    """
+    Границы элементов: int64[0, l0, l0 + l1, ...].
+    """
+    bounds, total = [0], 0
+    for length in lengths:
+        total += length
+        bounds.append(total)
+    return struct.pack(f"<{len(bounds)}q", *bounds)
+
+
+def _int32(values: List[int]) -> bytes:
+    return struct.pack(f"<{len(values)}i", *values)
+
+
+def build_store(know_map_file: str, book_file: str, store_file: str = STORE_FILE) -> str:
+    """
+    Собирает файл хранилища из know_map_full.json и kniga_full_content.json.
+    Запись идёт во временный файл с заменой через os.replace, поэтому воркеры,
+    уже открывшие прежнюю версию, продолжают читать её без ошибок.
+    """
+    book_data = load_json(book_file)
+    book = book_data if isinstance(book_data, list) else book_data.get("book", {})
+    pages = book if isinstance(book, list) else book.get("pages", [])
+    parts = load_json(know_map_file)["content"]["parts"]
+
+    texts = [str(page.get("content", "")).encode("utf-8") for page in pages]
+    shards = [
+        dumps({"part_number": p["part_number"], "pages": p.get("pages", []), "chapters": p.get("chapters", [])}, True)
+        for p in parts
+    ]
+    chapters = [[ch["chapter_number"] for ch in p.get("chapters", [])] for p in parts]
+    meta = {
+        "book": {} if isinstance(book, list) else {name: book.get(name) for name in BOOK_FIELDS},
+        "parts": [{key: value for key, value in p.items() if key != "chapters"} for p in parts],
+    }
+    sections = {
+        "page_numbers": _int32([page.get("pageNumber") for page in pages]),
+        "page_offsets": _offsets([len(text) for text in texts]),
+        "page_text": b"".join(texts),
+        "part_numbers": _int32([p["part_number"] for p in parts]),
+        "part_offsets": _offsets([len(shard) for shard in shards]),
+        "part_blobs": b"".join(shards),
+        "chapter_offsets": _offsets([len(numbers) for numbers in chapters]),
+        "chapter_numbers": _int32([number for numbers in chapters for number in numbers]),
+        "meta": dumps(meta, True),
+    }
+
+    position = _HEADER.size + _ENTRY.size * len(SECTIONS)
+    table, body = [], bytearray()
+    for name in SECTIONS:
+        padding = -(position + len(body)) % 8
+        body += b"\0" * padding
+        table.append(_ENTRY.pack(position + len(body), len(sections[name])))
+        body += sections[name]
+
+    os.makedirs(os.path.dirname(store_file) or ".", exist_ok=True)
+    tmp_file = f"{store_file}.{os.getpid()}.tmp"
+    with open(tmp_file, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(SECTIONS)))
+        f.write(b"".join(table))
+        f.write(body)
+    os.replace(tmp_file, store_file)
+    return store_file
+
+
+class PageView(Sequence):
+    """
+    Страницы хранилища как последовательность Page; объекты создаются при обращении.
+    """
+    def __init__(self, store: "SharedStore"):
+        self._store = store
+
+    def __len__(self) -> int:
+        return len(self._store.page_numbers)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._store.page_at(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self._store.page_at(index)
+
+
+class SharedBook:
+    """
+    Книга из хранилища с тем же чтением, что у book_models.Book: pages и get_page.
+    """
+    def __init__(self, store: "SharedStore"):
+        self._store = store
+        self.pages = PageView(store)
+
+    def __getattr__(self, name: str) -> Any:
+        if name in BOOK_FIELDS:
+            return self._store.meta["book"].get(name)
+        raise AttributeError(name)
+
+    def get_page(self, page_number: int) -> Optional[Page]:
+        index = self._store.page_index(page_number)
+        return None if index is None else self._store.page_at(index)
+
+    def find_pages(self, page_numbers: Iterable[int]) -> List[Page]:
+        """
+        Все страницы с номерами из page_numbers в порядке книги; декодируются только они.
+        """
+        indices = {i for number in page_numbers for i in self._store.page_indices(number)}
+        return [self._store.page_at(i) for i in sorted(indices)]
+
+
+class SharedKnowMap(KnowMapStore):
+    """
+    Карта знаний из хранилища: навигационный индекс (часть -> номера глав) берётся
+    из двоичных таблиц, шард части разбирается при первом find_part.
+    Остальное чтение (find_chapter, find_subchapter, iter_chapters, iter_subchapters,
+    to_know_map) и LRU шардов - от KnowMapStore.
+    """
+    def __init__(self, store: "SharedStore", max_shards: int = DEFAULT_MAX_SHARDS):
+        # Файлы каталога know_map не читаются, поэтому KnowMapStore.__init__ не вызывается
+        self.directory = self.shards_dir = os.path.dirname(store.path)
+        self.max_shards = max_shards
+        self._lock = threading.RLock()
+        self._shards = OrderedDict()
+        self._parts: Optional[List[Part]] = None
+        self.files_read = self.bytes_read = 0
+        self._store = store
+        bounds = store.chapter_offsets
+        self.parts_to_chapters: Dict[int, List[int]] = {
+            number: list(store.chapter_numbers[bounds[i]:bounds[i + 1]])
+            for i, number in enumerate(store.part_numbers)
+        }
+        self.chapters_to_subchapters: Dict[int, List[str]] = {}
+
+    @property
+    def parts(self) -> List[Part]:
+        with self._lock:
+            if self._parts is None:
+                self._parts = [part_from_dict(node) for node in self._store.meta["parts"]]
+            return self._parts
+
+    def _load_part(self, part_number: int) -> Optional[Part]:
+        summary = next((part for part in self.parts if part.part_number == part_number), None)
+        blob = self._store.part_blob(part_number)
+        if summary is None or blob is None:
+            return None
+        self.files_read += 1
+        self.bytes_read += len(blob)
+        data = loads(blob)
+        chapters = [chapter_from_dict(node, part_number) for node in data["chapters"]]
+        return Part(summary.title, summary.summary, summary.key_points, part_number, data["pages"], chapters)
+
+
+class SharedStore:
+    """
+    Открытый файл хранилища. book и know_map - представления поверх одного mmap.
+    """
+    def __init__(self, path: str = STORE_FILE, max_shards: int = DEFAULT_MAX_SHARDS):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        magic, version, count = _HEADER.unpack_from(view)
+        if magic != MAGIC or version != VERSION or count != len(SECTIONS):
+            raise ValueError(f"{path}: неизвестный формат хранилища, пересоберите его (build_store)")
+        sections = {}
+        for i, name in enumerate(SECTIONS):
+            offset, length = _ENTRY.unpack_from(view, _HEADER.size + i * _ENTRY.size)
+            sections[name] = view[offset:offset + length]
+        self.page_numbers = sections["page_numbers"].cast("i")
+        self.page_offsets = sections["page_offsets"].cast("q")
+        self.page_text = sections["page_text"]
+        self.part_numbers = sections["part_numbers"].cast("i")
+        self.part_offsets = sections["part_offsets"].cast("q")
+        self.part_blobs = sections["part_blobs"]
+        self.chapter_offsets = sections["chapter_offsets"].cast("q")
+        self.chapter_numbers = sections["chapter_numbers"].cast("i")
+        self._meta_blob = sections["meta"]
+        self._meta: Optional[Dict[str, Any]] = None
+        # Номера страниц обычно идут по неубыванию (бывают повторы) - тогда поиск двоичный
+        numbers = self.page_numbers
+        self._sorted = all(numbers[i] <= numbers[i + 1] for i in range(len(numbers) - 1))
+        self.book = SharedBook(self)
+        self.know_map = SharedKnowMap(self, max_shards)
+
+    @property
+    def meta(self) -> Dict[str, Any]:
+        if self._meta is None:
+            self._meta = loads(bytes(self._meta_blob))
+        return self._meta
+
+    def page_at(self, index: int) -> Page:
+        start, end = self.page_offsets[index], self.page_offsets[index + 1]
+        return Page(pageNumber=self.page_numbers[index], content=str(self.page_text[start:end], "utf-8"))
+
+    def page_index(self, page_number: int) -> Optional[int]:
+        indices = self.page_indices(page_number)
+        return indices[0] if indices else None
+
+    def page_indices(self, page_number: int) -> List[int]:
+        """
+        Индексы всех страниц с номером page_number в порядке книги.
+        """
+        numbers = self.page_numbers
+        if self._sorted:
+            return list(range(bisect_left(numbers, page_number), bisect_right(numbers, page_number)))
+        return [i for i, number in enumerate(numbers) if number == page_number]
+
+    def part_blob(self, part_number: int) -> Optional[bytes]:
+        for i, number in enumerate(self.part_numbers):
+            if number == part_number:
+                return bytes(self.part_blobs[self.part_offsets[i]:self.part_offsets[i + 1]])
+        return None
+
+
+def ensure_store(store_file: str, know_map_file: str, book_file: str) -> str:
+    """
+    Собирает хранилище, если файла нет или исходные JSON новее; возвращает store_file.
+    """
+    if not os.path.exists(store_file) or os.path.getmtime(store_file) < max(
+        os.path.getmtime(know_map_file), os.path.getmtime(book_file)
+    ):
+        build_store(know_map_file, book_file, store_file)
+    return store_file
+
+
+def load_shared_store(
+    store_file: str,
+    know_map_file: str,
+    book_file: str,
+    max_shards: int = DEFAULT_MAX_SHARDS
+) -> SharedStore:
+    """
+    Открывает хранилище; если файла нет или исходные JSON новее, сначала собирает его.
+    """
+    return SharedStore(ensure_store(store_file, know_map_file, book_file), max_shards)
+
+
+if __name__ == "__main__":
+    path = build_store("data_know_map/know_map_full.json", "data_update/kniga_full_content.json")
+    print(f"Хранилище: {os.path.getsize(path) / 1024:.0f} КиБ -> {path}")
@@ -0,0 +1,218 @@
+# speculative_navigation.py
+"""
+Спекулятивная навигация: шаги 2 и 3 для наиболее вероятных кандидатов стартуют
+параллельно с решением родительского шага, а не после него.
+
+Пока LLM выбирает часть, уже выполняется выбор главы для part_width лучших частей
+по LocalRanker; внутри каждой такой ветки выбор подглавы стартует для chapter_width
+лучших глав. Когда родительское решение получено, выигравшая ветка продолжается,
+проигравшие отменяются. Если LLM выбрала узел вне кандидатов, шаг выполняется обычно.
+
+Ограничение: вызовы клиента синхронные и идут в потоках, поэтому отмена ветки
+освобождает только ожидание - уже отправленный HTTP-запрос завершится в фоне,
+будет оплачен, а его результат отброшен. Такие запросы считаются в статистике
+как wasted. Синхронный run дожидается их завершения (asyncio.run закрывает пул
+потоков), поэтому к его возврату их стоимость уже учтена наблюдателями клиента
+(client_observer), а задержка run - по самой долгой из запущенных веток.
+"""
+import asyncio
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from book_models import KnowMap
+from gigachat_module import (
+    get_book_part_reasoning,
+    get_chapter_reasoning,
+    get_subchapter_reasoning,
+    DEFAULT_ROUTING_MODE,
+    ROUTING_MODES
+)
+from local_ranker import LocalRanker
+from navigation_cache import NavigationCache
+from pipeline import DEFAULT_MODELS, Catalogues, StepModels
+from render_profiles import FULL_PROFILE, RenderProfile
+from response_schema import DEFAULT_SCHEMA_MODE
+
+DEFAULT_PART_WIDTH = 2
+DEFAULT_CHAPTER_WIDTH = 2
+
+
+class SpeculativeNavigator:
+    """
+    Параметры навигации - как у pipeline.navigate (cache, profile, models,
+    catalogues, schema_mode, routing_mode), кроме каскада моделей.
+    part_width - сколько частей-кандидатов разворачивать заранее;
+    chapter_width - сколько глав-кандидатов в каждой ветке.
+    Ширина 0 отключает спекуляцию на соответствующем уровне.
+    В cache записываются только решения, вошедшие в результат; уровни, найденные
+    в кеше, не запрашиваются, и спекуляция начинается с первого неизвестного уровня.
+    """
+    def __init__(
+        self,
+        client,
+        know_map: KnowMap,
+        cache: Optional[NavigationCache] = None,
+        profile: RenderProfile = FULL_PROFILE,
+        models: StepModels = DEFAULT_MODELS,
+        catalogues: Optional[Catalogues] = None,
+        schema_mode: str = DEFAULT_SCHEMA_MODE,
+        routing_mode: str = DEFAULT_ROUTING_MODE,
+        ranker: Optional[LocalRanker] = None,
+        part_width: int = DEFAULT_PART_WIDTH,
+        chapter_width: int = DEFAULT_CHAPTER_WIDTH
+    ):
+        if routing_mode not in ROUTING_MODES:
+            raise ValueError(f"Неизвестный режим навигации: {routing_mode}. Доступны: {', '.join(ROUTING_MODES)}")
+        self.client = client
+        self.know_map = know_map
+        self.cache = cache
+        self.models = models
+        self.catalogues = catalogues or Catalogues(know_map, profile)
+        self.schema_mode = schema_mode
+        self.steps = ROUTING_MODES[routing_mode]
+        self.ranker = ranker or LocalRanker(know_map)
+        self.part_width = part_width
+        self.chapter_width = chapter_width
+        self._stats_lock = threading.Lock()
+
+    async def _request(self, stats: Dict[str, Any], function, *args):
+        """
+        Вызов клиента в потоке. Запрос считается в calls, когда поток его начинает:
+        задача, отменённая до старта потока, запроса не отправляет.
+        """
+        def call():
+            with self._stats_lock:
+                stats["calls"] += 1
+            return function(*args)
+
+        return await asyncio.to_thread(call)
+
+    async def _select_part(self, question: str, stats: Dict[str, Any]):
+        prompt, response_model = self.steps["part"]
+        return await self._request(
+            stats, get_book_part_reasoning, self.client, prompt, self.catalogues.parts(), question,
+            self.models.part, self.schema_mode, response_model
+        )
+
+    async def _select_chapter(self, part_number: int, question: str, stats: Dict[str, Any]):
+        prompt, response_model = self.steps["chapter"]
+        return await self._request(
+            stats, get_chapter_reasoning, self.client, prompt, self.catalogues.chapters(part_number), question,
+            self.models.chapter, self.schema_mode, response_model
+        )
+
+    async def _select_subchapter(self, part_number: int, chapter_number: int, question: str, stats: Dict[str, Any]):
+        prompt, response_model = self.steps["subchapter"]
+        return await self._request(
+            stats, get_subchapter_reasoning, self.client, prompt,
+            self.catalogues.subchapters(part_number, chapter_number), question,
+            self.models.subchapter, self.schema_mode, response_model
+        )
+
+    def _count_wasted(self, stats: Dict[str, Any]) -> None:
+        with self._stats_lock:
+            stats["wasted"] = stats["calls"] - stats["used"]
+
+    async def _resolve(self, decision_task: asyncio.Task, branches: Dict[Any, asyncio.Task], attr: str, fallback, stats):
+        """
+        Дожидается родительского решения, оставляет ветку выбранного узла и отменяет остальные.
+        Если выбранного узла нет среди кандидатов, запускает fallback(selected).
+        """
+        try:
+            decision = await decision_task
+            selected = getattr(decision, attr)
+            for key, task in branches.items():
+                if key != selected:
+                    if not task.done():
+                        stats["cancelled"] += 1
+                    task.cancel()
+            if selected in branches:
+                stats["hits"] += 1
+                return decision, await branches[selected]
+            stats["misses"] += 1
+            return decision, await fallback(selected)
+        except BaseException:
+            # Ветка сама отменена (проиграла на уровне выше) или упала - гасим всё внутри неё
+            decision_task.cancel()
+            for task in branches.values():
+                task.cancel()
+            raise
+
+    async def _chapter_branch(self, part_number: int, question: str, stats: Dict[str, Any], known=None):
+        """
+        Выбор главы внутри части и спекулятивный выбор подглавы для лучших глав-кандидатов.
+        known - решения из кеша для этой части.
+        """
+        known = known or {}
+        if "chapter" in known:
+            chapter_number = known["chapter"].selected_chapter
+            subchapter_reasoning = known.get("subchapter")
+            if subchapter_reasoning is None:
+                subchapter_reasoning = await self._select_subchapter(part_number, chapter_number, question, stats)
+            return {"chapter": known["chapter"], "subchapter": subchapter_reasoning}
+
+        chapter_task = asyncio.create_task(self._select_chapter(part_number, question, stats))
+        candidates = [number for number, _ in self.ranker.rank_chapters(question, part_number)[:self.chapter_width]]
+        subchapter_tasks = {
+            number: asyncio.create_task(self._select_subchapter(part_number, number, question, stats))
+            for number in candidates
+        }
+        chapter_reasoning, subchapter_reasoning = await self._resolve(
+            chapter_task,
+            subchapter_tasks,
+            "selected_chapter",
+            lambda selected: self._select_subchapter(part_number, selected, question, stats),
+            stats
+        )
+        return {"chapter": chapter_reasoning, "subchapter": subchapter_reasoning}
+
+    async def navigate(self, question: str) -> Dict[str, Any]:
+        """
+        Результат в том же формате, что и pipeline.navigate, плюс статистика спекуляции:
+        calls - отправленные запросы, used - вошедшие в результат, wasted - отброшенные
+        (оплачены, но не вошли в результат; запросы, стартовавшие в фоне после
+        возврата, учитывает только run), hits/misses - угаданные и не угаданные родительские решения,
+        cancelled - ветки, отменённые до завершения.
+        """
+        stats = {"calls": 0, "used": 0, "wasted": 0, "hits": 0, "misses": 0, "cancelled": 0}
+        start = time.perf_counter()
+        known = {}
+        if self.cache is not None:
+            known = self.cache.get(question, {level: model for level, (_, model) in self.steps.items()})
+
+        if "part" in known:
+            part_reasoning = known["part"]
+            branch = await self._chapter_branch(part_reasoning.selected_part, question, stats, known)
+        else:
+            part_task = asyncio.create_task(self._select_part(question, stats))
+            candidates = [number for number, _ in self.ranker.rank_parts(question)[:self.part_width]]
+            branches = {
+                number: asyncio.create_task(self._chapter_branch(number, question, stats)) for number in candidates
+            }
+            part_reasoning, branch = await self._resolve(
+                part_task,
+                branches,
+                "selected_part",
+                lambda selected: self._chapter_branch(selected, question, stats),
+                stats
+            )
+
+        navigation = {"part": part_reasoning, **branch}
+        requested = [level for level in navigation if level not in known]
+        if self.cache is not None:
+            for level in requested:
+                self.cache.put(question, level, navigation[level])
+        stats["used"] = len(requested)
+        self._count_wasted(stats)
+        stats["latency_seconds"] = time.perf_counter() - start
+        return {**navigation, "speculation": stats}
+
+    def run(self, question: str) -> Dict[str, Any]:
+        """
+        Синхронная обёртка над navigate; возвращается после завершения всех
+        отправленных запросов, включая отброшенные, поэтому calls и wasted точные.
+        """
+        result = asyncio.run(self.navigate(question))
+        self._count_wasted(result["speculation"])
+        return result
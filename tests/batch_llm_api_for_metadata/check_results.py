@@ -1,13 +1,14 @@
 # check_results.py
 from tests.batch_llm_api_for_metadata.test_batch_processor import BatchProcessor
-import json
+from json_io import load_json
+from tests.batch_llm_api_for_metadata.merge_results import PAGES_FILE, RETRY_FILE, download_and_merge
 import logging
+import memory_profile
 
-def check_and_save_results():
+def check_and_save_results(pages_file: str = PAGES_FILE):
     try:
         # Загружаем информацию о batch-задании
-        with open("batch_job_info.json", "r") as f:
-            job_info = json.load(f)
+        job_info = load_json("batch_job_info.json")
             
         processor = BatchProcessor()
         batch_id = job_info["batch_id"]
@@ -29,21 +30,12 @@ def check_and_save_results():
                 print(f"Request counts: {batch.request_counts}")
                 
         elif status == "completed":
-            # Получаем результаты
-            batch = processor.client.batches.retrieve(batch_id)
-            results = processor.get_results(batch)
-            
-            if results:
-                # Сохраняем результаты в файл
-                with open("batch_results.json", "w", encoding='utf-8') as f:
-                    json.dump(results, f, ensure_ascii=False, indent=2)
-                print("Результаты сохранены в batch_results.json")
-                
-                # Выводим краткую статистику
-                print(f"Обработано страниц: {len(results)}")
-                errors = [r for r in results if r.get('error')]
-                if errors:
-                    print(f"Количество ошибок: {len(errors)}")
+            # Результаты скачиваются на диск кусками и вливаются в страницы за один проход
+            with memory_profile.stage("batch.results"):
+                report = download_and_merge(processor.client, batch, pages_file)
+            print(report)
+            if report.failed or report.missing:
+                print(f"Страницы для повторной отправки: {RETRY_FILE}")
         
         return status, batch
             
@@ -54,4 +46,5 @@ def check_and_save_results():
         raise
 
 if __name__ == "__main__":
+    memory_profile.enable_from_env()
     check_and_save_results()
\ No newline at end of file
@@ -0,0 +1,349 @@
+# merge_results.py
+"""
+Потоковое слияние результатов batch-задания со страницами книги.
+
+Раньше результаты целиком держались в памяти (files.content(...).text), писались
+в batch_results.json, а перенос summary/keywords в kniga_only_pages.json делался
+вручную. Здесь каждый этап читает данные порциями, поэтому память не зависит от
+размера библиотеки:
+
+1. download_file - выходной файл (и файл ошибок) batch скачивается кусками
+   через files.with_streaming_response прямо на диск.
+2. index_results - JSONL читается построчно; результат каждой строки
+   раскладывается по номерам страниц (custom_id page_N или pages_A-B для
+   упакованных запросов) в SQLite-индекс рядом с файлом страниц.
+3. merge_pages - массив страниц читается по одному объекту (JSONDecoder.raw_decode
+   по буферу), к странице применяется её результат из индекса, страницы пишутся
+   во временный файл, который заменяет исходный через os.replace. Страницы с
+   ошибкой (или без результата и без summary) уходят в retry-шард - файл страниц
+   в том же формате, который можно снова отправить send_batch_job.
+"""
+import json
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from json_io import dumps, loads
+from tests.batch_llm_api_for_metadata.test_models import PageAnalysisResult, PagesAnalysisResult
+from tests.batch_llm_api_for_metadata.test_online_processor import apply_analysis_to_page
+
+CHUNK_SIZE = 1 << 20
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+INSERT_BATCH = 1000
+
+PAGES_FILE = "data_update/kniga_only_pages.json"
+BATCH_OUTPUT_FILE = "batch_output.jsonl"
+BATCH_ERRORS_FILE = "batch_errors.jsonl"
+RETRY_FILE = "batch_retry_pages.json"
+
+
+# -------------------------------------------------------------------
+# Скачивание
+# -------------------------------------------------------------------
+def download_file(client, file_id: str, path: str, chunk_size: int = CHUNK_SIZE) -> int:
+    """
+    Скачивает файл Files API кусками по chunk_size байт; возвращает размер.
+    """
+    tmp_path = f"{path}.part"
+    size = 0
+    with client.files.with_streaming_response.content(file_id) as response, open(tmp_path, "wb") as f:
+        for chunk in response.iter_bytes(chunk_size):
+            f.write(chunk)
+            size += len(chunk)
+    os.replace(tmp_path, path)
+    return size
+
+
+# -------------------------------------------------------------------
+# Разбор строк результата
+# -------------------------------------------------------------------
+def custom_id_pages(custom_id: str) -> List[int]:
+    """
+    Номера страниц запроса: page_12 -> [12], pages_3-7 -> [3, ..., 7].
+    """
+    prefix, _, value = custom_id.partition("_")
+    if prefix == "page":
+        return [int(value)]
+    if prefix == "pages":
+        first, _, last = value.partition("-")
+        return list(range(int(first), int(last) + 1))
+    raise ValueError(f"Неизвестный custom_id: {custom_id}")
+
+
+def parse_result_line(record: Dict[str, Any]) -> List[Tuple[int, Optional[PageAnalysisResult], Optional[str]]]:
+    """
+    Строка JSONL batch -> [(номер страницы, анализ или None, ошибка или None)].
+    Ответ без choices/message/content или с невалидным JSON - ошибка для всех
+    страниц запроса. В упакованном ответе номера страниц вне custom_id
+    отбрасываются, а страницы запроса, которых нет в ответе, считаются ошибкой.
+    """
+    custom_id = record["custom_id"]
+    numbers = custom_id_pages(custom_id)
+    response = record.get("response") or {}
+    error = record.get("error")
+    if error is None and response.get("status_code", 200) != 200:
+        error = response.get("body", {}).get("error") or f"HTTP {response.get('status_code')}"
+    if error is not None:
+        message = error.get("message", str(error)) if isinstance(error, dict) else str(error)
+        return [(number, None, message) for number in numbers]
+
+    try:
+        content = response["body"]["choices"][0]["message"]["content"]
+        if not custom_id.startswith("pages_"):
+            return [(numbers[0], PageAnalysisResult.model_validate_json(content), None)]
+        result = PagesAnalysisResult.model_validate_json(content)
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        return [(number, None, f"Некорректный ответ: {e!r}") for number in numbers]
+
+    analyses: Dict[int, PageAnalysisResult] = {}
+    for item in result.pages:
+        if item.pageNumber not in numbers:
+            logging.warning(f"{custom_id}: страница {item.pageNumber} вне запроса, пропущена")
+            continue
+        analyses.setdefault(item.pageNumber, PageAnalysisResult(summary=item.summary, keywords=item.keywords))
+    return [
+        (number, analyses[number], None) if number in analyses else (number, None, "Страницы нет в ответе")
+        for number in numbers
+    ]
+
+
+# -------------------------------------------------------------------
+# Индекс результатов
+# -------------------------------------------------------------------
+def open_index(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS results ("
+        "page_number INTEGER PRIMARY KEY, summary TEXT, keywords TEXT, error TEXT, matched INTEGER DEFAULT 0)"
+    )
+    return conn
+
+
+def index_results(conn: sqlite3.Connection, jsonl_path: str) -> Tuple[int, int]:
+    """
+    Построчно переносит результаты из JSONL в индекс; возвращает число строк и
+    число нераспознанных строк (обрезанный JSON, нет custom_id или он неизвестного
+    вида) - такие строки пропускаются, а их страницы остаются без результата.
+    Успешный результат страницы не перезаписывается ошибкой (страница может
+    встретиться и в выходном файле, и в файле ошибок).
+    """
+    upsert = (
+        "INSERT INTO results (page_number, summary, keywords, error) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT(page_number) DO UPDATE SET summary = excluded.summary, keywords = excluded.keywords, "
+        "error = excluded.error WHERE excluded.error IS NULL OR results.error IS NOT NULL"
+    )
+    lines, malformed, rows = 0, 0, []
+    with open(jsonl_path, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            lines += 1
+            try:
+                parsed = parse_result_line(loads(line))
+            except (KeyError, TypeError, ValueError) as e:
+                malformed += 1
+                logging.error(f"{jsonl_path}:{lines}: нераспознанная строка результата пропущена: {e!r}")
+                continue
+            for number, analysis, error in parsed:
+                if analysis is None:
+                    rows.append((number, None, None, error))
+                else:
+                    rows.append((number, analysis.summary, dumps(analysis.keywords, compact=True).decode(), None))
+            if len(rows) >= INSERT_BATCH:
+                conn.executemany(upsert, rows)
+                rows.clear()
+    conn.executemany(upsert, rows)
+    conn.commit()
+    return lines, malformed
+
+
+# -------------------------------------------------------------------
+# Потоковое чтение и перезапись файла страниц
+# -------------------------------------------------------------------
+def iter_json_array(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[Any]:
+    """
+    Элементы JSON-массива из файла по одному, без загрузки файла целиком.
+    Внутри куска разбор идёт по позиции pos; прочитанная часть буфера
+    отбрасывается один раз на кусок, а не после каждого элемента.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, started = "", 0, False
+    with open(path, encoding="utf-8") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            buffer, pos = buffer[pos:] + chunk, 0
+            while True:
+                pos = _WHITESPACE.match(buffer, pos).end()
+                if pos == len(buffer):
+                    break
+                if not started:
+                    if buffer[pos] != "[":
+                        raise ValueError(f"{path}: ожидался JSON-массив")
+                    pos, started = pos + 1, True
+                elif buffer[pos] == ",":
+                    pos += 1
+                elif buffer[pos] == "]":
+                    return
+                else:
+                    try:
+                        item, pos = decoder.raw_decode(buffer, pos)
+                    except json.JSONDecodeError:
+                        if not chunk:
+                            raise
+                        break  # объект не дочитан - нужен следующий кусок
+                    yield item
+            if not chunk:
+                raise ValueError(f"{path}: файл закончился внутри массива")
+
+
+class JsonArrayWriter:
+    """
+    Пишет JSON-массив по элементу в строке во временный файл рядом с path;
+    commit() атомарно заменяет path.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        fd, self.tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+        self.file = os.fdopen(fd, "wb")
+        self.file.write(b"[")
+
+    def write(self, item: Any) -> None:
+        self.file.write(b",\n" if self.count else b"\n")
+        self.file.write(dumps(item, compact=True))
+        self.count += 1
+
+    def commit(self) -> None:
+        self.file.write(b"\n]\n")
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self) -> None:
+        self.file.close()
+        os.unlink(self.tmp_path)
+
+
+def rewrite_pages(path: str, transform: Callable[[Dict[str, Any]], None], chunk_size: int = CHUNK_SIZE) -> int:
+    """
+    Применяет transform к каждой странице файла за один проход и атомарно
+    заменяет файл; возвращает число страниц.
+    """
+    writer = JsonArrayWriter(path)
+    try:
+        for page in iter_json_array(path, chunk_size):
+            transform(page)
+            writer.write(page)
+    except BaseException:
+        writer.abort()
+        raise
+    writer.commit()
+    return writer.count
+
+
+@dataclass
+class MergeReport:
+    pages: int = 0
+    merged: int = 0
+    failed: int = 0
+    missing: int = 0
+    unmatched: int = 0
+    malformed: int = 0
+
+    def __str__(self) -> str:
+        return (
+            f"Страниц: {self.pages}, обновлено: {self.merged}, с ошибкой: {self.failed}, "
+            f"без результата: {self.missing}, результатов без страницы: {self.unmatched}, "
+            f"нераспознанных строк результата: {self.malformed}"
+        )
+
+
+def merge_pages(
+    conn: sqlite3.Connection,
+    pages_file: str,
+    retry_file: str = RETRY_FILE,
+    chunk_size: int = CHUNK_SIZE
+) -> MergeReport:
+    """
+    Один проход по страницам: результаты из индекса записываются в metadata,
+    страницы с ошибкой и неразмеченные страницы без результата - в retry_file.
+    """
+    report = MergeReport()
+    writer, retry = JsonArrayWriter(pages_file), JsonArrayWriter(retry_file)
+    try:
+        for page in iter_json_array(pages_file, chunk_size):
+            report.pages += 1
+            number = page.get("pageNumber")
+            row = conn.execute(
+                "SELECT summary, keywords, error FROM results WHERE page_number = ?", (number,)
+            ).fetchone()
+            if row is not None:
+                conn.execute("UPDATE results SET matched = 1 WHERE page_number = ?", (number,))
+            if row is not None and row[2] is None:
+                apply_analysis_to_page(page, PageAnalysisResult(summary=row[0], keywords=loads(row[1])))
+                report.merged += 1
+            elif row is not None:
+                report.failed += 1
+                retry.write(page)
+            elif not (page.get("metadata") or {}).get("summary"):
+                report.missing += 1
+                retry.write(page)
+            writer.write(page)
+    except BaseException:
+        writer.abort()
+        retry.abort()
+        raise
+    writer.commit()
+    retry.commit()
+    report.unmatched = conn.execute("SELECT COUNT(*) FROM results WHERE matched = 0").fetchone()[0]
+    conn.commit()
+    return report
+
+
+def merge_batch_results(
+    result_files: List[str],
+    pages_file: str = PAGES_FILE,
+    retry_file: str = RETRY_FILE,
+    chunk_size: int = CHUNK_SIZE
+) -> MergeReport:
+    """
+    Индексирует JSONL-файлы результатов (выходной и файл ошибок) во временном
+    SQLite рядом с pages_file и вливает их в страницы.
+    """
+    fd, index_path = tempfile.mkstemp(dir=os.path.dirname(pages_file) or ".", suffix=".sqlite3")
+    os.close(fd)
+    conn = open_index(index_path)
+    malformed = 0
+    try:
+        for path in result_files:
+            lines, skipped = index_results(conn, path)
+            malformed += skipped
+            logging.info(f"Проиндексировано строк результата: {lines}, нераспознанных: {skipped} ({path})")
+        report = merge_pages(conn, pages_file, retry_file, chunk_size)
+        report.malformed = malformed
+    finally:
+        conn.close()
+        os.unlink(index_path)
+    logging.info(str(report))
+    return report
+
+
+def download_and_merge(
+    client,
+    batch,
+    pages_file: str = PAGES_FILE,
+    retry_file: str = RETRY_FILE
+) -> MergeReport:
+    """
+    Скачивает выходной файл и файл ошибок завершённого batch и вливает их в страницы.
+    """
+    result_files = []
+    for file_id, path in ((batch.output_file_id, BATCH_OUTPUT_FILE), (batch.error_file_id, BATCH_ERRORS_FILE)):
+        if file_id:
+            size = download_file(client, file_id, path)
+            logging.info(f"Скачано {size / 1024:.0f} КиБ -> {path}")
+            result_files.append(path)
+    return merge_batch_results(result_files, pages_file, retry_file)
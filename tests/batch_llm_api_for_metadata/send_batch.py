@@ -2,19 +2,28 @@
 
 from tests.batch_llm_api_for_metadata.test_utils import load_book_pages
 from tests.batch_llm_api_for_metadata.test_batch_processor import BatchProcessor
+from tests.batch_llm_api_for_metadata.test_page_packing import write_packed_batch_file
 import time
 import json
 import logging
+import memory_profile
 
-def send_batch_job():
+PAGES_FILE = "/Users/mask/Documents/Проеты_2025/book_team_job/data_update/kniga_only_pages.json"
+
+def send_batch_job(file_path: str = PAGES_FILE, packed: bool = False):
     # Инициализация процессора
     processor = BatchProcessor()
     
     # Загружаем все страницы
-    pages = load_book_pages("/Users/mask/Documents/Проеты_2025/book_team_job/data_update/kniga_only_pages.json")
+    with memory_profile.stage("batch.load_pages"):
+        pages = load_book_pages(file_path)
     
-    # Создаем batch файл
-    batch_file = processor.create_batch_file(pages)
+    # Создаем batch файл; packed - несколько подряд идущих страниц в одном запросе (pages_A-B)
+    with memory_profile.stage("batch.create_file"):
+        if packed:
+            batch_file = write_packed_batch_file(pages)
+        else:
+            batch_file = processor.create_batch_file(pages)
     
     # Загружаем файл
     file_id = processor.upload_file(batch_file)
@@ -34,4 +43,7 @@ def send_batch_job():
     logging.info("Информация о задании сохранена в batch_job_info.json")
 
 if __name__ == "__main__":
-    send_batch_job()
\ No newline at end of file
+    import sys
+
+    memory_profile.enable_from_env()
+    send_batch_job(packed="--packed" in sys.argv)
\ No newline at end of file
@@ -0,0 +1,224 @@
+# send_faq.py
+"""
+Офлайн-генерация синтетических вопросов к подглавам для faq_index.
+
+Тот же поток, что у разметки страниц: для небольшого числа запросов или
+короткого дедлайна (choose_mode) вопросы запрашиваются онлайн через
+OnlineProcessor, иначе пишется JSONL для Batch API (custom_id subchapter_<номер>)
+и отправляется batch-задание; после его завершения collect_faq_batch скачивает
+результаты кусками (merge_results.download_file). Вопросы сохраняются в
+faq_index.FAQ_FILE, по ним строится индекс faq_index.INDEX_DIR.
+
+    python -m tests.batch_llm_api_for_metadata.send_faq            # онлайн или batch
+    python -m tests.batch_llm_api_for_metadata.send_faq --collect  # результаты batch
+    python -m tests.batch_llm_api_for_metadata.send_faq --missing  # повтор подглав без вопросов
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+from typing import Dict, List, Optional
+
+from book_models import KnowMap, Subchapter
+from faq_index import FAQ_FILE, INDEX_DIR, build_faq_index
+from json_io import dump_json, load_json, load_know_map, loads
+from tests.batch_llm_api_for_metadata.merge_results import download_file
+from tests.batch_llm_api_for_metadata.test_models import SubchapterQuestions
+from tests.batch_llm_api_for_metadata.test_online_processor import DEFAULT_MODEL, OnlineProcessor, choose_mode
+from tests.batch_llm_api_for_metadata.test_prompts import FAQ_RESPONSE_SCHEMA, build_faq_messages
+
+KNOW_MAP_FILE = "data_know_map/know_map_full.json"
+FAQ_BATCH_FILE = "faq_batch_input.jsonl"
+FAQ_OUTPUT_FILE = "faq_batch_output.jsonl"
+FAQ_ERRORS_FILE = "faq_batch_errors.jsonl"
+FAQ_JOB_FILE = "faq_batch_job_info.json"
+QUESTIONS_PER_SUBCHAPTER = 8
+
+RESPONSE_FORMAT = {"type": "json_schema", "json_schema": FAQ_RESPONSE_SCHEMA}
+
+
+def faq_custom_id(subchapter: Subchapter) -> str:
+    return f"subchapter_{subchapter.subchapter_number}"
+
+
+def generate_faq_online(
+    subchapters: List[Subchapter],
+    processor: Optional[OnlineProcessor] = None,
+    count: int = QUESTIONS_PER_SUBCHAPTER
+) -> Dict[str, List[str]]:
+    """
+    Вопросы для каждой подглавы онлайн-запросами; подглавы с ошибкой пропускаются.
+    """
+    processor = processor or OnlineProcessor()
+    faq: Dict[str, List[str]] = {}
+
+    async def handle(subchapter: Subchapter):
+        try:
+            content = await processor.request_analysis(build_faq_messages(subchapter, count), RESPONSE_FORMAT)
+            faq[str(subchapter.subchapter_number)] = SubchapterQuestions.model_validate_json(content).questions
+        except Exception as e:
+            logging.error(f"Ошибка при обработке {faq_custom_id(subchapter)}: {e}")
+
+    asyncio.run(processor.run_workers(subchapters, handle))
+    logging.info(f"Вопросы получены для {len(faq)} из {len(subchapters)} подглав")
+    # Порядок подглав - как в карте знаний
+    numbers = [str(sub.subchapter_number) for sub in subchapters]
+    return {number: faq[number] for number in numbers if number in faq}
+
+
+def write_faq_batch_file(
+    subchapters: List[Subchapter],
+    path: str = FAQ_BATCH_FILE,
+    model: str = DEFAULT_MODEL,
+    count: int = QUESTIONS_PER_SUBCHAPTER
+) -> str:
+    """
+    JSONL-файл запросов для Batch API, по строке на подглаву.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        for subchapter in subchapters:
+            f.write(json.dumps({
+                "custom_id": faq_custom_id(subchapter),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": model,
+                    "temperature": 0,
+                    "messages": build_faq_messages(subchapter, count),
+                    "response_format": RESPONSE_FORMAT,
+                },
+            }, ensure_ascii=False) + "\n")
+    return path
+
+
+def send_faq_batch(client, subchapters: List[Subchapter], count: int = QUESTIONS_PER_SUBCHAPTER) -> str:
+    path = write_faq_batch_file(subchapters, count=count)
+    with open(path, "rb") as f:
+        file_id = client.files.create(file=f, purpose="batch").id
+    batch = client.batches.create(input_file_id=file_id, endpoint="/v1/chat/completions", completion_window="24h")
+    dump_json({
+        "batch_id": batch.id,
+        "file_id": file_id,
+        "total_subchapters": len(subchapters),
+        "subchapters": [str(sub.subchapter_number) for sub in subchapters],
+    }, FAQ_JOB_FILE)
+    logging.info(f"Batch задание вопросов отправлено. ID: {batch.id}, информация в {FAQ_JOB_FILE}")
+    return batch.id
+
+
+def parse_faq_results(path: str) -> Dict[str, List[str]]:
+    """
+    Построчный разбор выходного JSONL batch (или файла ошибок): {номер подглавы: вопросы}.
+    Строки с ошибкой или некорректным ответом пропускаются с записью в журнал.
+    """
+    faq: Dict[str, List[str]] = {}
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = loads(line)
+                custom_id = record["custom_id"]
+                response = record.get("response") or {}
+                if record.get("error") is not None or response.get("status_code", 200) != 200:
+                    logging.error(f"Ошибка для {custom_id}: {record.get('error') or response.get('body')}")
+                    continue
+                content = response["body"]["choices"][0]["message"]["content"]
+                questions = SubchapterQuestions.model_validate_json(content).questions
+            except (KeyError, IndexError, TypeError, ValueError) as e:
+                logging.error(f"Некорректная строка результата в {path}: {e!r}")
+                continue
+            faq[custom_id.partition("_")[2]] = questions
+    return faq
+
+
+def missing_subchapters(faq: Dict[str, List[str]], subchapters: List[Subchapter]) -> List[str]:
+    """
+    Номера подглав, для которых вопросов нет, - их можно отправить повторно (--missing).
+    """
+    return [str(sub.subchapter_number) for sub in subchapters if str(sub.subchapter_number) not in faq]
+
+
+def collect_faq_batch(client) -> Optional[Dict[str, List[str]]]:
+    """
+    Результаты batch-задания из FAQ_JOB_FILE (выходной файл и файл ошибок);
+    None, если задание ещё не завершено.
+    """
+    batch = client.batches.retrieve(load_json(FAQ_JOB_FILE)["batch_id"])
+    logging.info(f"Статус batch вопросов: {batch.status}")
+    if batch.status != "completed":
+        return None
+    faq: Dict[str, List[str]] = {}
+    for file_id, path in ((batch.output_file_id, FAQ_OUTPUT_FILE), (batch.error_file_id, FAQ_ERRORS_FILE)):
+        if file_id:
+            download_file(client, file_id, path)
+            faq.update(parse_faq_results(path))
+    return faq
+
+
+def save_faq(faq: Dict[str, List[str]], know_map_file: str = KNOW_MAP_FILE) -> None:
+    """
+    Дополняет FAQ_FILE новыми вопросами (повторно отправленные подглавы
+    заменяют прежние) и пересобирает индекс.
+    """
+    os.makedirs(os.path.dirname(FAQ_FILE), exist_ok=True)
+    if os.path.exists(FAQ_FILE):
+        faq = {**load_json(FAQ_FILE), **faq}
+    dump_json(faq, FAQ_FILE)
+    index = build_faq_index(know_map_file, FAQ_FILE, INDEX_DIR)
+    logging.info(f"{FAQ_FILE}: {len(index.questions)} вопросов по {len(faq)} подглавам, индекс в {INDEX_DIR}")
+
+
+def _sync_client():
+    from openai import OpenAI
+    return OpenAI()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Синтетические вопросы к подглавам для faq_index")
+    parser.add_argument("--know-map", default=KNOW_MAP_FILE)
+    parser.add_argument("--count", type=int, default=QUESTIONS_PER_SUBCHAPTER, help="вопросов на подглаву")
+    parser.add_argument("--deadline", type=float, help="дедлайн в секундах (короткий - только онлайн)")
+    parser.add_argument("--collect", action="store_true", help="забрать результаты отправленного batch")
+    parser.add_argument("--missing", action="store_true", help=f"только подглавы без вопросов в {FAQ_FILE}")
+    args = parser.parse_args()
+
+    know_map: KnowMap = load_know_map(args.know_map)
+    subchapters = list(know_map.iter_subchapters())
+    if args.missing and os.path.exists(FAQ_FILE):
+        missing = set(missing_subchapters(load_json(FAQ_FILE), subchapters))
+        subchapters = [sub for sub in subchapters if str(sub.subchapter_number) in missing]
+        if not subchapters and not args.collect:
+            logging.info(f"У всех подглав уже есть вопросы в {FAQ_FILE}")
+            return
+    processor = OnlineProcessor()
+    if args.collect:
+        # Ожидаются подглавы, отправленные в этом задании
+        sent = set(load_json(FAQ_JOB_FILE).get("subchapters") or [])
+        if sent:
+            subchapters = [sub for sub in subchapters if str(sub.subchapter_number) in sent]
+        faq = collect_faq_batch(_sync_client())
+    else:
+        mode = choose_mode(
+            len(subchapters), args.deadline,
+            concurrency=processor.concurrency, requests_per_second=processor.rate_limiter.rate
+        )
+        logging.info(f"Подглав: {len(subchapters)}, режим: {mode}")
+        if mode == "batch":
+            send_faq_batch(_sync_client(), subchapters, args.count)
+            return
+        faq = generate_faq_online(subchapters, processor, args.count)
+    if faq is None:
+        return
+    missing = missing_subchapters(faq, subchapters)
+    if missing:
+        logging.warning(
+            f"Без вопросов {len(missing)} подглав: {', '.join(missing)} - отправьте их повторно с --missing"
+        )
+    if faq:
+        save_faq(faq, args.know_map)
+
+
+if __name__ == "__main__":
+    main()
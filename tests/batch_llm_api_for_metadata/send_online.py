@@ -0,0 +1,64 @@
+# send_online.py
+
+from tests.batch_llm_api_for_metadata.test_utils import load_book_pages
+from tests.batch_llm_api_for_metadata.test_online_processor import OnlineProcessor, choose_mode
+from tests.batch_llm_api_for_metadata.test_page_packing import PackedOnlineProcessor
+from tests.batch_llm_api_for_metadata.test_rolling_context import RollingContextProcessor
+from json_io import dump_json
+import memory_profile
+import logging
+from typing import Optional
+
+def annotate_pages(
+    file_path: str,
+    deadline_seconds: Optional[float] = None,
+    packed: bool = False,
+    rolling: bool = False
+):
+    """
+    Заполняет summary и keywords страниц: онлайн, если страниц немного или дедлайн короткий,
+    иначе отправляет batch-задание. packed - несколько подряд идущих страниц в одном
+    запросе в обоих режимах (PackedOnlineProcessor онлайн, pages_A-B в batch).
+    rolling - запрос страницы содержит summary предыдущей страницы той же главы
+    (RollingContextProcessor); такой контекст есть только у онлайн-обработки.
+    """
+    if packed and rolling:
+        raise ValueError("packed и rolling несовместимы: выберите один режим")
+    with memory_profile.stage("batch.load_pages"):
+        pages = load_book_pages(file_path)
+    if packed:
+        processor = PackedOnlineProcessor()
+    elif rolling:
+        processor = RollingContextProcessor()
+    else:
+        processor = OnlineProcessor()
+    mode = choose_mode(
+        len(pages),
+        deadline_seconds,
+        concurrency=processor.concurrency,
+        requests_per_second=processor.rate_limiter.rate
+    )
+    if rolling and mode == "batch":
+        # В batch-задании ответы на предыдущие страницы недоступны при формировании запросов
+        logging.warning("rolling-контекст доступен только онлайн, batch-режим не используется")
+        mode = "online"
+    logging.info(f"Выбран режим обработки: {mode}")
+
+    if mode == "batch":
+        from tests.batch_llm_api_for_metadata.send_batch import send_batch_job
+        send_batch_job(file_path, packed)
+        return mode, None
+
+    with memory_profile.stage("batch.annotate"):
+        results = processor.run(pages)
+
+    # metadata страниц уже обновлены по мере поступления ответов
+    with memory_profile.stage("batch.save"):
+        dump_json(pages, file_path)
+        dump_json(results, "online_results.json", compact=True)
+    logging.info(f"Страницы обновлены в {file_path}, результаты сохранены в online_results.json")
+    return mode, results
+
+if __name__ == "__main__":
+    memory_profile.enable_from_env()
+    annotate_pages("data_update/kniga_only_pages.json", deadline_seconds=60 * 60)
@@ -20,4 +20,15 @@ class BookPage(BaseModel):
 
 class PageAnalysisResult(BaseModel):
     summary: str
-    keywords: List[str]
\ No newline at end of file
+    keywords: List[str]
+
+class PageAnalysisItem(BaseModel):
+    pageNumber: int
+    summary: str
+    keywords: List[str]
+
+class PagesAnalysisResult(BaseModel):
+    pages: List[PageAnalysisItem]
+
+class SubchapterQuestions(BaseModel):
+    questions: List[str]
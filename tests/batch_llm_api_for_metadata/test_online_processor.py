@@ -0,0 +1,224 @@
+# test_online_processor.py
+import asyncio
+import json
+import logging
+import time
+from typing import Awaitable, Callable, List, Optional
+
+from openai import AsyncOpenAI, APIConnectionError, APIStatusError, RateLimitError
+
+from tests.batch_llm_api_for_metadata.test_models import PageAnalysisResult
+from tests.batch_llm_api_for_metadata.test_prompts import RESPONSE_SCHEMA, build_page_messages
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+# Batch API гарантирует выполнение только в течение окна 24h
+BATCH_COMPLETION_WINDOW_SECONDS = 24 * 60 * 60
+# Выше этого количества страниц batch выгоднее (скидка 50%), если дедлайн позволяет
+ONLINE_PAGE_LIMIT = 500
+
+
+def page_custom_id(page: dict) -> str:
+    """
+    custom_id страницы в том же формате, что и в batch-файле.
+    """
+    return f"page_{page['pageNumber']}"
+
+
+def apply_analysis_to_page(page: dict, analysis: PageAnalysisResult) -> None:
+    """
+    Записывает summary и keywords в metadata страницы.
+    """
+    metadata = page.setdefault("metadata", {})
+    metadata["summary"] = analysis.summary
+    metadata["keywords"] = analysis.keywords
+
+
+class RateLimiter:
+    """
+    Ограничитель частоты запросов (token bucket): не больше `rate` запросов в секунду
+    с допустимым всплеском `burst`.
+    """
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class OnlineProcessor:
+    """
+    Онлайн-альтернатива BatchProcessor: пул asyncio-воркеров вызывает chat-completions
+    для каждой страницы с ограничением параллельности и частоты запросов.
+
+    Результаты записываются в metadata страниц по мере поступления, а итоговый список
+    имеет тот же формат, что и результаты batch-задания:
+    {"custom_id": ..., "response": {"summary": ..., "keywords": [...]}, "error": ...}
+    """
+    def __init__(
+        self,
+        client: Optional[AsyncOpenAI] = None,
+        model: str = DEFAULT_MODEL,
+        concurrency: int = 8,
+        requests_per_second: float = 5.0,
+        max_retries: int = 3
+    ):
+        self.client = client or AsyncOpenAI()
+        self.model = model
+        self.concurrency = concurrency
+        self.rate_limiter = RateLimiter(requests_per_second, burst=concurrency)
+        self.max_retries = max_retries
+
+    async def request_analysis(self, messages: List[dict], response_format: dict = None) -> str:
+        """
+        Выполняет один запрос с повторами при ошибках лимитов и сети.
+        Возвращает текст ответа модели.
+        """
+        response_format = response_format or {"type": "json_schema", "json_schema": RESPONSE_SCHEMA}
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire()
+            try:
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    temperature=0,
+                    messages=messages,
+                    response_format=response_format,
+                )
+                return response.choices[0].message.content
+            except (RateLimitError, APIConnectionError, APIStatusError) as e:
+                retryable = isinstance(e, (RateLimitError, APIConnectionError)) or e.status_code >= 500
+                if not retryable or attempt == self.max_retries:
+                    raise
+                delay = 2 ** attempt
+                logging.warning(f"Ошибка запроса ({e}), повтор через {delay} с")
+                await asyncio.sleep(delay)
+
+    async def analyze_page(self, page: dict, messages: Optional[List[dict]] = None) -> dict:
+        """
+        Анализирует одну страницу и сразу записывает результат в её metadata.
+        messages - готовый запрос (например, с контекстом предыдущей страницы);
+        по умолчанию - build_page_messages(page).
+        """
+        custom_id = page_custom_id(page)
+        try:
+            content = await self.request_analysis(messages or build_page_messages(page))
+            analysis = PageAnalysisResult.model_validate_json(content)
+        except Exception as e:
+            logging.error(f"Ошибка при обработке {custom_id}: {e}")
+            return {"custom_id": custom_id, "response": None, "error": str(e)}
+
+        apply_analysis_to_page(page, analysis)
+        return {"custom_id": custom_id, "response": analysis.model_dump(), "error": None}
+
+    async def run_workers(self, items: list, handler: Callable[[object], Awaitable[None]]) -> None:
+        """
+        Обрабатывает items через handler не более чем в `concurrency` параллельных воркерах.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        for item in items:
+            queue.put_nowait(item)
+
+        async def worker():
+            while True:
+                try:
+                    item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                await handler(item)
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(self.concurrency, len(items)))]
+        await asyncio.gather(*workers)
+
+    async def process_pages(
+        self,
+        pages: List[dict],
+        on_result: Optional[Callable[[dict], None]] = None
+    ) -> List[dict]:
+        """
+        Обрабатывает все страницы не более чем в `concurrency` параллельных запросах.
+        on_result вызывается для каждого результата сразу после его получения.
+        """
+        results = {}
+
+        async def handle(page):
+            result = await self.analyze_page(page)
+            results[result["custom_id"]] = result
+            if on_result is not None:
+                on_result(result)
+
+        await self.run_workers(pages, handle)
+        # Сохраняем порядок страниц, как в batch-результатах
+        return [results[page_custom_id(page)] for page in pages]
+
+    def run(self, pages: List[dict], on_result: Optional[Callable[[dict], None]] = None) -> List[dict]:
+        """
+        Синхронная обёртка над process_pages.
+        """
+        start = time.perf_counter()
+        results = asyncio.run(self.process_pages(pages, on_result))
+        errors = [r for r in results if r["error"]]
+        logging.info(
+            f"Онлайн-обработка завершена: {len(results)} страниц за {time.perf_counter() - start:.1f} с, "
+            f"ошибок: {len(errors)}"
+        )
+        return results
+
+
+def estimate_online_seconds(
+    page_count: int,
+    concurrency: int = 8,
+    requests_per_second: float = 5.0,
+    avg_latency_seconds: float = 4.0
+) -> float:
+    """
+    Оценка времени онлайн-обработки: пропускная способность ограничена
+    либо rate limit'ом, либо числом воркеров.
+    """
+    throughput = min(requests_per_second, concurrency / avg_latency_seconds)
+    return page_count / throughput
+
+
+def choose_mode(
+    page_count: int,
+    deadline_seconds: Optional[float] = None,
+    concurrency: int = 8,
+    requests_per_second: float = 5.0,
+    avg_latency_seconds: float = 4.0,
+    online_page_limit: int = ONLINE_PAGE_LIMIT
+) -> str:
+    """
+    Выбирает режим обработки: "online" или "batch".
+
+    - Если дедлайн короче окна batch-задания, подходит только online.
+    - Если дедлайна нет или он позволяет ждать batch, большие объёмы отправляем в batch
+      (дешевле), а небольшие обрабатываем online.
+    """
+    online_seconds = estimate_online_seconds(page_count, concurrency, requests_per_second, avg_latency_seconds)
+    if deadline_seconds is not None and deadline_seconds < BATCH_COMPLETION_WINDOW_SECONDS:
+        if online_seconds > deadline_seconds:
+            logging.warning(
+                f"Онлайн-обработка займёт ~{online_seconds:.0f} с и может не уложиться в дедлайн {deadline_seconds:.0f} с"
+            )
+        return "online"
+    return "online" if page_count <= online_page_limit else "batch"
+
+
+if __name__ == "__main__":
+    from tests.batch_llm_api_for_metadata.test_utils import load_book_pages
+
+    pages = load_book_pages("data_update/kniga_only_pages.json", limit=2)
+    processor = OnlineProcessor()
+    for result in processor.run(pages):
+        print(json.dumps(result, ensure_ascii=False, indent=2))
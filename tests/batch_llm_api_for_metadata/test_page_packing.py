@@ -0,0 +1,216 @@
+# test_page_packing.py
+import json
+import logging
+from dataclasses import dataclass
+from typing import List, Optional
+
+from token_counter import estimate_cost, estimate_messages_tokens, estimate_tokens
+from tests.batch_llm_api_for_metadata.test_models import PageAnalysisResult, PagesAnalysisResult
+from tests.batch_llm_api_for_metadata.test_online_processor import (
+    DEFAULT_MODEL,
+    OnlineProcessor,
+    apply_analysis_to_page,
+    page_custom_id
+)
+from tests.batch_llm_api_for_metadata.test_prompts import (
+    PACKED_RESPONSE_SCHEMA,
+    SYSTEM_PROMPT_PACKED,
+    build_packed_messages,
+    build_page_messages
+)
+
+# Бюджет входных токенов на один запрос (с запасом под ответ в контекстном окне)
+DEFAULT_TOKEN_BUDGET = 12000
+# Выходных токенов на одну страницу (summary + keywords), для оценки ответа
+OUTPUT_TOKENS_PER_PAGE = 200
+PACKED_BATCH_FILE = "batch_input_packed.jsonl"
+
+
+def pack_pages(
+    pages: List[dict],
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+    max_pages: Optional[int] = None
+) -> List[List[dict]]:
+    """
+    Разбивает страницы на группы подряд идущих страниц так, чтобы запрос каждой группы
+    (системный промпт + страницы) укладывался в token_budget.
+    Страница, которая одна превышает бюджет, уходит отдельной группой.
+    """
+    if max_pages is not None and max_pages < 1:
+        raise ValueError(f"max_pages должен быть не меньше 1, получено {max_pages}")
+    base_tokens = estimate_tokens(SYSTEM_PROMPT_PACKED)
+    groups, current, current_tokens = [], [], base_tokens
+    for page in pages:
+        page_tokens = estimate_tokens(json.dumps(page, ensure_ascii=False))
+        too_long = current and current_tokens + page_tokens > token_budget
+        too_many = max_pages is not None and len(current) >= max_pages
+        if too_long or too_many:
+            groups.append(current)
+            current, current_tokens = [], base_tokens
+        current.append(page)
+        current_tokens += page_tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def group_custom_id(group: List[dict]) -> str:
+    """
+    custom_id запроса для группы страниц: pages_<первая>-<последняя>.
+    """
+    return f"pages_{group[0]['pageNumber']}-{group[-1]['pageNumber']}"
+
+
+def validate_page_numbers(group: List[dict], result: PagesAnalysisResult) -> None:
+    """
+    Проверяет, что модель вернула ровно те же номера страниц, что были в запросе.
+    """
+    expected = [page["pageNumber"] for page in group]
+    received = [item.pageNumber for item in result.pages]
+    if sorted(expected) != sorted(received):
+        raise ValueError(f"Номера страниц не совпадают: ожидались {expected}, получены {received}")
+
+
+def create_packed_batch_lines(groups: List[List[dict]], model: str = DEFAULT_MODEL) -> List[str]:
+    """
+    Строки JSONL для batch-файла: один запрос на группу страниц.
+    """
+    return [
+        json.dumps({
+            "custom_id": group_custom_id(group),
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": model,
+                "temperature": 0,
+                "messages": build_packed_messages(group),
+                "response_format": {"type": "json_schema", "json_schema": PACKED_RESPONSE_SCHEMA}
+            }
+        }, ensure_ascii=False)
+        for group in groups
+    ]
+
+
+def write_packed_batch_file(
+    pages: List[dict],
+    path: str = PACKED_BATCH_FILE,
+    model: str = DEFAULT_MODEL,
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+    max_pages: Optional[int] = None
+) -> str:
+    """
+    batch-файл упакованных запросов (custom_id pages_A-B, см. merge_results.parse_result_line).
+    """
+    groups = pack_pages(pages, token_budget, max_pages)
+    logging.info(f"\n{compare_packing(groups, model)}")
+    with open(path, "w", encoding="utf-8") as f:
+        for line in create_packed_batch_lines(groups, model):
+            f.write(line + "\n")
+    return path
+
+
+@dataclass
+class PackingReport:
+    """
+    Сравнение упакованного режима с режимом «одна страница - один запрос».
+    """
+    pages: int
+    single_requests: int
+    packed_requests: int
+    single_input_tokens: int
+    packed_input_tokens: int
+    single_cost: float
+    packed_cost: float
+
+    @property
+    def token_reduction(self) -> float:
+        return 1 - self.packed_input_tokens / self.single_input_tokens if self.single_input_tokens else 0.0
+
+    @property
+    def cost_reduction(self) -> float:
+        return 1 - self.packed_cost / self.single_cost if self.single_cost else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"Страниц: {self.pages}\n"
+            f"Запросов: {self.single_requests} -> {self.packed_requests}\n"
+            f"Входных токенов: {self.single_input_tokens} -> {self.packed_input_tokens} "
+            f"(-{self.token_reduction:.1%})\n"
+            f"Стоимость: {self.single_cost:.4f} -> {self.packed_cost:.4f} (-{self.cost_reduction:.1%})"
+        )
+
+
+def compare_packing(groups: List[List[dict]], model: str = DEFAULT_MODEL) -> PackingReport:
+    """
+    Оценивает входные токены и стоимость для упакованных групп и для постраничного режима.
+    Выходные токены в обоих режимах примерно одинаковы (по OUTPUT_TOKENS_PER_PAGE на страницу).
+    """
+    pages = [page for group in groups for page in group]
+    output_tokens = OUTPUT_TOKENS_PER_PAGE * len(pages)
+    single_tokens = sum(estimate_messages_tokens(build_page_messages(page)) for page in pages)
+    packed_tokens = sum(estimate_messages_tokens(build_packed_messages(group)) for group in groups)
+    return PackingReport(
+        pages=len(pages),
+        single_requests=len(pages),
+        packed_requests=len(groups),
+        single_input_tokens=single_tokens,
+        packed_input_tokens=packed_tokens,
+        single_cost=estimate_cost(model, single_tokens, output_tokens),
+        packed_cost=estimate_cost(model, packed_tokens, output_tokens)
+    )
+
+
+class PackedOnlineProcessor(OnlineProcessor):
+    """
+    Онлайн-обработка группами: несколько последовательных страниц в одном запросе.
+    Формат результатов тот же, что у OnlineProcessor (по одной записи на страницу).
+    """
+    def __init__(self, *args, token_budget: int = DEFAULT_TOKEN_BUDGET, max_pages: Optional[int] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.token_budget = token_budget
+        self.max_pages = max_pages
+
+    async def analyze_group(self, group: List[dict]) -> List[dict]:
+        """
+        Анализирует группу страниц одним запросом и записывает результаты в metadata.
+        """
+        try:
+            content = await self.request_analysis(
+                build_packed_messages(group),
+                {"type": "json_schema", "json_schema": PACKED_RESPONSE_SCHEMA}
+            )
+            result = PagesAnalysisResult.model_validate_json(content)
+            validate_page_numbers(group, result)
+        except Exception as e:
+            logging.error(f"Ошибка при обработке {group_custom_id(group)}: {e}")
+            return [{"custom_id": page_custom_id(page), "response": None, "error": str(e)} for page in group]
+
+        by_number = {item.pageNumber: item for item in result.pages}
+        results = []
+        for page in group:
+            item = by_number[page["pageNumber"]]
+            analysis = PageAnalysisResult(summary=item.summary, keywords=item.keywords)
+            apply_analysis_to_page(page, analysis)
+            results.append({"custom_id": page_custom_id(page), "response": analysis.model_dump(), "error": None})
+        return results
+
+    async def process_pages(self, pages, on_result=None):
+        groups = pack_pages(pages, self.token_budget, self.max_pages)
+        logging.info(f"\n{compare_packing(groups, self.model)}")
+        results = {}
+
+        async def handle(group):
+            for result in await self.analyze_group(group):
+                results[result["custom_id"]] = result
+                if on_result is not None:
+                    on_result(result)
+
+        await self.run_workers(groups, handle)
+        return [results[page_custom_id(page)] for page in pages]
+
+
+if __name__ == "__main__":
+    from tests.batch_llm_api_for_metadata.test_utils import load_book_pages
+
+    pages = load_book_pages("data_update/kniga_only_pages.json")
+    print(compare_packing(pack_pages(pages)))
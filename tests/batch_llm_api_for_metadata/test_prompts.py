@@ -1,3 +1,6 @@
+import json
+from typing import List
+
 SYSTEM_PROMPT = """Вы - ассистент по анализу книг. Ваша задача - заполнить поля summary и keywords для каждой страницы книги.
 
 ПРАВИЛА для summary:
@@ -40,4 +43,120 @@ RESPONSE_SCHEMA = {
         "additionalProperties": False
     },
     "strict": True  # <-- Добавлена строгая проверка
-}
\ No newline at end of file
+}
+
+
+def build_page_messages(page: dict) -> List[dict]:
+    """
+    Формирует сообщения запроса для одной страницы.
+    Используется и batch, и online режимом, чтобы ответы были одинаковыми.
+    """
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": json.dumps(page, ensure_ascii=False)}
+    ]
+
+
+SYSTEM_PROMPT_PACKED = SYSTEM_PROMPT.split("Ответ должен строго")[0] + """Вам передаётся несколько последовательных страниц книги (JSON-список).
+Заполните summary и keywords для КАЖДОЙ страницы, сохранив её pageNumber.
+Страницы идут подряд, поэтому связь с предыдущим контекстом берите из предыдущих страниц списка.
+
+Ответ должен строго соответствовать формату:
+{
+    "pages": [
+        {"pageNumber": 10, "summary": "текст summary...", "keywords": ["слово1", "слово2", ...]},
+        ...
+    ]
+}"""
+
+PACKED_RESPONSE_SCHEMA = {
+    "name": "pages_analysis",
+    "schema": {
+        "type": "object",
+        "properties": {
+            "pages": {
+                "type": "array",
+                "description": "Analysis for every page of the request, in the same order.",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "pageNumber": {"type": "integer"},
+                        "summary": RESPONSE_SCHEMA["schema"]["properties"]["summary"],
+                        "keywords": RESPONSE_SCHEMA["schema"]["properties"]["keywords"]
+                    },
+                    "required": ["pageNumber", "summary", "keywords"],
+                    "additionalProperties": False
+                }
+            }
+        },
+        "required": ["pages"],
+        "additionalProperties": False
+    },
+    "strict": True
+}
+
+
+def build_packed_messages(pages: List[dict]) -> List[dict]:
+    """
+    Формирует сообщения одного запроса для группы последовательных страниц.
+    """
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT_PACKED},
+        {"role": "user", "content": json.dumps(pages, ensure_ascii=False)}
+    ]
+
+
+def build_rolling_messages(page: dict, previous_summary: str = None) -> List[dict]:
+    """
+    Сообщения для страницы с кратким содержанием предыдущей страницы той же главы
+    (вместо полного текста предыдущей страницы).
+    """
+    messages = build_page_messages(page)
+    if previous_summary:
+        messages[1]["content"] = (
+            f"Предыдущий контекст (summary предыдущей страницы): {previous_summary}\n\n"
+            f"Текущая страница: {messages[1]['content']}"
+        )
+    return messages
+
+
+SYSTEM_PROMPT_FAQ = """Вы - ассистент по подготовке вопросов к книге. По описанию подглавы книги (title, summary, key_points) составьте вопросы, которые читатель может задать и на которые отвечает именно эта подглава.
+
+ПРАВИЛА:
+1. Вопросы на русском языке, по одному предложению, как их задал бы пользователь чат-бота
+2. Разные формулировки: "что", "как", "почему", "зачем", просьбы объяснить или привести пример
+3. Каждый вопрос должен опираться на конкретное содержание подглавы (термины, имена, приёмы), а не на общую тему книги
+4. Не упоминайте номера глав и подглав
+
+Ответ должен строго соответствовать формату:
+{
+    "questions": ["вопрос 1", "вопрос 2", ...]
+}"""
+
+FAQ_RESPONSE_SCHEMA = {
+    "name": "subchapter_questions",
+    "schema": {
+        "type": "object",
+        "properties": {
+            "questions": {
+                "type": "array",
+                "description": "Likely user questions answered by the subchapter.",
+                "items": {"type": "string"}
+            }
+        },
+        "required": ["questions"],
+        "additionalProperties": False
+    },
+    "strict": True
+}
+
+
+def build_faq_messages(subchapter, count: int = 8) -> List[dict]:
+    """
+    Сообщения запроса вопросов для одной подглавы карты знаний (book_models.Subchapter).
+    """
+    description = {"title": subchapter.title, "summary": subchapter.summary, "key_points": subchapter.key_points}
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT_FAQ},
+        {"role": "user", "content": f"Количество вопросов: {count}\n\n{json.dumps(description, ensure_ascii=False)}"}
+    ]
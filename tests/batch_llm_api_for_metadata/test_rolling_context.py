@@ -0,0 +1,45 @@
+# test_rolling_context.py
+import logging
+from typing import List
+
+from tests.batch_llm_api_for_metadata.test_online_processor import OnlineProcessor, page_custom_id
+from tests.batch_llm_api_for_metadata.test_prompts import build_rolling_messages
+
+
+def split_into_chapters(pages: List[dict]) -> List[List[dict]]:
+    """
+    Делит страницы на главы: новая глава начинается со страницы с metadata.isChapterStart=true.
+    """
+    chapters = []
+    for page in pages:
+        if not chapters or page.get("metadata", {}).get("isChapterStart"):
+            chapters.append([])
+        chapters[-1].append(page)
+    return chapters
+
+
+class RollingContextProcessor(OnlineProcessor):
+    """
+    Последовательная обработка страниц внутри главы и параллельная - между главами.
+    Запрос каждой страницы содержит summary предыдущей страницы той же главы,
+    чтобы модель могла указать связь с предыдущим контекстом.
+    """
+    async def process_pages(self, pages, on_result=None):
+        chapters = split_into_chapters(pages)
+        logging.info(f"Глав: {len(chapters)}, параллельно обрабатывается до {self.concurrency}")
+        results = {}
+
+        async def handle(chapter):
+            previous_summary = None
+            for page in chapter:
+                result = await self.analyze_page(page, build_rolling_messages(page, previous_summary))
+                results[result["custom_id"]] = result
+                if on_result is not None:
+                    on_result(result)
+                # При ошибке оставляем последний известный контекст главы
+                if result["response"] is not None:
+                    previous_summary = result["response"]["summary"]
+
+        # Длинные главы запускаем первыми, чтобы они не оказались «хвостом» обработки
+        await self.run_workers(sorted(chapters, key=len, reverse=True), handle)
+        return [results[page_custom_id(page)] for page in pages]
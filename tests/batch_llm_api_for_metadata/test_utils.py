@@ -1,7 +1,8 @@
-import json
 import logging
 from typing import List
 
+from json_io import load_json
+
 # Настройка логирования
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
 
@@ -11,10 +12,9 @@ def load_book_pages(file_path: str, limit: int = None) -> List[dict]:
     limit: если указан, загружает только указанное количество страниц для тестирования
     """
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            pages = json.load(file)
-            logging.info(f"Загружено {len(pages if limit is None else pages[:limit])} страниц")
-            return pages[:limit] if limit is not None else pages
+        pages = load_json(file_path)
+        logging.info(f"Загружено {len(pages if limit is None else pages[:limit])} страниц")
+        return pages[:limit] if limit is not None else pages
     except Exception as e:
         logging.error(f"Ошибка при чтении файла: {e}")
         raise
\ No newline at end of file
@@ -1,10 +1,11 @@
 import os
 from pathlib import Path
-from typing import List, Dict
-from unstructured.partition.auto import partition
-from unstructured.documents.elements import Element
+from typing import TYPE_CHECKING, List, Dict
 
-def process_pdf(pdf_path: str, strategy: str = "auto") -> Dict[int, List[Element]]:
+if TYPE_CHECKING:
+    from unstructured.documents.elements import Element
+
+def process_pdf(pdf_path: str, strategy: str = "auto") -> "Dict[int, List[Element]]":
     """
     Обрабатывает PDF файл и извлекает из него текст, группируя элементы по страницам.
 
@@ -23,6 +24,9 @@ def process_pdf(pdf_path: str, strategy: str = "auto") -> Dict[int, List[Element
     if not os.path.exists(pdf_path):
         raise FileNotFoundError(f"Файл не найден: {pdf_path}")
 
+    # unstructured импортируется несколько секунд - только когда PDF действительно разбирается
+    from unstructured.partition.auto import partition
+
     try:
         elements = partition(filename=pdf_path, strategy=strategy)
         pages: Dict[int, List[Element]] = {}
@@ -36,7 +40,7 @@ def process_pdf(pdf_path: str, strategy: str = "auto") -> Dict[int, List[Element
     except Exception as e:
         raise Exception(f"Ошибка при обработке PDF: {str(e)}")
 
-def save_extracted_text_by_page(pages: Dict[int, List[Element]], output_dir: str, single_file: bool = False) -> None:
+def save_extracted_text_by_page(pages: "Dict[int, List[Element]]", output_dir: str, single_file: bool = False) -> None:
     """
     Сохраняет извлеченный текст, сгруппированный по страницам.
 
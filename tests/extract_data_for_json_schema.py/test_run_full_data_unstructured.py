@@ -1,10 +1,11 @@
 import os
 from pathlib import Path
-from typing import List
-from unstructured.partition.auto import partition
-from unstructured.documents.elements import Element
+from typing import TYPE_CHECKING, List
 
-def process_pdf(pdf_path: str) -> List[Element]:
+if TYPE_CHECKING:
+    from unstructured.documents.elements import Element
+
+def process_pdf(pdf_path: str) -> "List[Element]":
     """
     Обрабатывает PDF файл и извлекает из него текст.
     
@@ -20,6 +21,9 @@ def process_pdf(pdf_path: str) -> List[Element]:
     """
     if not os.path.exists(pdf_path):
         raise FileNotFoundError(f"Файл не найден: {pdf_path}")
+
+    # unstructured импортируется несколько секунд - только когда PDF действительно разбирается
+    from unstructured.partition.auto import partition
     
     try:
         # Извлекаем элементы из PDF
@@ -28,7 +32,7 @@ def process_pdf(pdf_path: str) -> List[Element]:
     except Exception as e:
         raise Exception(f"Ошибка при обработке PDF: {str(e)}")
 
-def save_extracted_text(elements: List[Element], output_path: str) -> None:
+def save_extracted_text(elements: "List[Element]", output_path: str) -> None:
     """
     Сохраняет извлеченный текст в файл.
     
@@ -1,21 +1,18 @@
-import json
+from tests.batch_llm_api_for_metadata.merge_results import rewrite_pages
+
+def reset_summary_fields(page: dict) -> None:
+    if "metadata" in page:
+        page["metadata"]["summary"] = ""  # Оставляем пустым, чтобы заполнить позже
+        page["metadata"]["keywords"] = []  # Оставляем пустым список ключевых слов
 
 def add_summary_field(file_path):
     """
     Добавляет поле 'summary' в metadata каждого объекта в списке JSON из файла.
+    Файл переписывается потоково, по одной странице (merge_results.rewrite_pages).
     """
-    with open(file_path, 'r', encoding='utf-8') as file:
-        json_data = json.load(file)
-    
-    for item in json_data:
-        if "metadata" in item:
-            item["metadata"]["summary"] = ""  # Оставляем пустым, чтобы заполнить позже
-            item["metadata"]["keywords"] = []  # Оставляем пустым список ключевых слов
-
-    
-    with open(file_path, 'w', encoding='utf-8') as file:
-        json.dump(json_data, file, indent=2, ensure_ascii=False)
+    return rewrite_pages(file_path, reset_summary_fields)
 
 # Пример использования
-file_path = "data_update/kniga_only_pages.json"
-add_summary_field(file_path)
+if __name__ == "__main__":
+    file_path = "data_update/kniga_only_pages.json"
+    add_summary_field(file_path)
@@ -0,0 +1,91 @@
+# test_annotation_modes.py
+"""
+RollingContextProcessor с поддельным асинхронным клиентом, без сети:
+контекст предыдущей страницы в запросе и параллельная обработка глав.
+
+    python -m pytest tests/test_annotation_modes.py
+"""
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import pytest
+
+from tests.batch_llm_api_for_metadata.send_online import annotate_pages
+from tests.batch_llm_api_for_metadata.test_rolling_context import RollingContextProcessor
+
+DELAY = 0.05
+
+
+class RecordingClient:
+    """
+    Отвечает summary вида "summary <номер страницы>" через DELAY секунд
+    и запоминает запросы и максимальное число одновременных запросов.
+    """
+    def __init__(self):
+        self.requests: List[Dict[str, Any]] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        self.requests.append(kwargs)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(DELAY)
+        self.in_flight -= 1
+        content = json.dumps({"summary": f"summary {page_number(kwargs)}", "keywords": ["k"]})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def make_pages(chapter_lengths: List[int]) -> List[dict]:
+    pages = []
+    for length in chapter_lengths:
+        for index in range(length):
+            number = len(pages) + 1
+            pages.append({
+                "pageNumber": number,
+                "content": f"Текст страницы {number}",
+                "metadata": {"isChapterStart": index == 0},
+            })
+    return pages
+
+
+def user_message(request: Dict[str, Any]) -> str:
+    return request["messages"][1]["content"]
+
+
+def page_number(request: Dict[str, Any]) -> int:
+    # Страница - JSON после необязательного префикса с контекстом
+    return json.loads(user_message(request).rsplit("Текущая страница: ", 1)[-1])["pageNumber"]
+
+
+def test_rolling_context_carries_previous_summary_and_runs_chapters_concurrently():
+    client = RecordingClient()
+    processor = RollingContextProcessor(client=client, concurrency=2, requests_per_second=1000)
+    pages = make_pages([3, 3])
+
+    started = time.perf_counter()
+    results = processor.run(pages)
+    elapsed = time.perf_counter() - started
+
+    assert [r["error"] for r in results] == [None] * 6
+    assert [page["metadata"]["summary"] for page in pages] == [f"summary {n}" for n in range(1, 7)]
+
+    by_page = {page_number(request): request for request in client.requests}
+    # Первая страница главы - без контекста, следующие - с summary предыдущей страницы
+    for first in (1, 4):
+        assert "Предыдущий контекст" not in user_message(by_page[first])
+    for number in (2, 3, 5, 6):
+        assert f"summary {number - 1}" in user_message(by_page[number])
+
+    # Две главы по три последовательных запроса: параллельно ~3*DELAY, а не 6*DELAY
+    assert client.max_in_flight == 2
+    assert elapsed < 5 * DELAY
+
+
+def test_rolling_and_packed_are_exclusive():
+    with pytest.raises(ValueError):
+        annotate_pages("pages.json", packed=True, rolling=True)
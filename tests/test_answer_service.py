@@ -0,0 +1,196 @@
+# test_answer_service.py
+"""
+ASGI-приложение answer_service с FakeLLMClient, без сети и без uvicorn:
+запросы передаются приложению напрямую (scope, receive, send).
+
+    python -m pytest tests/test_answer_service.py
+"""
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytest
+
+from answer_service import AnswerService, create_app
+from fake_llm import FakeLLMClient
+from json_io import dumps, loads
+from pipeline import PipelineConfig
+
+QUESTION = "Как выстроить обратную связь с клиентом?"
+
+
+class FailingClient(FakeLLMClient):
+    def _parse(self, **kwargs):
+        raise RuntimeError("secret upstream detail")
+
+    _create = _parse
+
+
+def make_app(client: Optional[FakeLLMClient] = None, **config) -> Tuple[Any, AnswerService, FakeLLMClient]:
+    # delay держит конвейер «в полёте», пока приходят одинаковые запросы
+    client = client or FakeLLMClient(delay=0.05)
+    service = AnswerService.from_config(PipelineConfig(cache_file=None, **config), client)
+    return create_app(lambda: service), service, client
+
+
+async def request(app, method: str, path: str, body: Optional[Any] = None) -> Tuple[int, Dict[str, Any]]:
+    raw = body if isinstance(body, bytes) else (b"" if body is None else dumps(body))
+    messages: List[Dict[str, Any]] = []
+
+    async def receive():
+        return {"type": "http.request", "body": raw, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app({"type": "http", "method": method, "path": path}, receive, send)
+    return messages[0]["status"], loads(messages[1]["body"])
+
+
+def call(app, method: str, path: str, body: Optional[Any] = None) -> Tuple[int, Dict[str, Any]]:
+    return asyncio.run(request(app, method, path, body))
+
+
+def test_health():
+    app, _, _ = make_app()
+    assert call(app, "GET", "/health") == (200, {"status": "ok"})
+
+
+def test_answer_returns_navigation_and_answer():
+    app, service, client = make_app()
+    status, result = call(app, "POST", "/answer", {"question": QUESTION})
+    assert status == 200
+    assert set(result) == {"part", "chapter", "subchapter", "answer"}
+    assert result["answer"] == client.answer
+    assert service.executions == 1
+    # Три шага навигации и финальный ответ
+    assert len(client.calls) == 4
+
+
+def test_concurrent_identical_questions_are_coalesced():
+    app, service, client = make_app()
+
+    async def run():
+        variants = [QUESTION, QUESTION.upper(), f"  {QUESTION}  ", QUESTION.rstrip("?")]
+        return await asyncio.gather(*(request(app, "POST", "/answer", {"question": q}) for q in variants))
+
+    responses = asyncio.run(run())
+    assert [status for status, _ in responses] == [200] * 4
+    assert all(result == responses[0][1] for _, result in responses)
+    assert service.executions == 1
+    assert len(client.calls) == 4
+
+
+def test_different_routing_modes_are_not_coalesced():
+    app, service, _ = make_app()
+
+    async def run():
+        return await asyncio.gather(*(
+            request(app, "POST", "/navigate", {"question": QUESTION, "routing_mode": mode})
+            for mode in ("lean", "full")
+        ))
+
+    (_, lean), (_, full) = asyncio.run(run())
+    assert service.executions == 2
+    assert set(lean["part"]) == {"selected_part"}
+    assert "initial_analysis" in full["part"]
+
+
+@pytest.mark.parametrize("routing_mode, fields", [
+    ("lean", {"selected_part"}),
+    ("brief", {"selected_part", "justification", "confidence"}),
+])
+def test_routing_mode_override(routing_mode, fields):
+    app, _, client = make_app(routing_mode="full")
+    status, result = call(app, "POST", "/navigate", {"question": QUESTION, "routing_mode": routing_mode})
+    assert status == 200
+    assert set(result) == {"part", "chapter", "subchapter"}
+    assert set(result["part"]) == fields
+    # Только навигация, без финального ответа
+    assert len(client.calls) == 3
+
+
+def test_routing_mode_defaults_to_config():
+    app, _, _ = make_app(routing_mode="lean")
+    status, result = call(app, "POST", "/navigate", {"question": QUESTION})
+    assert status == 200
+    assert set(result["subchapter"]) == {"selected_subchapter"}
+
+
+@pytest.mark.parametrize("body", [
+    b"not json",
+    b"[]",
+    {},
+    {"question": ""},
+    {"question": "   "},
+    {"question": 42},
+    {"routing_mode": "lean"},
+])
+def test_bad_request_body(body):
+    app, service, client = make_app()
+    status, result = call(app, "POST", "/answer", body)
+    assert status == 400
+    assert "question" in result["error"]
+    assert service.executions == 0
+    assert client.calls == []
+
+
+def test_unknown_routing_mode():
+    app, service, _ = make_app()
+    status, result = call(app, "POST", "/navigate", {"question": QUESTION, "routing_mode": "verbose"})
+    assert status == 400
+    assert "routing_mode" in result["error"]
+    assert service.executions == 0
+
+
+def test_unknown_path_and_method():
+    app, _, _ = make_app()
+    assert call(app, "POST", "/missing", {"question": QUESTION})[0] == 404
+    assert call(app, "GET", "/answer")[0] == 405
+
+
+def test_pipeline_error_is_not_leaked():
+    app, _, _ = make_app(FailingClient())
+    status, result = call(app, "POST", "/answer", {"question": QUESTION})
+    assert status == 502
+    assert "secret" not in result["error"]
+
+
+def run_lifespan(app) -> List[Dict[str, Any]]:
+    incoming = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+    sent: List[Dict[str, Any]] = []
+
+    async def receive():
+        return incoming.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app({"type": "lifespan"}, receive, send))
+    return sent
+
+
+def test_lifespan_startup_and_shutdown():
+    app, _, _ = make_app()
+    assert [m["type"] for m in run_lifespan(app)] == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+
+
+def test_lifespan_startup_failure():
+    def factory():
+        raise FileNotFoundError("know_map_full.json")
+
+    sent = run_lifespan(create_app(factory))
+    assert sent == [{"type": "lifespan.startup.failed", "message": "know_map_full.json"}]
+
+
+def test_non_http_scope_is_ignored():
+    app, _, _ = make_app()
+    sent: List[Dict[str, Any]] = []
+
+    async def receive():
+        return {"type": "websocket.connect"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app({"type": "websocket", "path": "/answer"}, receive, send))
+    assert sent == []
@@ -0,0 +1,73 @@
+# test_speculative_navigation.py
+"""
+SpeculativeNavigator с FakeLLMClient: модели шагов, каталоги профиля, кеш
+навигации и учёт отброшенных спекулятивных запросов.
+
+    python -m pytest tests/test_speculative_navigation.py
+"""
+import pytest
+
+from fake_llm import FakeLLMClient
+from json_io import load_know_map
+from navigation_cache import NavigationCache
+from pipeline import Catalogues, Pipeline, PipelineConfig, StepModels, navigate
+from render_profiles import get_profile
+from speculative_navigation import SpeculativeNavigator
+
+KNOW_MAP_FILE = "data_know_map/know_map_full.json"
+QUESTION = "Как выстроить обратную связь с клиентом?"
+MODELS = StepModels("part-model", "chapter-model", "subchapter-model", "final-model")
+
+
+@pytest.fixture(scope="module")
+def know_map():
+    return load_know_map(KNOW_MAP_FILE)
+
+
+def selections(result):
+    return (result["part"].selected_part, result["chapter"].selected_chapter, result["subchapter"].selected_subchapter)
+
+
+def test_matches_sequential_navigation_with_models_and_profile(know_map):
+    profile = get_profile("keywords", know_map)
+    catalogues = Catalogues(know_map, profile)
+    client = FakeLLMClient()
+    result = SpeculativeNavigator(
+        client, know_map, profile=profile, models=MODELS, catalogues=catalogues, routing_mode="lean"
+    ).run(QUESTION)
+
+    expected = navigate(FakeLLMClient(), know_map, QUESTION, profile=profile, routing_mode="lean")
+    assert selections(result) == selections(expected)
+    assert {call["model"] for call in client.calls} == {"part-model", "chapter-model", "subchapter-model"}
+    assert client.calls[0]["model"] == "part-model"
+    assert catalogues.parts() in client.calls[0]["messages"][-1]["content"]
+
+    stats = result["speculation"]
+    assert stats["calls"] == len(client.calls)
+    assert stats["used"] == 3
+    assert stats["wasted"] == stats["calls"] - 3
+
+
+def test_cache_is_read_and_written(know_map, tmp_path):
+    cache = NavigationCache(KNOW_MAP_FILE, str(tmp_path / "cache.sqlite3"))
+    navigator = SpeculativeNavigator(FakeLLMClient(), know_map, cache=cache)
+    first = navigator.run(QUESTION)
+
+    client = FakeLLMClient()
+    second = SpeculativeNavigator(client, know_map, cache=cache).run(QUESTION)
+    assert selections(second) == selections(first)
+    assert client.calls == []
+    assert second["speculation"]["calls"] == 0
+
+
+def test_pipeline_uses_configured_widths(know_map):
+    client = FakeLLMClient()
+    config = PipelineConfig(cache_file=None, speculative_part_width=1, speculative_chapter_width=0)
+    pipeline = Pipeline(config, client)
+    result = pipeline.navigate(QUESTION)
+
+    navigator = pipeline.speculative_navigator()
+    assert (navigator.part_width, navigator.chapter_width) == (1, 0)
+    assert "speculation" in result
+    # Одна спекулятивная ветка части без спекуляции на уровне глав
+    assert result["speculation"]["calls"] <= 4
@@ -0,0 +1,196 @@
+# text_normalizer.py
+"""
+Нормализация текста страниц после извлечения из PDF.
+
+В kniga_full_content.json страницы лежат с артефактами вёрстки, и они уходят
+в LLM как есть - и в batch-разметке метаданных, и в финальном промпте:
+- переносы слов: "вос-\\nпринимают", "пове- дения" (перенос, склеенный пробелом);
+- переводы строк посреди предложения (конец строки PDF, а не абзаца);
+- колонтитулы: номер страницы последней строкой ("...\\n14" или "повле- 7"),
+  заголовок с названием книги, повторяющиеся первые/последние строки страниц;
+- серии пробелов и пустых строк.
+
+Все правила - заранее скомпилированные регулярные выражения. Колонтитулы
+ищутся по всей книге: первая или последняя строка, которая (с заменой цифр на #)
+повторяется на многих страницах, считается колонтитулом и удаляется. Слово,
+разорванное между страницами ("мно-" / "гим людям"), склеивается на первой из них.
+
+    python text_normalizer.py data_update/kniga_full_content.json [--write]
+"""
+import argparse
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from token_counter import estimate_tokens
+
+# Доля страниц, на которых строка должна повториться, чтобы считаться колонтитулом
+HEADER_MIN_FRACTION = 0.3
+HEADER_MIN_PAGES = 3
+# Заголовок с названием книги может быть длиннее названия на имя автора
+TITLE_LINE_SLACK = 40
+
+_LOWER = "a-zа-яё"
+_HYPHEN_BREAK = re.compile(rf"(?<=[{_LOWER}])[-­][ \t]*\n[ \t]*(?=[{_LOWER}])")
+_HYPHEN_SPACE = re.compile(rf"(?<=[{_LOWER}])-[ \t]+(?=[{_LOWER}])")
+_SOFT_BREAK = re.compile(rf"(?<![.!?…:;\n])[ \t]*\n[ \t]*(?=[{_LOWER}])")
+_SPACES = re.compile(r"[ \t ​]+")
+_SPACES_AROUND_NEWLINE = re.compile(r" ?\n ?")
+_BLANK_LINES = re.compile(r"\n{3,}")
+_DIGITS = re.compile(r"\d+")
+_TRAILING_NUMBER = re.compile(r"[ \t]+(\d{1,4})\s*\Z")
+_PAGE_END_FRAGMENT = re.compile(rf"(?<=[{_LOWER}])[-­]\s*\Z")
+_PAGE_START_FRAGMENT = re.compile(rf"\A[{_LOWER}]+")
+
+
+@dataclass
+class NormalizationReport:
+    pages: int = 0
+    chars_before: int = 0
+    chars_after: int = 0
+    tokens_before: int = 0
+    tokens_after: int = 0
+    header_lines: int = 0
+    hyphenations: int = 0
+    line_breaks: int = 0
+
+    @property
+    def token_reduction(self) -> float:
+        return 1 - self.tokens_after / self.tokens_before if self.tokens_before else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"Страниц: {self.pages}, токенов {self.tokens_before} -> {self.tokens_after} "
+            f"(-{self.token_reduction:.1%}), символов {self.chars_before} -> {self.chars_after}; "
+            f"колонтитулов: {self.header_lines}, переносов: {self.hyphenations}, "
+            f"переводов строк внутри предложений: {self.line_breaks}"
+        )
+
+
+def _mask(line: str) -> str:
+    return _DIGITS.sub("#", line.strip())
+
+
+def find_running_lines(pages: List[Dict[str, Any]], min_fraction: float = HEADER_MIN_FRACTION) -> set:
+    """
+    Первые и последние строки страниц (цифры заменены на #), повторяющиеся
+    не менее чем на min_fraction страниц.
+    """
+    counts: Counter = Counter()
+    for page in pages:
+        lines = [line for line in str(page.get("content", "")).strip().split("\n") if line.strip()]
+        if lines:
+            counts.update({_mask(lines[0]), _mask(lines[-1])})
+    threshold = max(HEADER_MIN_PAGES, min_fraction * len(pages))
+    return {line for line, count in counts.items() if count >= threshold}
+
+
+def _is_title_line(line: str, title: Optional[str]) -> bool:
+    line = line.strip()
+    return bool(title) and title in line and len(line) <= len(title) + TITLE_LINE_SLACK
+
+
+def strip_running_lines(
+    text: str,
+    running: set,
+    title: Optional[str] = None,
+    page_number: Optional[int] = None
+) -> Tuple[str, int]:
+    """
+    Удаляет колонтитулы с краёв страницы; возвращает текст и число удалённых строк.
+    """
+    lines = text.strip().split("\n")
+    removed = 0
+    while lines and (_mask(lines[0]) in running or _is_title_line(lines[0], title)):
+        lines.pop(0)
+        removed += 1
+    while lines and (_mask(lines[-1]) in running or lines[-1].strip() == str(page_number)):
+        lines.pop()
+        removed += 1
+    text = "\n".join(lines)
+    # Номер страницы, приклеенный к последней строке: "...повле- 7"
+    match = _TRAILING_NUMBER.search(text)
+    if match and page_number is not None and match.group(1) == str(page_number):
+        text = text[:match.start()]
+        removed += 1
+    return text, removed
+
+
+def normalize_text(text: str, report: Optional[NormalizationReport] = None) -> str:
+    """
+    Переносы, переводы строк внутри предложений и пробелы в тексте одной страницы.
+    """
+    text, hyphenations = _HYPHEN_BREAK.subn("", text)
+    text, inline = _HYPHEN_SPACE.subn("", text)
+    text, line_breaks = _SOFT_BREAK.subn(" ", text)
+    text = _SPACES.sub(" ", text)
+    text = _SPACES_AROUND_NEWLINE.sub("\n", text)
+    text = _BLANK_LINES.sub("\n\n", text).strip()
+    if report is not None:
+        report.hyphenations += hyphenations + inline
+        report.line_breaks += line_breaks
+    return text
+
+
+def normalize_pages(
+    pages: List[Dict[str, Any]],
+    title: Optional[str] = None,
+    min_fraction: float = HEADER_MIN_FRACTION
+) -> NormalizationReport:
+    """
+    Нормализует content всех страниц книги на месте и возвращает отчёт.
+    title - название книги: строка-заголовок с ним на краю страницы удаляется.
+    """
+    report = NormalizationReport(pages=len(pages))
+    running = find_running_lines(pages, min_fraction)
+    for page in pages:
+        text = str(page.get("content", ""))
+        report.chars_before += len(text)
+        report.tokens_before += estimate_tokens(text)
+        text, removed = strip_running_lines(text, running, title, page.get("pageNumber"))
+        report.header_lines += removed
+        page["content"] = normalize_text(text, report)
+
+    # Слово, разорванное между страницами: окончание переносится на предыдущую
+    for previous, page in zip(pages, pages[1:]):
+        end = _PAGE_END_FRAGMENT.search(previous["content"])
+        start = _PAGE_START_FRAGMENT.match(page["content"])
+        if end and start:
+            previous["content"] = previous["content"][:end.start()] + start.group(0)
+            page["content"] = page["content"][start.end():].lstrip()
+            report.hyphenations += 1
+
+    for page in pages:
+        report.chars_after += len(page["content"])
+        report.tokens_after += estimate_tokens(page["content"])
+    return report
+
+
+def normalize_book(data: Any) -> NormalizationReport:
+    """
+    kniga_full_content.json ({"book": {...}}) или список страниц (kniga_only_pages.json).
+    """
+    if isinstance(data, list):
+        return normalize_pages(data)
+    book = data.get("book", {})
+    return normalize_pages(book.get("pages", []), book.get("title"))
+
+
+def main():
+    from json_io import dump_json, load_json
+
+    parser = argparse.ArgumentParser(description="Нормализация текста страниц книги")
+    parser.add_argument("files", nargs="+", help="kniga_full_content.json или kniga_only_pages.json")
+    parser.add_argument("--write", action="store_true", help="перезаписать файлы (по умолчанию - только отчёт)")
+    args = parser.parse_args()
+    for path in args.files:
+        data = load_json(path)
+        report = normalize_book(data)
+        print(f"{path}: {report}")
+        if args.write:
+            dump_json(data, path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# token_counter.py
+
+import re
+from typing import Dict, Iterable, Optional, Tuple
+
+# Ориентировочные цены за 1M токенов (вход, выход). Значения можно переопределить
+# через аргумент prices; для GigaChat - в рублях, для OpenAI - в долларах.
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "GigaChat-Lite": (200.0, 200.0),
+    "GigaChat-Pro": (1500.0, 1500.0),
+    "GigaChat-Max": (1950.0, 1950.0),
+}
+
+# Служебные токены на каждое сообщение чата (роль, разделители)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]|\s{2,}", re.UNICODE)
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken не установлен или нет доступа к файлам кодировки
+    _ENCODING = None
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Оценивает количество токенов в тексте.
+    Если установлен tiktoken, считает точно (cl100k_base), иначе - приближённо:
+    длинные слова (кириллица обычно дробится сильнее латиницы) дают несколько токенов,
+    серии пробелов и переводов строк - по токену на каждые 4 символа.
+    """
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    tokens = 0
+    for match in _TOKEN_PATTERN.finditer(text):
+        word = match.group()
+        if word.isspace():
+            # Переводы строк и отступы тоже стоят токенов: примерно 1 на 4 пробельных символа
+            tokens += (len(word) + 3) // 4
+        else:
+            tokens += max(1, (len(word) + 3) // 4) if word.isascii() else max(1, (len(word) + 2) // 3)
+    return tokens
+
+
+def estimate_messages_tokens(messages: Iterable[dict]) -> int:
+    """
+    Оценка входных токенов для списка сообщений chat-completions.
+    """
+    return sum(estimate_tokens(str(m.get("content", ""))) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+def estimate_cost(
+    model: str,
+    input_tokens: int,
+    output_tokens: int = 0,
+    prices: Optional[Dict[str, Tuple[float, float]]] = None
+) -> float:
+    """
+    Стоимость запроса(ов) по таблице цен. Для неизвестной модели возвращает 0.
+    """
+    input_price, output_price = (prices or MODEL_PRICES).get(model, (0.0, 0.0))
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000